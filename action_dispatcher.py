@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Répartiteur d'actions pour NGFW-Congo.
+
+La détection ne fait plus elle-même les actions déclenchées par une anomalie
+(journalisation en base, blocage noyau, export SIEM, alerte SOC) : elle les
+soumet à ce répartiteur, qui les exécute sur ses propres threads, avec une
+file bornée et un pool de workers par type d'action. Le débit de scoring ne
+dépend plus de la latence de l'application des mesures.
+
+Une action soumise avec une clé (l'IP source pour un blocage) est fusionnée
+avec l'action de même clé déjà en attente ou en cours.
+"""
+
+import os
+import json
+import threading
+import logging
+from queue import Queue, Full
+
+logger = logging.getLogger('NGFW-Actions')
+
+# Types d'actions
+ACTION_LOG = 'log'       # événement en base (api.log_event)
+ACTION_BLOCK = 'block'   # blocage noyau (blocker.block_ip)
+ACTION_SIEM = 'siem'     # export CEF vers le SIEM (api.siem_exporter)
+ACTION_SOC = 'soc'       # alerte webhook SOC (api.soc_integration)
+
+_STOP = object()
+
+class ActionDispatcher:
+    """
+    Files et pools de workers par type d'action.
+
+    Usage :
+        dispatcher = ActionDispatcher({ACTION_BLOCK: block_handler}, workers={ACTION_BLOCK: 2})
+        dispatcher.start()
+        dispatcher.submit(ACTION_BLOCK, ('203.0.113.7', 'scan'), key='203.0.113.7')
+        dispatcher.close()      # exécute ce qui reste en file
+    """
+    def __init__(self, handlers, workers=None, max_queue=10000):
+        self.handlers = dict(handlers)
+        self.workers = {action: (workers or {}).get(action, 1) for action in self.handlers}
+        self.max_queue = max_queue
+
+        self.queues = {action: Queue(maxsize=max_queue) for action in self.handlers}
+        # Clés en attente ou en cours d'exécution, par type d'action
+        self._in_flight = {action: set() for action in self.handlers}
+        self.lock = threading.Lock()
+        self._threads = []
+        self._closed = False
+        # Processus propriétaire : après un fork, l'enfant doit créer son propre répartiteur
+        self.pid = os.getpid()
+
+        # Statistiques par type d'action
+        self.stats = {
+            action: {'submitted': 0, 'done': 0, 'coalesced': 0, 'dropped': 0, 'errors': 0}
+            for action in self.handlers
+        }
+
+    def start(self):
+        """Démarre les workers de chaque type d'action."""
+        for action, count in self.workers.items():
+            for index in range(count):
+                thread = threading.Thread(
+                    target=self._run, args=(action,), name=f"ngfw-action-{action}-{index}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        return self
+
+    def submit(self, action, payload, key=None):
+        """
+        Met une action en file. Retourne False si elle est refusée (type
+        inconnu ou désactivé, file pleine, répartiteur fermé). Une action
+        dont la clé est déjà en attente ou en cours est fusionnée (True).
+        """
+        handler_queue = self.queues.get(action)
+        if handler_queue is None or self._closed:
+            return False
+        stats = self.stats[action]
+
+        if key is not None:
+            with self.lock:
+                in_flight = self._in_flight[action]
+                if key in in_flight:
+                    stats['coalesced'] += 1
+                    return True
+                in_flight.add(key)
+
+        try:
+            handler_queue.put_nowait((key, payload))
+        except Full:
+            with self.lock:
+                stats['dropped'] += 1
+                if key is not None:
+                    self._in_flight[action].discard(key)
+            return False
+
+        with self.lock:
+            stats['submitted'] += 1
+        return True
+
+    def _run(self, action):
+        """Worker : exécute les actions d'un type jusqu'au signal d'arrêt."""
+        handler = self.handlers[action]
+        handler_queue = self.queues[action]
+        stats = self.stats[action]
+        while True:
+            item = handler_queue.get()
+            if item is _STOP:
+                handler_queue.task_done()
+                return
+            key, payload = item
+            try:
+                handler(payload)
+                with self.lock:
+                    stats['done'] += 1
+            except Exception as e:
+                logger.error(f"Erreur de l'action {action}: {e}")
+                with self.lock:
+                    stats['errors'] += 1
+            finally:
+                if key is not None:
+                    with self.lock:
+                        self._in_flight[action].discard(key)
+                handler_queue.task_done()
+
+    def join(self):
+        """Attend que toutes les actions en file soient exécutées."""
+        for handler_queue in self.queues.values():
+            handler_queue.join()
+
+    def close(self, timeout=5):
+        """Refuse les nouvelles actions, exécute celles en file puis arrête les workers."""
+        self._closed = True
+        for action, handler_queue in self.queues.items():
+            for _ in range(self.workers[action]):
+                handler_queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def get_stats(self):
+        """Statistiques par type d'action (dont la profondeur de file)."""
+        with self.lock:
+            return {
+                action: dict(stats, queued=self.queues[action].qsize())
+                for action, stats in self.stats.items()
+            }
+
+def log_action(payload):
+    """
+    Journalise une anomalie : payload = (événement, features du flux,
+    résultat de détection). L'événement va en base (tampon du writer
+    d'événements), le détail dans le journal applicatif.
+    """
+    from api import log_event
+    event, flow_features, detection_result = payload
+    log_event('anomaly', event)
+    logger.warning(f"   Détails du flux: {json.dumps(flow_features, indent=2, default=str)}")
+    logger.warning(f"   Résultat complet: {json.dumps(detection_result, indent=2, default=str)}")
+
+def block_action(payload):
+    """Bloque une IP source : payload = (ip, raison)."""
+    from blocker import get_blocker
+    src_ip, reason = payload
+    if get_blocker().block_ip(src_ip, reason):
+        logger.warning(f"🔒 IP bloquée: {src_ip}")
+
+def siem_action(event):
+    """Exporte un événement au format CEF vers le SIEM."""
+    from api import siem_exporter, format_cef_event
+    siem_exporter.send_cef(format_cef_event(event))
+
+def soc_action(event):
+    """
+    Met une alerte en file pour chaque plateforme SOC configurée (livraison
+    agrégée et limitée en débit, voir webhook_delivery.py).
+    """
+    from api import soc_integration
+    for platform, url in soc_integration.webhook_urls.items():
+        if url:
+            soc_integration.send_alert(event, platform)
+
+def default_handlers():
+    """
+    Actions activées selon la configuration : journalisation et blocage
+    toujours, SIEM si SIEM_HOST est défini, SOC si un webhook est configuré.
+    """
+    handlers = {ACTION_LOG: log_action, ACTION_BLOCK: block_action}
+    if os.getenv('SIEM_HOST'):
+        handlers[ACTION_SIEM] = siem_action
+    if any(os.getenv(name) for name in ('SLACK_WEBHOOK_URL', 'TEAMS_WEBHOOK_URL', 'WEBEX_WEBHOOK_URL')):
+        handlers[ACTION_SOC] = soc_action
+    return handlers
+
+# Instance globale (une par processus), créée à la première action
+action_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_action_dispatcher():
+    """Répartiteur du processus courant (démarré à la première utilisation)."""
+    global action_dispatcher
+    dispatcher = action_dispatcher
+    if dispatcher is None or dispatcher.pid != os.getpid():
+        with _dispatcher_lock:
+            if action_dispatcher is None or action_dispatcher.pid != os.getpid():
+                workers = int(os.environ.get('NGFW_ACTION_WORKERS', 2))
+                action_dispatcher = ActionDispatcher(
+                    default_handlers(),
+                    # Le bloqueur regroupe déjà les blocages en transactions : un worker suffit
+                    workers={ACTION_LOG: 1, ACTION_BLOCK: 1, ACTION_SIEM: workers, ACTION_SOC: workers},
+                    max_queue=int(os.environ.get('NGFW_ACTION_QUEUE', 10000)),
+                ).start()
+                logger.info(f"Répartiteur d'actions démarré: {', '.join(action_dispatcher.handlers)}")
+            dispatcher = action_dispatcher
+    return dispatcher
+
+def close_action_dispatcher(timeout=5):
+    """Exécute les actions en file puis arrête le répartiteur du processus courant."""
+    global action_dispatcher
+    with _dispatcher_lock:
+        dispatcher, action_dispatcher = action_dispatcher, None
+    if dispatcher is not None and dispatcher.pid == os.getpid():
+        dispatcher.close(timeout)
+        logger.info(f"Répartiteur d'actions arrêté: {dispatcher.get_stats()}")
+        if ACTION_SOC in dispatcher.handlers:
+            # Les dernières fenêtres d'alertes SOC partent avant la sortie
+            from api import soc_integration
+            soc_integration.close(timeout)
@@ -6,8 +6,8 @@ from prometheus_client import Counter, Gauge, generate_latest, REGISTRY
 from fastapi import Response
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
-import sqlite3
 import json
 import asyncio
 from datetime import datetime, timedelta
@@ -17,7 +17,7 @@ import threading
 import os
 from datetime import datetime
 import socket
-import requests
+import time
 from dotenv import load_dotenv
 
 
@@ -34,73 +34,32 @@ FLOWS_PROCESSED = Counter('ngfw_flows_total', 'Total flows processed')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("NGFW-API")
 
-# Configuration de la base de données
-DB_DIR = "/home/biraheka/ngfw-congo/data"
-DB_PATH = f"{DB_DIR}/ngfw_congo.db"
+# Configuration de la base de données (chemins surchargeables, voir database.py)
+from database import DB_DIR, connect, init_database, get_connection, close_all, statistics_totals
+from event_writer import get_event_writer, close_event_writer
+from retention import init_retention, close_retention
+from webhook_delivery import WebhookDelivery
 
 # Assurez-vous que le dossier existe
 os.makedirs(DB_DIR, exist_ok=True)
 
-def init_database():
-    """Initialise la base de données SQLite."""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Table des événements
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            event_type TEXT NOT NULL,
-            severity TEXT,
-            source_ip TEXT,
-            destination_ip TEXT,
-            protocol TEXT,
-            description TEXT,
-            anomaly_score REAL,
-            action_taken TEXT
-        )
-        ''')
-        
-        # Table des statistiques
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS statistics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            packets_processed INTEGER,
-            flows_processed INTEGER,
-            anomalies_detected INTEGER,
-            ips_blocked INTEGER
-        )
-        ''')
-        
-        # Table des IP bloquées
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS blocked_ips (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ip_address TEXT UNIQUE,
-            blocked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            reason TEXT,
-            expires_at DATETIME
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        logger.info("Base de données initialisée")
-        
-    except Exception as e:
-        logger.error(f"Erreur lors de l'initialisation de la base de données: {e}")
-        raise
-
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     init_database()
+    # Durées de conservation et partitions des événements (voir retention.py)
+    init_retention()
+    # Producteur unique des mises à jour WebSocket
+    manager.start()
     logger.info("API NGFW-Congo démarrée")
     yield
     # Shutdown
+    await manager.stop()
+    # Fenêtres d'alertes SOC en cours envoyées sans attendre leur fin
+    await run_in_threadpool(soc_integration.close)
+    close_retention()
+    close_event_writer()
+    close_all()
     logger.info("API NGFW-Congo arrêtée")
 
 app = FastAPI(
@@ -120,22 +79,153 @@ app.add_middleware(
 
 # Gestion des connexions WebSocket
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
+    """
+    Diffusion du dashboard en temps réel. Un seul producteur calcule
+    l'instantané (dashboard_stats) une fois par tick, ou dès qu'une écriture
+    est détectée dans la base, et l'envoie à tous les clients en parallèle.
+    Un client qui ne reçoit pas un message en moins de send_timeout secondes
+    est déconnecté.
+
+    Deux modes par client (/ws/real-time?mode=delta) :
+    - full (défaut) : {"type": "real_time_update", "seq", "data"} à chaque tick ;
+    - delta : un instantané complet à la connexion, puis seulement
+      {"type": "real_time_delta", "seq", "changed", "removed"} quand des clés
+      de l'instantané ont changé, à appliquer sur le dernier état reçu.
+    """
+    def __init__(self, interval=1.0, min_interval=0.25, poll_interval=0.1, send_timeout=2.0):
+        # {websocket: True si le client est en mode delta}
+        self.active_connections: Dict[WebSocket, bool] = {}
+        self.interval = interval
+        self.min_interval = min_interval
+        self.poll_interval = poll_interval
+        self.send_timeout = send_timeout
+
+        self.snapshot = None
+        self.seq = 0
+        self._full_message = None
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Connexion dédiée au test de PRAGMA data_version
+        self._probe = None
+        self._data_version = None
+
+        # Statistiques
+        self.stats = {'snapshots': 0, 'messages': 0, 'dropped_clients': 0}
+
+    async def connect(self, websocket: WebSocket, delta: bool = False):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections[websocket] = delta
+        if self._full_message is not None:
+            # Instantané courant tout de suite (et base des deltas)
+            await self._send(websocket, self._full_message)
+        else:
+            self._wakeup.set()
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.pop(websocket, None)
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+    async def _send(self, websocket: WebSocket, text: str):
+        """Envoi avec délai maximal ; le client est déconnecté en cas d'échec."""
+        try:
+            await asyncio.wait_for(websocket.send_text(text), self.send_timeout)
+            return True
+        except Exception as e:
+            if websocket in self.active_connections:
+                self.disconnect(websocket)
+                self.stats['dropped_clients'] += 1
+                logger.warning(f"Client WebSocket lent ou fermé, déconnecté ({type(e).__name__})")
+                try:
+                    await asyncio.wait_for(websocket.close(code=1013), self.send_timeout)
+                except Exception:
+                    pass
+            return False
+
+    async def broadcast(self, message: dict, delta_message: dict = None):
+        """
+        Envoie `message` à tous les clients (`delta_message` aux clients en
+        mode delta, rien pour eux s'il vaut None), en parallèle. Chaque
+        message est encodé une seule fois.
+        """
+        await self._fan_out(json.dumps(message, default=str),
+                            json.dumps(delta_message, default=str) if delta_message is not None else None)
+
+    async def _fan_out(self, full_text: str, delta_text: str = None):
+        texts = {False: full_text, True: delta_text}
+        targets = [(websocket, texts[delta]) for websocket, delta in list(self.active_connections.items())
+                   if texts[delta] is not None]
+        results = await asyncio.gather(*(self._send(websocket, text) for websocket, text in targets))
+        self.stats['messages'] += sum(results)
+
+    def _database_changed(self):
+        """Vrai si une autre connexion a écrit dans la base depuis le dernier appel."""
+        if self._probe is None:
+            self._probe = connect(check_same_thread=False)
+        version = self._probe.execute('PRAGMA data_version').fetchone()[0]
+        changed, self._data_version = version != self._data_version, version
+        return changed
+
+    async def publish(self):
+        """Calcule l'instantané et le diffuse (complet, et en delta si quelque chose a changé)."""
+        snapshot = await run_in_threadpool(dashboard_stats)
+        self.stats['snapshots'] += 1
+        previous, self.snapshot = self.snapshot, snapshot
+        self.seq += 1
+        message = {"type": "real_time_update", "seq": self.seq, "data": snapshot}
+        self._full_message = json.dumps(message, default=str)
+
+        # Premier instantané : complet pour tout le monde
+        delta = self._full_message if previous is None else None
+        if previous is not None:
+            changed = {key: value for key, value in snapshot.items() if previous.get(key) != value}
+            removed = [key for key in previous if key not in snapshot]
+            if changed or removed:
+                delta = json.dumps({"type": "real_time_delta", "seq": self.seq,
+                                    "changed": changed, "removed": removed}, default=str)
+        await self._fan_out(self._full_message, delta)
+
+    async def run(self):
+        """Producteur : un instantané par tick, ou plus tôt si la base a changé."""
+        last = 0.0
+        pending = False
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self.active_connections:
+                # Pas de client : pas de requête, et pas d'instantané périmé à la reconnexion
+                self.snapshot = self._full_message = None
+                continue
             try:
-                await connection.send_json(message)
-            except:
-                self.disconnect(connection)
+                pending = await run_in_threadpool(self._database_changed) or pending
+                elapsed = time.monotonic() - last
+                if (self._full_message is None or elapsed >= self.interval
+                        or (pending and elapsed >= self.min_interval)):
+                    last = time.monotonic()
+                    pending = False
+                    await self.publish()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erreur du producteur WebSocket: {e}")
+
+    def start(self):
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+        if self._probe is not None:
+            self._probe.close()
+            self._probe = None
 
 manager = ConnectionManager()
 
@@ -147,22 +237,19 @@ async def root():
 @app.get("/stats/dashboard")
 async def get_dashboard_stats():
     """Retourne les statistiques pour le dashboard."""
+    # Les requêtes SQLite sont bloquantes : exécutées dans le pool de threads,
+    # hors de la boucle d'événements
+    return await run_in_threadpool(dashboard_stats)
+
+def dashboard_stats():
+    """Statistiques du dashboard (appel bloquant, connexion du thread)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cursor = conn.cursor()
         
-        # Statistiques globales
-        cursor.execute('''
-        SELECT 
-            SUM(packets_processed) as total_packets,
-            SUM(flows_processed) as total_flows,
-            SUM(anomalies_detected) as total_anomalies,
-            SUM(ips_blocked) as total_blocks
-        FROM statistics
-        WHERE timestamp > datetime('now', '-24 hours')
-        ''')
-        
-        stats = cursor.fetchone()
+        # Statistiques globales des dernières 24h, lues dans les agrégats par
+        # minute et par heure (coût constant, voir database.statistics_totals)
+        stats = statistics_totals(24)
         
         # Dernières anomalies
         cursor.execute('''
@@ -183,13 +270,11 @@ async def get_dashboard_stats():
         
         blocked_ips = cursor.fetchall()
         
-        conn.close()
-        
         return {
-            "total_packets": stats[0] or 0,
-            "total_flows": stats[1] or 0,
-            "total_anomalies": stats[2] or 0,
-            "total_blocks": stats[3] or 0,
+            "total_packets": stats[0],
+            "total_flows": stats[1],
+            "total_anomalies": stats[2],
+            "total_blocks": stats[3],
             "recent_anomalies": anomalies,
             "blocked_ips": blocked_ips
         }
@@ -206,9 +291,12 @@ async def get_metrics():
 @app.get("/events/recent")
 async def get_recent_events(limit: int = 50):
     """Retourne les événements récents."""
+    return await run_in_threadpool(recent_events, limit)
+
+def recent_events(limit: int = 50):
+    """Événements récents (appel bloquant, connexion du thread)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        cursor = get_connection().cursor()
         cursor.execute('''
         SELECT * FROM events 
         ORDER BY timestamp DESC 
@@ -216,7 +304,6 @@ async def get_recent_events(limit: int = 50):
         ''', (limit,))
         
         events = cursor.fetchall()
-        conn.close()
         
         return {"events": events}
     except Exception as e:
@@ -224,46 +311,31 @@ async def get_recent_events(limit: int = 50):
         return {"error": str(e)}
 
 @app.websocket("/ws/real-time")
-async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket pour les données en temps réel."""
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, mode: str = "full"):
+    """
+    WebSocket pour les données en temps réel. Les mises à jour sont
+    diffusées par le producteur unique de `manager` ; ?mode=delta pour ne
+    recevoir que les changements.
+    """
+    await manager.connect(websocket, delta=(mode == "delta"))
     try:
         while True:
-            # Envoi périodique de données
-            await asyncio.sleep(1)
-            stats = await get_dashboard_stats()
-            await websocket.send_json({
-                "type": "real_time_update",
-                "data": stats
-            })
+            # Les messages du client sont ignorés ; on attend la déconnexion
+            await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 # Fonctions pour intégration avec le NGFW
 def log_event(event_type: str, data: dict):
-    """Log un événement dans la base de données."""
+    """
+    Log un événement dans la base de données. L'événement est mis en tampon et
+    écrit par lots par le writer d'événements (event_writer.py) ; retourne
+    False s'il a été refusé (tampon plein).
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-        INSERT INTO events 
-        (event_type, severity, source_ip, destination_ip, protocol, description, anomaly_score, action_taken)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            event_type,
-            data.get('severity'),
-            data.get('source_ip'),
-            data.get('destination_ip'),
-            data.get('protocol'),
-            data.get('description'),
-            data.get('anomaly_score'),
-            data.get('action_taken')
-        ))
-        
-        conn.commit()
-        conn.close()
-        return True
+        return get_event_writer().write(event_type, data)
     except Exception as e:
         logger.error(f"Erreur dans log_event: {e}")
         return False
@@ -278,28 +350,24 @@ def update_stats(stats_data: dict):
         IPS_BLOCKED.inc(stats_data.get('ips_blocked', 0))
         
         # Met à jour la gauge des blocs actuels
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM blocked_ips WHERE expires_at > datetime("now")')
         current_count = cursor.fetchone()[0]
         CURRENT_BLOCKS.set(current_count)
-        conn.close()
         
         # Log dans la base (existant)
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-        INSERT INTO statistics 
-        (packets_processed, flows_processed, anomalies_detected, ips_blocked)
-        VALUES (?, ?, ?, ?)
-        ''', (
-            stats_data.get('packets_processed', 0),
-            stats_data.get('flows_processed', 0),
-            stats_data.get('anomalies_detected', 0),
-            stats_data.get('ips_blocked', 0)
-        ))
-        conn.commit()
-        conn.close()
+        with conn:
+            cursor.execute('''
+            INSERT INTO statistics 
+            (packets_processed, flows_processed, anomalies_detected, ips_blocked)
+            VALUES (?, ?, ?, ?)
+            ''', (
+                stats_data.get('packets_processed', 0),
+                stats_data.get('flows_processed', 0),
+                stats_data.get('anomalies_detected', 0),
+                stats_data.get('ips_blocked', 0)
+            ))
         return True
     except Exception as e:
         logger.error(f"Erreur dans update_stats: {e}")
@@ -341,14 +409,16 @@ async def get_integration_status():
             "slack": bool(soc_integration.webhook_urls['slack']),
             "teams": bool(soc_integration.webhook_urls['teams']),
             "webex": bool(soc_integration.webhook_urls['webex'])
-        }
+        },
+        "soc_delivery": soc_integration.get_stats()
     }
 
 @app.post("/integration/soc/alert")
 async def send_soc_alert(anomaly_data: dict, platform: str = "slack"):
     """Envoie une alerte au SOC"""
-    success = soc_integration.send_alert(anomaly_data, platform)
-    return {"status": "success" if success else "failed", "platform": platform}
+    # Mise en file seulement : la livraison (agrégée, limitée en débit) ne bloque pas la boucle
+    queued = soc_integration.send_alert(anomaly_data, platform)
+    return {"status": "queued" if queued else "failed", "platform": platform}
 
 @app.post("/integration/siem/test")
 async def test_siem_connection(host: str, port: int = 514):
@@ -360,11 +430,13 @@ async def test_siem_connection(host: str, port: int = 514):
 @app.get("/integration/cef/events")
 async def get_cef_events(limit: int = 100):
     """Retourne les événements récents au format CEF"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    return await run_in_threadpool(recent_cef_events, limit)
+
+def recent_cef_events(limit: int = 100):
+    """Événements récents au format CEF (appel bloquant, connexion du thread)."""
+    cursor = get_connection().cursor()
     cursor.execute('SELECT * FROM events ORDER BY timestamp DESC LIMIT ?', (limit,))
     events = cursor.fetchall()
-    conn.close()
     
     cef_events = []
     for event in events:
@@ -386,18 +458,20 @@ async def get_cef_events(limit: int = 100):
 @app.post("/admin/block-ip")
 async def block_ip(ip_data: dict):
     """Endpoint pour bloquer une IP manuellement"""
+    return await run_in_threadpool(admin_block_ip, ip_data)
+
+def admin_block_ip(ip_data: dict):
+    """Blocage manuel (appel bloquant, connexion du thread)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-        INSERT OR REPLACE INTO blocked_ips 
-        (ip_address, reason, expires_at)
-        VALUES (?, ?, datetime('now', '+1 hour'))
-        ''', (ip_data['ip'], ip_data['reason']))
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            cursor.execute('''
+            INSERT OR REPLACE INTO blocked_ips 
+            (ip_address, reason, expires_at, updated_at, origin)
+            VALUES (?, ?, datetime('now', '+1 hour'), ?, 'api')
+            ''', (ip_data['ip'], ip_data['reason'], time.time()))
         
         # Mettre à jour la métrique Prometheus
         cursor.execute('SELECT COUNT(*) FROM blocked_ips WHERE expires_at > datetime("now")')
@@ -412,17 +486,22 @@ async def block_ip(ip_data: dict):
 @app.post("/admin/unblock-ip")
 async def unblock_ip(ip_data: dict):
     """Endpoint pour débloquer une IP"""
+    return await run_in_threadpool(admin_unblock_ip, ip_data)
+
+def admin_unblock_ip(ip_data: dict):
+    """Déblocage manuel (appel bloquant, connexion du thread)."""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = get_connection()
         cursor = conn.cursor()
         
-        cursor.execute('''
-        DELETE FROM blocked_ips 
-        WHERE ip_address = ?
-        ''', (ip_data['ip'],))
-        
-        conn.commit()
-        conn.close()
+        # La ligne est expirée plutôt que supprimée : le bloqueur suit le journal
+        # (block_store.py) et retire l'IP du set nftables
+        with conn:
+            cursor.execute('''
+            UPDATE blocked_ips 
+            SET expires_at = datetime('now'), updated_at = ?, origin = 'api'
+            WHERE ip_address = ?
+            ''', (time.time(), ip_data['ip']))
         
         # Mettre à jour la métrique Prometheus
         cursor.execute('SELECT COUNT(*) FROM blocked_ips WHERE expires_at > datetime("now")')
@@ -474,21 +553,45 @@ class SOCIntegration:
             'teams': os.getenv('TEAMS_WEBHOOK_URL', ''),
             'webex': os.getenv('WEBEX_WEBHOOK_URL', '')
         }
+        # Moteur de livraison asynchrone (webhook_delivery.py), démarré au premier envoi
+        self.delivery = None
+        self._lock = threading.Lock()
     
     def send_alert(self, anomaly_data: dict, platform: str = 'slack'):
-        """Envoie une alerte au SOC"""
-        webhook_url = self.webhook_urls.get(platform)
-        if not webhook_url:
-            return False
-            
-        payload = self._format_payload(anomaly_data, platform)
-        
-        try:
-            response = requests.post(webhook_url, json=payload, timeout=10)
-            return response.status_code == 200
-        except Exception as e:
-            logger.error(f"SOC alert failed: {e}")
+        """
+        Met une alerte en file pour le SOC (non bloquant). Les alertes d'une
+        même fenêtre partent en un seul message ; retourne False si la
+        plateforme n'est pas configurée.
+        """
+        if not self.webhook_urls.get(platform):
             return False
+        return self._get_delivery().submit(platform, anomaly_data)
+
+    def _get_delivery(self):
+        """Moteur de livraison du processus courant."""
+        with self._lock:
+            if self.delivery is None or self.delivery.pid != os.getpid():
+                self.delivery = WebhookDelivery(
+                    self.webhook_urls, self._format_payload, self._format_digest,
+                    window=float(os.getenv('NGFW_SOC_WINDOW', 10)),
+                    rate=float(os.getenv('NGFW_SOC_RATE', 1)),
+                    burst=int(os.getenv('NGFW_SOC_BURST', 3)),
+                    retries=int(os.getenv('NGFW_SOC_RETRIES', 3)),
+                ).start()
+            return self.delivery
+
+    def close(self, timeout=10):
+        """Envoie les alertes en attente et arrête le moteur de livraison."""
+        with self._lock:
+            delivery, self.delivery = self.delivery, None
+        if delivery is not None and delivery.pid == os.getpid():
+            delivery.close(timeout)
+            logger.info(f"Webhooks SOC arrêtés: {delivery.get_stats()}")
+
+    def get_stats(self):
+        """Statistiques de livraison par plateforme (vide avant le premier envoi)."""
+        delivery = self.delivery
+        return delivery.get_stats() if delivery is not None else {}
     
     def _format_payload(self, anomaly_data: dict, platform: str):
         """Formate le payload selon la plateforme"""
@@ -531,6 +634,59 @@ class SOCIntegration:
                 }]
             }
 
+        elif platform == 'webex':
+            return {
+                "markdown": (f"🚨 **NGFW Congo Alert** — source {anomaly_data.get('source_ip')}, "
+                             f"destination {anomaly_data.get('destination_ip')}, "
+                             f"score {anomaly_data.get('anomaly_score')}")
+            }
+
+    def _format_digest(self, digest: dict, platform: str):
+        """Formate le message de synthèse d'une fenêtre de plusieurs alertes"""
+        title = f"🚨 NGFW Congo: {digest['count']} alertes"
+        sources = ", ".join(f"{ip} ({count})" for ip, count in digest['top_sources'])
+        period = (f"{datetime.fromtimestamp(digest['first_seen']).strftime('%H:%M:%S')} - "
+                  f"{datetime.fromtimestamp(digest['last_seen']).strftime('%H:%M:%S')}")
+        if platform == 'slack':
+            return {
+                "text": title,
+                "blocks": [
+                    {"type": "header", "text": {"type": "plain_text", "text": title}},
+                    {
+                        "type": "section",
+                        "fields": [
+                            {"type": "mrkdwn", "text": f"*Période:* {period}"},
+                            {"type": "mrkdwn", "text": f"*Sources distinctes:* {digest['distinct_sources']}"},
+                            {"type": "mrkdwn", "text": f"*Principales sources:* {sources}"},
+                            {"type": "mrkdwn", "text": f"*Score max:* {digest['max_score']}"}
+                        ]
+                    }
+                ]
+            }
+
+        elif platform == 'teams':
+            return {
+                "@type": "MessageCard",
+                "@context": "http://schema.org/extensions",
+                "themeColor": "FF0000",
+                "summary": title,
+                "sections": [{
+                    "activityTitle": title,
+                    "facts": [
+                        {"name": "Période:", "value": period},
+                        {"name": "Sources distinctes:", "value": str(digest['distinct_sources'])},
+                        {"name": "Principales sources:", "value": sources},
+                        {"name": "Score max:", "value": str(digest['max_score'])}
+                    ]
+                }]
+            }
+
+        elif platform == 'webex':
+            return {
+                "markdown": (f"{title} ({period}) — {digest['distinct_sources']} source(s), "
+                             f"principales: {sources}, score max {digest['max_score']}")
+            }
+
 # Instance globale
 soc_integration = SOCIntegration()
 
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'API (requêtes/s) : anciens handlers (nouvelle connexion SQLite
+par requête, appels bloquants dans la boucle d'événements) comparés aux
+handlers actuels de api.py (connexion par thread en mode WAL, pool de
+threads). Les requêtes sont envoyées en parallèle directement à l'application
+ASGI, sans réseau. Mesure aussi le plus long blocage de la boucle d'événements
+pendant la charge, et le coût par appel de log_event.
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+def seed(db_path, events, stats):
+    """Remplit la base de test."""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        'INSERT INTO events (event_type, severity, source_ip, destination_ip, protocol, description, anomaly_score, action_taken) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [('anomaly', 'high', f'203.0.113.{i % 250}', '10.0.0.1', 'TCP', 'bench', -0.2, 'blocked') for i in range(events)]
+    )
+    conn.executemany(
+        'INSERT INTO statistics (packets_processed, flows_processed, anomalies_detected, ips_blocked) VALUES (?, ?, ?, ?)',
+        [(1000, 100, 1, 1)] * stats
+    )
+    conn.commit()
+    conn.close()
+
+def legacy_app(db_path):
+    """Les handlers d'avant : sqlite3.connect() par requête, dans la boucle d'événements."""
+    from fastapi import FastAPI
+    app = FastAPI()
+
+    @app.get("/stats/dashboard")
+    async def get_dashboard_stats():
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+        SELECT SUM(packets_processed), SUM(flows_processed), SUM(anomalies_detected), SUM(ips_blocked)
+        FROM statistics WHERE timestamp > datetime('now', '-24 hours')
+        ''')
+        stats = cursor.fetchone()
+        cursor.execute("SELECT * FROM events WHERE event_type = 'anomaly' ORDER BY timestamp DESC LIMIT 10")
+        anomalies = cursor.fetchall()
+        cursor.execute("SELECT ip_address, blocked_at, reason FROM blocked_ips WHERE expires_at > datetime('now')")
+        blocked_ips = cursor.fetchall()
+        conn.close()
+        return {"total_packets": stats[0] or 0, "recent_anomalies": anomalies, "blocked_ips": blocked_ips}
+
+    @app.get("/events/recent")
+    async def get_recent_events(limit: int = 50):
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM events ORDER BY timestamp DESC LIMIT ?', (limit,))
+        events = cursor.fetchall()
+        conn.close()
+        return {"events": events}
+
+    return app
+
+def legacy_log_event(db_path, event_type, data):
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        'INSERT INTO events (event_type, severity, source_ip, description) VALUES (?, ?, ?, ?)',
+        (event_type, data.get('severity'), data.get('source_ip'), data.get('description'))
+    )
+    conn.commit()
+    conn.close()
+
+async def run_load(app, path, requests_count, concurrency):
+    """
+    Envoie requests_count requêtes GET avec `concurrency` clients.
+    Retourne (requêtes/s, plus long blocage de la boucle en ms).
+    """
+    import httpx
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        remaining = iter(range(requests_count))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        stall = 0.0
+        running = True
+
+        async def probe():
+            # Retard d'un sleep de 1 ms : temps pendant lequel la boucle était bloquée
+            nonlocal stall
+            while running:
+                before = time.perf_counter()
+                await asyncio.sleep(0.001)
+                stall = max(stall, time.perf_counter() - before - 0.001)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        running = False
+        await probe_task
+        return requests_count / elapsed, stall * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'API (requêtes/s)")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--events', type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'ngfw_congo.db')
+        os.environ['NGFW_DB_PATH'] = db_path
+        import api
+        from database import init_database, close_all
+        from event_writer import close_event_writer
+        init_database()
+        seed(db_path, args.events, 1000)
+
+        apps = {'avant': legacy_app(db_path), 'après': api.app}
+        for path in ('/stats/dashboard', '/events/recent'):
+            for label, app in apps.items():
+                rps, stall = asyncio.run(run_load(app, path, args.requests, args.concurrency))
+                print(f"{path:>18} {label:>6} : {rps:>10,.0f} requêtes/s, boucle bloquée jusqu'à {stall:.1f} ms")
+
+        data = {'severity': 'high', 'source_ip': '203.0.113.9', 'description': 'bench'}
+        for label, func in (('avant', lambda: legacy_log_event(db_path, 'anomaly', data)),
+                            ('après', lambda: api.log_event('anomaly', data))):
+            start = time.perf_counter()
+            for _ in range(2000):
+                func()
+            print(f"{'log_event':>18} {label:>6} : {(time.perf_counter() - start) / 2000 * 1e6:>10,.0f} µs/appel")
+        # Avant la suppression du dossier temporaire
+        close_event_writer()
+        close_all()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark du blocage : une règle nft par IP (un sous-processus par blocage,
+méthode historique) comparée au set nommé mis à jour par transactions
+groupées (IPBlocker). Mesure le débit en blocages/s.
+
+Utilise par défaut le faux binaire mock_nft.py : le débit mesuré est donc
+dominé par le coût de lancement de nft, comme en production.
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def synthetic_ips(count, first_octet=45):
+    """IPs publiques distinctes."""
+    return [f"{first_octet}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(count)]
+
+def bench_per_rule(nft_cmd, ips):
+    """Méthode historique : un `nft add rule ... ip saddr X drop` par IP."""
+    start = time.perf_counter()
+    for ip in ips:
+        subprocess.run(
+            nft_cmd + ['add', 'rule', 'ip', 'ngfw_congo', 'block_chain', 'ip', 'saddr', ip, 'counter', 'drop'],
+            check=True, capture_output=True
+        )
+    return len(ips) / (time.perf_counter() - start)
+
+def bench_named_set(nft_cmd, ips, batch_size):
+    """Set nommé : lots de `batch_size` blocages par transaction `nft -f -`."""
+    from blocker import IPBlocker
+    # Intervalle très long : seuls les flush explicites déclenchent une transaction
+    ip_blocker = IPBlocker(nft_cmd=' '.join(nft_cmd), flush_interval=3600, max_batch=len(ips) + 1)
+
+    start = time.perf_counter()
+    for i in range(0, len(ips), batch_size):
+        for ip in ips[i:i + batch_size]:
+            ip_blocker.block_ip(ip, "benchmark", 60)
+        ip_blocker.flush()
+    rate = len(ips) / (time.perf_counter() - start)
+    stats = ip_blocker.get_stats()
+    ip_blocker.close()
+    return rate, stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du blocage nftables (blocages/s)')
+    parser.add_argument('--ips', type=int, default=2000)
+    parser.add_argument('--per-rule-ips', type=int, default=200,
+                        help="IPs pour la méthode historique (un processus par IP)")
+    parser.add_argument('--nft-cmd', default=f"{sys.executable} mock_nft.py")
+    args = parser.parse_args()
+
+    nft_cmd = args.nft_cmd.split()
+    # Un avertissement par IP bloquée fausserait la mesure
+    logging.getLogger('NGFW-Blocker').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.setdefault('NGFW_MOCK_NFT_STATE', os.path.join(tmp, 'nft_state.json'))
+        # L'instance globale de blocker.py utilise aussi cette commande
+        os.environ['NGFW_NFT_CMD'] = args.nft_cmd
+        # Table et chaîne pour la méthode historique
+        from blocker import IPBlocker
+        IPBlocker(nft_cmd=args.nft_cmd, flush_interval=3600).close()
+
+        rate = bench_per_rule(nft_cmd, synthetic_ips(args.per_rule_ips, first_octet=31))
+        print(f"{'Règle par IP':>24} : {rate:>10,.0f} blocages/s")
+
+        for batch_size in (1, 100, 1000):
+            # Lots de 1 : autant de transactions que d'IPs, comme la méthode historique
+            ips = synthetic_ips(args.per_rule_ips if batch_size == 1 else args.ips)
+            rate, stats = bench_named_set(nft_cmd, ips, batch_size)
+            print(f"{f'Set nommé (lots de {batch_size})':>24} : {rate:>10,.0f} blocages/s"
+                  f"  ({stats['transactions']} transactions)")
+
+if __name__ == "__main__":
+    main()
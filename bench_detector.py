@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark du détecteur NGFW-Congo : débit (flux/s) du chemin unitaire
+predict() comparé au chemin vectorisé predict_batch() pour plusieurs tailles de lot,
+puis latence du scoring scikit-learn comparée au modèle compilé (forest_compiler),
+et gain du cache des verdicts sur un trafic répétitif.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from sklearn.ensemble import IsolationForest
+
+from detector import NGFWDetector, FEATURE_NAMES
+from forest_compiler import FlatForest, compile_forest
+from verdict_cache import VerdictCache
+
+def synthetic_flows(count, seed=0):
+    """Matrice N×F de flux synthétiques (ordre de FEATURE_NAMES)."""
+    rng = np.random.default_rng(seed)
+    duration = rng.exponential(5.0, count)
+    fwd_pkts = rng.integers(1, 200, count)
+    bwd_pkts = rng.integers(0, 200, count)
+    fwd_bytes = fwd_pkts * rng.integers(60, 1500, count)
+    bwd_bytes = bwd_pkts * rng.integers(60, 1500, count)
+    return np.column_stack([
+        duration, fwd_pkts, bwd_pkts, fwd_bytes, bwd_bytes,
+        (fwd_bytes + bwd_bytes) / duration, (fwd_pkts + bwd_pkts) / duration
+    ])
+
+def repetitive_traffic(count, repeat_ratio=0.8, services=200, seed=2):
+    """
+    Flux (clés, matrice) dont `repeat_ratio` reviennent de `services` flux
+    périodiques (mDNS, SSDP, sondes) aux features légèrement bruitées.
+    """
+    rng = np.random.default_rng(seed)
+    base = synthetic_flows(services, seed=3)
+    fresh = synthetic_flows(count, seed=4)
+    repeated = rng.random(count) < repeat_ratio
+    service = rng.integers(0, services, count)
+    X = np.where(repeated[:, None], base[service] * rng.normal(1.0, 0.01, (count, base.shape[1])), fresh)
+    keys = [
+        (f"10.0.0.{s % 250}", "224.0.0.251", 5353, 17) if r else (f"10.1.{i // 250 % 250}.{i % 250}", "93.184.216.34", 443, 6)
+        for i, (r, s) in enumerate(zip(repeated, service))
+    ]
+    return keys, X
+
+def load_detector(model_path):
+    """Charge le modèle donné, ou entraîne un modèle synthétique temporaire."""
+    if model_path and os.path.exists(model_path):
+        return NGFWDetector(model_path)
+
+    print("[*] Aucun modèle fourni : entraînement d'un Isolation Forest synthétique.")
+    model = IsolationForest(n_estimators=100, random_state=42).fit(synthetic_flows(10_000, seed=1))
+    with tempfile.NamedTemporaryFile(suffix='.pkl', delete=False) as f:
+        joblib.dump(model, f.name)
+    try:
+        return NGFWDetector(f.name)
+    finally:
+        os.unlink(f.name)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du détecteur (flux/s)')
+    parser.add_argument('--model', type=str, default='isolation_forest_model.pkl')
+    parser.add_argument('--flows', type=int, default=20_000, help='Nombre de flux par mesure')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 256, 4096])
+    args = parser.parse_args()
+
+    detector = load_detector(args.model)
+    X = synthetic_flows(args.flows)
+
+    # Chemin historique : un DataFrame et un decision_function par flux
+    sample = min(args.flows, 1000)
+    rows = [dict(zip(FEATURE_NAMES, row)) for row in X[:sample]]
+    start = time.perf_counter()
+    unit_scores = [detector.predict(row)['anomaly_score'] for row in rows]
+    elapsed = time.perf_counter() - start
+    print(f"{'predict()':>22} : {sample / elapsed:>12,.0f} flux/s")
+
+    # Vérifie l'équivalence des deux chemins
+    batch_scores, _ = detector.predict_batch(X[:sample])
+    assert np.allclose(unit_scores, batch_scores), "predict_batch diverge de predict()"
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, args.flows, batch_size):
+            detector.predict_batch(X[i:i + batch_size])
+        elapsed = time.perf_counter() - start
+        print(f"{f'predict_batch({batch_size})':>22} : {args.flows / elapsed:>12,.0f} flux/s")
+
+    # Scoring seul : IsolationForest.decision_function contre le modèle compilé
+    if isinstance(detector.model, FlatForest):
+        print("[*] Le détecteur utilise déjà le modèle compilé : comparaison scikit-learn ignorée.")
+        return
+    compiled = FlatForest(compile_forest(detector.model))
+    X_scaled = detector.transform(X)
+    assert np.array_equal(compiled.decision_function(X_scaled), detector.model.decision_function(X_scaled)), \
+        "le modèle compilé diverge de decision_function"
+
+    for name, scorer in (('sklearn', detector.model), ('compilé', compiled)):
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            for i in range(0, args.flows, batch_size):
+                scorer.decision_function(X_scaled[i:i + batch_size])
+            elapsed = time.perf_counter() - start
+            print(f"{f'{name}({batch_size})':>22} : {elapsed / args.flows * 1e6:>9.2f} µs/flux")
+
+    # Cache des verdicts sur un trafic répétitif (lots de 256, comme la détection).
+    # scikit-learn a un coût fixe par arbre et par appel : le gain se mesure
+    # surtout avec le modèle compilé, dont le coût est proportionnel aux flux.
+    keys, X_rep = repetitive_traffic(args.flows)
+    for name, scorer in (('sklearn', detector.model), ('compilé', compiled)):
+        detector.model = scorer
+        for label, cache in (('sans cache', None), ('cache', VerdictCache())):
+            detector.verdict_cache = cache
+            start = time.perf_counter()
+            decisions = []
+            for i in range(0, args.flows, 256):
+                decisions.append(detector.predict_batch(X_rep[i:i + 256], keys[i:i + 256])[1])
+            elapsed = time.perf_counter() - start
+            print(f"{f'{name}, {label}':>22} : {args.flows / elapsed:>12,.0f} flux/s")
+            if cache is None:
+                reference = np.concatenate(decisions)
+            else:
+                agreement = np.mean(np.concatenate(decisions) == reference)
+                print(f"{'':>22}   succès {cache.get_stats()['hit_rate']:.1%}, "
+                      f"décisions identiques {agreement:.2%}")
+
+if __name__ == "__main__":
+    main()
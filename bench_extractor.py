@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark de l'extracteur de features NGFW-Congo avec et sans statistiques
+étendues (FlowGenerator(extended_features=True)) : débit de process_frames
+(paquets/s) et mémoire par flux actif.
+"""
+
+import argparse
+import gc
+import struct
+import time
+import tracemalloc
+
+from feature_extractor import FlowGenerator, flow_to_features
+
+def tcp_frame(src_ip, dst_ip, src_port, dst_port, flags, payload=0):
+    """Trame Ethernet/IPv4/TCP minimale (sans options TCP)."""
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 40 + payload, 0, 0, 64, 6, 0,
+                     src_ip.to_bytes(4, 'big'), dst_ip.to_bytes(4, 'big'))
+    tcp = struct.pack('!HHIIBBHHH', src_port, dst_port, 0, 0, 5 << 4, flags, 65535, 0, 0)
+    return b'\x00' * 12 + b'\x08\x00' + ip + tcp + b'\x00' * payload
+
+def synthetic_batch(flows, packets_per_flow):
+    """
+    Lot [(trame, timestamp), ...] : `flows` connexions TCP entrelacées,
+    alternant client -> serveur et serveur -> client (SYN, ACK, PSH|ACK).
+    """
+    client = [tcp_frame(0x0A000000 | i, 0x5DB8D822, 1024 + i % 60000, 443, 0x18, 200)
+              for i in range(flows)]
+    server = [tcp_frame(0x5DB8D822, 0x0A000000 | i, 443, 1024 + i % 60000, 0x10, 1200)
+              for i in range(flows)]
+    syn = [tcp_frame(0x0A000000 | i, 0x5DB8D822, 1024 + i % 60000, 443, 0x02)
+           for i in range(flows)]
+    now = 1_700_000_000.0
+    batch = []
+    for p in range(packets_per_flow):
+        frames = syn if p == 0 else (client if p % 2 == 0 else server)
+        for i in range(flows):
+            batch.append((frames[i], now))
+            now += 1e-5
+    return batch
+
+def measure_throughput(batch, extended):
+    """Paquets/s de process_frames sur le lot complet."""
+    gen = FlowGenerator(inactive_timeout=3600, active_timeout=7200, extended_features=extended)
+    start = time.perf_counter()
+    for offset in range(0, len(batch), 1024):
+        gen.process_frames(batch[offset:offset + 1024])
+    elapsed = time.perf_counter() - start
+    return len(batch) / elapsed, gen
+
+def measure_memory(batch, flows, extended):
+    """Octets par flux actif (table + index + tas d'expiration)."""
+    gc.collect()
+    tracemalloc.start()
+    gen = FlowGenerator(inactive_timeout=3600, active_timeout=7200, extended_features=extended)
+    gen.process_frames(batch[:flows])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / len(gen.flows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark extracteur : features de base vs étendues')
+    parser.add_argument('--flows', type=int, default=20_000)
+    parser.add_argument('--packets', type=int, default=10, help='paquets par flux')
+    args = parser.parse_args()
+
+    batch = synthetic_batch(args.flows, args.packets)
+    for extended in (False, True):
+        label = 'étendues' if extended else 'base'
+        rate, gen = measure_throughput(batch, extended)
+        per_flow = measure_memory(batch, args.flows, extended)
+        print(f"{label:>10} : {rate:>10,.0f} paquets/s, {per_flow:>6.0f} octets/flux")
+
+    # Un flux complet, pour contrôle
+    flow_id, flow_data = next(iter(gen.flows.items()))
+    features = flow_to_features(flow_data)
+    print(f"{len(features)} features, ex. Flow IAT Mean={features['Flow IAT Mean']:.6f}s "
+          f"Fwd Pkt Len Std={features['Fwd Pkt Len Std']:.1f} SYN Flag Cnt={features['SYN Flag Cnt']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire de la table de flux NGFW-Congo.
+Mesure le nombre d'octets par flux actif (table + index + tas d'expiration)
+et le compare à l'ancien stockage en dictionnaires.
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from datetime import datetime
+
+from feature_extractor import FlowGenerator
+from flow_table import int_to_ip
+
+def synthetic_flows(count, seed=42):
+    """Génère `count` 5-tuples distinctes (IPs entières)."""
+    rng = random.Random(seed)
+    for i in range(count):
+        src_ip = 0x0A000000 | (i & 0xFFFFFF)        # 10.x.x.x
+        dst_ip = rng.getrandbits(32)
+        yield src_ip, dst_ip, 1024 + (i % 60000), rng.choice((53, 80, 443)), rng.choice((6, 17))
+
+def measure_flow_table(count):
+    """Octets par flux pour FlowGenerator (table compacte)."""
+    flows = list(synthetic_flows(count))
+    gc.collect()
+    tracemalloc.start()
+    gen = FlowGenerator()
+    now = 1_700_000_000.0
+    for i, (src_ip, dst_ip, src_port, dst_port, proto) in enumerate(flows):
+        gen._account(src_ip, dst_ip, src_port, dst_port, proto, 60, now + i * 1e-6)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(gen.flows) == count
+    return current / count
+
+def measure_legacy_dicts(count):
+    """Octets par flux pour l'ancien format {flow_id: dict}."""
+    flows = list(synthetic_flows(count))
+    gc.collect()
+    tracemalloc.start()
+    table = {}
+    for src_ip, dst_ip, src_port, dst_port, proto in flows:
+        flow_id = (int_to_ip(src_ip), int_to_ip(dst_ip), src_port, dst_port, proto)
+        timestamp = datetime.now()
+        table[flow_id] = {
+            'Start Time': timestamp,
+            'Last Seen': timestamp,
+            'Fwd Packets': 1,
+            'Bwd Packets': 0,
+            'Fwd Bytes': 60,
+            'Bwd Bytes': 0,
+            'Protocol': flow_id[4],
+            'Src IP': flow_id[0],
+            'Dst IP': flow_id[1],
+            'Src Port': flow_id[2],
+            'Dst Port': flow_id[3],
+        }
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current / count
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mémoire de la table de flux')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--no-legacy', action='store_true', help="Ne mesure pas l'ancien format")
+    args = parser.parse_args()
+
+    print(f"{'Flux':>10} | {'Table (o/flux)':>15} | {'Dicts (o/flux)':>15}")
+    print("-" * 47)
+    for count in args.sizes:
+        compact = measure_flow_table(count)
+        legacy = "-" if args.no_legacy else f"{measure_legacy_dicts(count):.0f}"
+        print(f"{count:>10} | {compact:>15.0f} | {legacy:>15}")
+
+if __name__ == "__main__":
+    main()
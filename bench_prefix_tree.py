@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark des recherches de préfixes : ancienne vérification des plages
+privées (objets ipaddress recréés à chaque appel) comparée au trie Patricia
+de prefix_tree.py, avec la liste d'autorisation puis avec 1M de préfixes.
+"""
+
+import argparse
+import random
+import time
+from ipaddress import ip_address as ip_obj
+
+from prefix_tree import PrefixSet, PrefixTree, parse_address
+from blocker import DEFAULT_ALLOWLIST
+
+def legacy_is_private_ip(ip_address):
+    """Ancienne version de IPBlocker.is_private_ip."""
+    private_ranges = [
+        ('10.0.0.0', '10.255.255.255'),
+        ('172.16.0.0', '172.31.255.255'),
+        ('192.168.0.0', '192.168.255.255')
+    ]
+    ip = ip_obj(ip_address)
+    for start, end in private_ranges:
+        if ip >= ip_obj(start) and ip <= ip_obj(end):
+            return True
+    return False
+
+def rate(label, func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+    print(f"{label:>34} : {len(items) / elapsed:>12,.0f} recherches/s ({elapsed / len(items) * 1e6:.2f} µs)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark du trie de préfixes (recherches/s)')
+    parser.add_argument('--prefixes', type=int, default=1_000_000)
+    parser.add_argument('--lookups', type=int, default=200_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    ips = [f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}"
+           for _ in range(args.lookups)]
+
+    rate('is_private_ip historique', legacy_is_private_ip, ips)
+    allowlist = PrefixSet(DEFAULT_ALLOWLIST)
+    rate('liste d\'autorisation (trie)', allowlist.__contains__, ips)
+
+    # Table de 1M préfixes de longueurs variées (/8 à /32)
+    tree = PrefixTree(32)
+    start = time.perf_counter()
+    for _ in range(args.prefixes):
+        length = rng.choice((8, 16, 20, 24, 24, 24, 28, 32, 32, 32))
+        tree.insert(rng.getrandbits(32), length)
+    print(f"{'construction':>34} : {len(tree):,} préfixes en {time.perf_counter() - start:.1f}s")
+
+    addresses = [parse_address(ip)[1] for ip in ips]
+    rate(f'{len(tree):,} préfixes (entiers)', tree.lookup, addresses)
+    rate(f'{len(tree):,} préfixes (chaînes)', lambda ip: tree.lookup(parse_address(ip)[1]), ips)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark du transport des flux entre processus : multiprocessing.Queue de
+dictionnaires de features (pickle) comparée à l'anneau en mémoire partagée
+(enregistrements binaires, voir shm_ring.py). Mesure le débit (flux/s) de bout
+en bout, du producteur jusqu'au consommateur.
+"""
+
+import argparse
+import multiprocessing
+import time
+from datetime import datetime
+
+from feature_extractor import flow_to_features
+from flow_table import int_to_ip
+from shm_ring import ShmFlowRing, POLICY_BLOCK
+
+def synthetic_raw(count):
+    """Flux bruts synthétiques (format FlowTable.pop_raw)."""
+    now = time.time()
+    return [
+        (now, now + 1.5, 10 + i % 50, 8, 1500 + i, 1200, 0x0A000001 + i, 0x5DB8D822, 40000 + i % 20000, 443, 6)
+        for i in range(count)
+    ]
+
+def raw_to_flow_data(raw):
+    """Format historique (flow_data) d'un flux brut, comme FlowTable.record."""
+    start, last, fwd_p, bwd_p, fwd_b, bwd_b, src_ip, dst_ip, src_port, dst_port, proto = raw
+    return {
+        'Start Time': datetime.fromtimestamp(start), 'Last Seen': datetime.fromtimestamp(last),
+        'Fwd Packets': fwd_p, 'Bwd Packets': bwd_p, 'Fwd Bytes': fwd_b, 'Bwd Bytes': bwd_b,
+        'Protocol': proto, 'Src IP': int_to_ip(src_ip), 'Dst IP': int_to_ip(dst_ip),
+        'Src Port': src_port, 'Dst Port': dst_port,
+    }
+
+def queue_consumer(queue, done):
+    count = 0
+    while queue.get() is not None:
+        count += 1
+    done.put(count)
+
+def ring_consumer(name, done):
+    ring = ShmFlowRing.attach(name)
+    count = 0
+    while True:
+        records = ring.read_batch(256, timeout=0.05)
+        count += len(records)
+        if len(records) == 0 and ring.closed and len(ring) == 0:
+            break
+    ring.close()
+    done.put(count)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Queue vs anneau shm (flux/s)')
+    parser.add_argument('--flows', type=int, default=200_000)
+    parser.add_argument('--ring-size', type=int, default=65536)
+    args = parser.parse_args()
+
+    raws = synthetic_raw(args.flows)
+    done = multiprocessing.Queue()
+
+    # Chemin historique : dictionnaires de features dans une Queue bornée
+    queue = multiprocessing.Queue(maxsize=1000)
+    consumer = multiprocessing.Process(target=queue_consumer, args=(queue, done))
+    consumer.start()
+    start = time.perf_counter()
+    for raw in raws:
+        queue.put(flow_to_features(raw_to_flow_data(raw)))
+    queue.put(None)
+    received = done.get()
+    elapsed = time.perf_counter() - start
+    consumer.join()
+    print(f"{'Queue (dict)':>16} : {received / elapsed:>12,.0f} flux/s")
+
+    # Anneau en mémoire partagée : tuples bruts empaquetés, lus par lots
+    with ShmFlowRing.create(args.ring_size, policy=POLICY_BLOCK) as ring:
+        consumer = multiprocessing.Process(target=ring_consumer, args=(ring.name, done))
+        consumer.start()
+        start = time.perf_counter()
+        ring.put_many(raws)
+        ring.close_producer()
+        received = done.get()
+        elapsed = time.perf_counter() - start
+        consumer.join()
+        print(f"{'Anneau shm':>16} : {received / elapsed:>12,.0f} flux/s")
+        print(f"{'':>16}   {ring.get_stats()}")
+
+if __name__ == "__main__":
+    main()
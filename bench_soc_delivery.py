@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Banc d'essai de la livraison des alertes SOC (webhook_delivery.py) contre un
+serveur HTTP local qui imite un webhook : agrégation d'une rafale, nouvelles
+tentatives sur 503/429, limite de débit et coût d'un envoi pour l'appelant
+quand le webhook est lent.
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from api import SOCIntegration
+from webhook_delivery import WebhookDelivery
+
+class StubWebhook(BaseHTTPRequestHandler):
+    """Webhook factice : enregistre les messages, échoue ou ralentit sur demande."""
+    server_version = "StubWebhook/1.0"
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests += 1
+            failing = server.failures > 0
+            if failing:
+                server.failures -= 1
+        time.sleep(server.delay)
+        if failing:
+            self.send_response(server.failure_status)
+            self.send_header('Retry-After', '0.2')
+            self.end_headers()
+            return
+        with server.lock:
+            server.messages.append((time.monotonic(), json.loads(body)))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+def start_stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubWebhook)
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.failures = 0
+    server.failure_status = 503
+    server.delay = 0.0
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/hook"
+
+def reset(server, failures=0, status=503, delay=0.0):
+    with server.lock:
+        server.requests = 0
+        server.failures = failures
+        server.failure_status = status
+        server.delay = delay
+        server.messages = []
+
+def alert(i):
+    return {'source_ip': f"203.0.113.{i % 7}", 'destination_ip': '10.0.0.5',
+            'protocol': '6', 'anomaly_score': -0.2 - (i % 10) / 100}
+
+def main():
+    parser = argparse.ArgumentParser(description='Livraison des alertes SOC contre un webhook local')
+    parser.add_argument('--burst', type=int, default=500)
+    args = parser.parse_args()
+
+    server, url = start_stub()
+    soc = SOCIntegration()
+    make = lambda **kw: WebhookDelivery({'slack': url}, soc._format_payload, soc._format_digest, **kw).start()
+
+    # 1. Rafale : une seule fenêtre, donc un seul message de synthèse
+    reset(server)
+    delivery = make(window=1.0)
+    start = time.perf_counter()
+    for i in range(args.burst):
+        delivery.submit('slack', alert(i))
+    submit_us = (time.perf_counter() - start) / args.burst * 1e6
+    delivery.close()
+    print(f"rafale de {args.burst}: {len(server.messages)} message(s), {submit_us:.1f} µs/alerte, "
+          f"{delivery.get_stats()['slack']}")
+    print(f"   {server.messages[0][1]['text']}")
+    assert len(server.messages) == 1 and server.messages[0][1]['text'].endswith(f"{args.burst} alertes")
+
+    # 2. Webhook en erreur (503 puis 429 avec Retry-After) : livré après nouvelles tentatives
+    for status in (503, 429):
+        reset(server, failures=2, status=status)
+        delivery = make(window=0.1, retries=3, backoff=0.1)
+        delivery.submit('slack', alert(0))
+        delivery.close()
+        stats = delivery.get_stats()['slack']
+        print(f"{status} x2: {server.requests} requêtes, {len(server.messages)} livré(s), {stats}")
+        assert len(server.messages) == 1 and stats['retries'] == 2
+
+    # 3. Limite de débit : 2 messages/s au plus, hors rafale initiale
+    reset(server)
+    delivery = make(window=0.02, rate=2.0, burst=1)
+    for i in range(40):
+        delivery.submit('slack', alert(i))
+        time.sleep(0.05)
+    delivery.close()
+    times = [t for t, _ in server.messages]
+    rate = (len(times) - 1) / (times[-1] - times[0])
+    print(f"limite 2/s: {len(times)} messages pour 40 alertes, {rate:.2f} messages/s, {delivery.get_stats()['slack']}")
+    assert rate <= 2.2
+
+    # 4. Webhook lent (2 s par requête) : l'appelant n'attend jamais
+    reset(server, delay=2.0)
+    delivery = make(window=0.05)
+    start = time.perf_counter()
+    for i in range(100):
+        delivery.submit('slack', alert(i))
+        time.sleep(0.001)
+    worst = (time.perf_counter() - start) / 100 * 1e3
+    delivery.close(timeout=10)
+    print(f"webhook lent: {worst:.2f} ms par envoi côté appelant (boucle + pause de 1 ms), "
+          f"{len(server.messages)} message(s)")
+
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
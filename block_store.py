@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Journal persistant des blocages pour NGFW-Congo.
+
+Les blocages et déblocages sont écrits dans la table `blocked_ips` de la base
+partagée (database.py), lue aussi par l'API. L'écriture est différée : les
+opérations sont accumulées en mémoire puis validées par lots, en une seule
+transaction SQLite par intervalle.
+"""
+
+import time
+import threading
+import logging
+
+from database import connect, init_database, PRAGMAS
+
+logger = logging.getLogger('NGFW-BlockStore')
+
+ORIGIN_BLOCKER = 'blocker'
+ORIGIN_API = 'api'
+
+# Une ligne par IP : un nouveau blocage met à jour la ligne existante
+_UPSERT_BLOCK = '''
+INSERT INTO blocked_ips (ip_address, blocked_at, reason, expires_at, updated_at, origin)
+VALUES (?, datetime(?, 'unixepoch'), ?, datetime(?, 'unixepoch'), ?, ?)
+ON CONFLICT(ip_address) DO UPDATE SET
+    blocked_at = excluded.blocked_at,
+    reason = excluded.reason,
+    expires_at = excluded.expires_at,
+    updated_at = excluded.updated_at,
+    origin = excluded.origin
+'''
+
+# Un déblocage fait expirer la ligne : les autres processus le voient passer
+_EXPIRE_BLOCK = '''
+UPDATE blocked_ips SET expires_at = datetime(?, 'unixepoch'), updated_at = ?, origin = ?
+WHERE ip_address = ?
+'''
+
+_SELECT_ACTIVE = '''
+SELECT ip_address, reason, CAST(strftime('%s', blocked_at) AS INTEGER),
+       CAST(strftime('%s', expires_at) AS INTEGER)
+FROM blocked_ips
+WHERE expires_at > datetime(?, 'unixepoch')
+'''
+
+_SELECT_CHANGES = '''
+SELECT ip_address, reason, CAST(strftime('%s', blocked_at) AS INTEGER),
+       CAST(strftime('%s', expires_at) AS INTEGER), updated_at
+FROM blocked_ips
+WHERE updated_at > ? AND origin IS NOT ?
+ORDER BY updated_at
+'''
+
+class BlockStore:
+    """
+    Journal à écriture différée des blocages.
+
+    Usage :
+        store = BlockStore()
+        store.record_block('203.0.113.7', 'Anomalie', expires_at=time.time() + 3600)
+        store.record_unblock(['203.0.113.7'])
+        store.flush()                     # sinon fait par le thread toutes les flush_interval s
+        store.load_active()               # [(ip, reason, blocked_at, expires_at)] en epoch
+    """
+    def __init__(self, db_path=None, flush_interval=1.0, origin=ORIGIN_BLOCKER, background=True):
+        self.db_path = db_path
+        self.origin = origin
+        self.flush_interval = flush_interval
+        init_database(db_path)
+        # Connexion réservée aux écritures (protégée par _flush_lock, utilisée par le thread)
+        self.conn = connect(db_path, check_same_thread=False)
+        for pragma in PRAGMAS:
+            self.conn.execute(pragma)
+
+        self.lock = threading.Lock()
+        # Opérations en attente : {ip: (reason, blocked_at, expires_at) ou None pour un déblocage}
+        self.pending = {}
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = True
+
+        self.stats = {'commits': 0, 'rows_written': 0, 'errors': 0}
+
+        self._writer = None
+        if background:
+            self._writer = threading.Thread(target=self._flush_loop, daemon=True)
+            self._writer.start()
+
+    def record_block(self, ip_address, reason, expires_at, blocked_at=None):
+        """Enregistre un blocage (epoch d'expiration). Écrit au prochain flush."""
+        with self.lock:
+            self.pending[ip_address] = (reason, blocked_at or time.time(), expires_at)
+
+    def record_unblock(self, ip_addresses):
+        """Enregistre le déblocage d'une liste d'IPs. Écrit au prochain flush."""
+        with self.lock:
+            for ip in ip_addresses:
+                self.pending[ip] = None
+
+    def flush(self):
+        """Valide les opérations en attente en une transaction. Retourne le nombre de lignes."""
+        with self._flush_lock:
+            with self.lock:
+                operations, self.pending = self.pending, {}
+            if not operations:
+                return 0
+
+            now = time.time()
+            blocks = [
+                (ip, op[1], op[0], op[2], now, self.origin)
+                for ip, op in operations.items() if op is not None
+            ]
+            unblocks = [(now, now, self.origin, ip) for ip, op in operations.items() if op is None]
+            try:
+                with self.conn:
+                    if blocks:
+                        self.conn.executemany(_UPSERT_BLOCK, blocks)
+                    if unblocks:
+                        self.conn.executemany(_EXPIRE_BLOCK, unblocks)
+            except Exception as e:
+                # Les opérations sont remises en attente, sauf si elles ont été remplacées entre-temps
+                self.stats['errors'] += 1
+                logger.error(f"Erreur d'écriture du journal des blocages ({len(operations)} IPs): {e}")
+                with self.lock:
+                    for ip, op in operations.items():
+                        self.pending.setdefault(ip, op)
+                return 0
+
+            self.stats['commits'] += 1
+            self.stats['rows_written'] += len(operations)
+            return len(operations)
+
+    def _flush_loop(self):
+        """Thread d'écriture différée."""
+        while self._running:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur dans le thread du journal des blocages: {e}")
+
+    def load_active(self):
+        """Blocages encore actifs : [(ip, reason, blocked_at, expires_at)], dates en epoch."""
+        conn = connect(self.db_path)
+        try:
+            return conn.execute(_SELECT_ACTIVE, (time.time(),)).fetchall()
+        finally:
+            conn.close()
+
+    def changes_since(self, since):
+        """
+        Lignes modifiées par un autre processus (l'API) après `since` (epoch de
+        updated_at). Retourne ([(ip, reason, blocked_at, expires_at)], nouveau since).
+        """
+        conn = connect(self.db_path)
+        try:
+            rows = conn.execute(_SELECT_CHANGES, (since, self.origin)).fetchall()
+        finally:
+            conn.close()
+        if rows:
+            since = rows[-1][4]
+        return [row[:4] for row in rows], since
+
+    def close(self):
+        """Arrête le thread d'écriture après un dernier flush."""
+        self._running = False
+        self._wakeup.set()
+        if self._writer is not None:
+            self._writer.join(timeout=5)
+        self.flush()
+        self.conn.close()
+
+    def get_stats(self):
+        """Statistiques du journal."""
+        with self.lock:
+            return dict(self.stats, pending=len(self.pending))
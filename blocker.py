@@ -2,147 +2,647 @@
 """
 Module de Blocage Actif pour NGFW-Congo.
 Utilise nftables pour bloquer dynamiquement les IP malveillantes.
+
+Les IP bloquées sont les éléments d'un set nommé avec le flag `timeout` :
+une seule règle `ip saddr @blocked_ips drop` (recherche O(1) dans le noyau),
+et chaque élément expire tout seul au bout de sa durée de blocage. Les ajouts
+et retraits sont regroupés en une transaction `nft -f -` par intervalle.
+Quand assez d'hôtes d'un même /24 sont bloqués, ils sont remplacés par un
+seul élément CIDR (set avec le flag `interval`).
 """
 
+import heapq
+import os
+import shlex
 import subprocess
 import threading
 import time
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from prefix_tree import PrefixSet, PrefixTree, parse_address, parse_prefix, format_prefix
 
 logger = logging.getLogger('NGFW-Blocker')
 
+# Commande nft (surchargeable, par exemple par "python mock_nft.py" pour les tests)
+DEFAULT_NFT_CMD = os.environ.get('NGFW_NFT_CMD', 'sudo nft')
+
+TABLE = 'ngfw_congo'
+CHAIN = 'block_chain'
+BLOCK_SET = 'blocked_ips'
+
+# Plages jamais bloquées (privées, boucle locale, lien local, CGNAT, multicast)
+DEFAULT_ALLOWLIST = [
+    '10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16',
+    '127.0.0.0/8', '169.254.0.0/16', '100.64.0.0/10', '224.0.0.0/4',
+    '::1/128', 'fc00::/7', 'fe80::/10',
+]
+
 class IPBlocker:
-    def __init__(self):
-        self.blocked_ips = {}  # {ip: (timestamp, reason)}
+    def __init__(self, nft_cmd=None, flush_interval=0.5, max_batch=5000,
+                 allowlist=None, aggregate_threshold=16, aggregate_prefix=24):
+        self.blocked_ips = {}  # {ip ou réseau CIDR: (timestamp, reason)}
+        self.expires_at = {}   # {ip: échéance (time.monotonic())}
         self.lock = threading.Lock()
+        # Échéancier : tas de (échéance, ip). Un blocage rafraîchi ou levé laisse
+        # une entrée périmée, ignorée quand elle ne correspond plus à expires_at
+        self._deadlines = []
+        self._expiry = threading.Condition(self.lock)
+
+        self.nft_cmd = shlex.split(nft_cmd or DEFAULT_NFT_CMD)
+        # Opérations en attente de la prochaine transaction : {ip: timeout en secondes, ou None pour un retrait}
+        self.pending = {}
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        # Transactions échouées d'affilée : espace les nouvelles tentatives
+        self._failures = 0
+        self._running = True
+        # Processus propriétaire : les threads ne survivent pas au fork, l'enfant
+        # doit créer son propre bloqueur (voir get_blocker)
+        self.pid = os.getpid()
+        # Handle nftables de la règle `ip saddr @blocked_ips drop`. Les éléments du
+        # set n'ont pas de handle : ils sont adressés directement par leur clé (l'IP)
+        self.rule_handle = None
+        # Journal persistant (block_store.BlockStore), voir attach_store()
+        self.store = None
+        self._sync_thread = None
+
+        # Liste d'autorisation (trie de préfixes) : DEFAULT_ALLOWLIST + plages supplémentaires
+        self.allowlist = PrefixSet(DEFAULT_ALLOWLIST + list(allowlist or []))
+        # Agrégation : dès aggregate_threshold hôtes bloqués dans un même
+        # /aggregate_prefix, ils sont remplacés par le réseau (0 = désactivée)
+        self.aggregate_threshold = aggregate_threshold
+        self.aggregate_prefix = aggregate_prefix
+        self._aggregate_mask = ((1 << aggregate_prefix) - 1) << (32 - aggregate_prefix)
+        self._prefix_hosts = {}                 # {réseau entier: {hôtes bloqués}}
+        self.blocked_prefixes = PrefixTree(32)  # réseaux CIDR bloqués -> clé 'a.b.c.0/24'
+        # Hôtes couverts par chaque agrégat, pour le scinder au déblocage de l'un
+        # d'eux : {réseau agrégé: {hôte: (échéance, blocked_at, reason)}}
+        self._aggregate_members = {}
+
+        # Statistiques
+        self.stats = {
+            'transactions': 0,
+            'failed_transactions': 0,
+            'elements_added': 0,
+            'elements_deleted': 0,
+            'expired': 0,
+            'aggregated': 0,
+            'rejected_elements': 0,  # refusés par nft un par un, abandonnés
+        }
+
         self.initialize_nftables()
-        
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        self._scheduler = threading.Thread(target=self._expiry_loop, daemon=True)
+        self._scheduler.start()
+
+    def run_nft(self, script, echo=False):
+        """
+        Exécute un script nft en une seule transaction atomique (`nft -f -`).
+        Avec echo=True, nft réaffiche les objets créés avec leur handle.
+        """
+        flags = ['--echo', '--handle'] if echo else []
+        return subprocess.run(
+            self.nft_cmd + flags + ['-f', '-'], input=script, check=True, capture_output=True, text=True
+        )
+
+    @staticmethod
+    def _parse_rule_handle(output):
+        """Handle de la règle de blocage dans une sortie `nft --handle` (ou None)."""
+        for line in output.splitlines():
+            if f"@{BLOCK_SET}" in line and '# handle ' in line:
+                return int(line.rsplit('# handle ', 1)[1].split()[0])
+        return None
+
     def initialize_nftables(self):
-        """Initialise la table et chaîne nftables pour NGFW-Congo."""
+        """
+        Initialise la table, la chaîne, le set et la règle de blocage de
+        NGFW-Congo. Retourne True si nft est utilisable et la configuration en place.
+        """
         try:
-            # Création de la table et chaîne nftables dédiées
-            subprocess.run([
-                'sudo', 'nft', 'add', 'table', 'ip', 'ngfw_congo'
-            ], check=True, capture_output=True)
-            
-            subprocess.run([
-                'sudo', 'nft', 'add', 'chain', 'ip', 'ngfw_congo', 'block_chain', 
-                '{ type filter hook input priority 0; policy accept; }'
-            ], check=True, capture_output=True)
-            
-            logger.info("Table et chaîne nftables initialisées.")
-            
+            self.run_nft(
+                f"add table ip {TABLE}\n"
+                f"add chain ip {TABLE} {CHAIN} {{ type filter hook input priority 0; policy accept; }}\n"
+                f"add set ip {TABLE} {BLOCK_SET} {{ type ipv4_addr; flags interval, timeout; }}\n"
+            )
+            # La règle n'est ajoutée que si elle n'existe pas encore : les autres
+            # règles éventuelles de la chaîne ne sont pas touchées
+            listing = subprocess.run(
+                self.nft_cmd + ['--handle', 'list', 'chain', 'ip', TABLE, CHAIN],
+                check=True, capture_output=True, text=True
+            )
+            self.rule_handle = self._parse_rule_handle(listing.stdout)
+            if self.rule_handle is None:
+                result = self.run_nft(f"add rule ip {TABLE} {CHAIN} ip saddr @{BLOCK_SET} counter drop\n", echo=True)
+                self.rule_handle = self._parse_rule_handle(result.stdout)
+            logger.info(f"Table, chaîne et set nftables initialisés (règle handle {self.rule_handle}).")
+            return True
+
         except subprocess.CalledProcessError as e:
-            logger.warning(f"nftables déjà configuré ou erreur: {e.stderr.decode()}")
-    
+            logger.warning(f"nftables déjà configuré ou erreur: {e.stderr}")
+        except OSError as e:
+            logger.error(f"Impossible d'exécuter nft ({' '.join(self.nft_cmd)}): {e}")
+        return False
+
+    def remove_block_rule(self):
+        """Retire la règle de blocage par son handle (le set et son contenu sont conservés)."""
+        if self.rule_handle is None:
+            return False
+        try:
+            self.run_nft(f"delete rule ip {TABLE} {CHAIN} handle {self.rule_handle}\n")
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.error(f"Erreur lors du retrait de la règle {self.rule_handle}: {getattr(e, 'stderr', e)}")
+            return False
+        self.rule_handle = None
+        return True
+
     def block_ip(self, ip_address, reason="Anomalie détectée", duration_minutes=60):
         """
         Bloque une IP avec nftables pour une durée spécifiée.
+        Le blocage est appliqué par la prochaine transaction (au plus flush_interval secondes).
         """
+        try:
+            version, _ = parse_address(ip_address)
+        except ValueError:
+            version = None
+        if version != 4:
+            logger.error(f"Adresse IPv4 invalide, blocage ignoré: {ip_address}")
+            return False
+
         if self.is_private_ip(ip_address):
             logger.warning(f"Tentative de blocage d'IP privée ignorée: {ip_address}")
             return False
-            
+
+        timeout = max(1, int(duration_minutes * 60))
         with self.lock:
-            if ip_address in self.blocked_ips:
-                # IP déjà bloquée, on met à jour le timestamp
-                self.blocked_ips[ip_address] = (datetime.now(), reason)
-                return True
-                
-            try:
-                # Ajoute la règle de blocage
-                subprocess.run([
-                    'sudo', 'nft', 'add', 'rule', 'ip', 'ngfw_congo', 'block_chain',
-                    'ip', 'saddr', ip_address, 'counter', 'drop'
-                ], check=True, capture_output=True)
-                
-                self.blocked_ips[ip_address] = (datetime.now(), reason)
-                logger.warning(f"🚫 IP BLOQUÉE: {ip_address} - Raison: {reason}")
-                return True
-                
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Erreur lors du blocage de {ip_address}: {e.stderr.decode()}")
+            new_block = self._add_block(ip_address, reason, timeout, datetime.now(), persist=True)
+            full = len(self.pending) >= self.max_batch
+
+        if full:
+            self._wakeup.set()
+        if new_block:
+            logger.warning(f"🚫 IP BLOQUÉE: {ip_address} - Raison: {reason}")
+        return True
+
+    def _add_block(self, ip_address, reason, timeout, blocked_at, persist=False):
+        """
+        Enregistre un blocage (IP ou réseau CIDR) et le met en attente de
+        transaction (appelé avec self.lock). Retourne True si c'est un nouveau blocage.
+        """
+        if '/' in ip_address:
+            _, network, length = parse_prefix(ip_address)
+            ip_address = format_prefix(4, network, length)
+            self._absorb_hosts(network, length)
+            self.blocked_prefixes.insert(network, length, ip_address)
+            address = None
+        else:
+            _, address = parse_address(ip_address)
+            covering = self.blocked_prefixes.lookup(address)
+            if covering is not None:
+                # Déjà couverte par un réseau bloqué ; retenue si c'est un agrégat
+                members = self._aggregate_members.get(covering[2])
+                if members is not None:
+                    members[ip_address] = (time.monotonic() + timeout, blocked_at, reason)
                 return False
-    
+
+        new_block = self._set_block(ip_address, reason, timeout, blocked_at, persist)
+        if address is not None and new_block:
+            network = address & self._aggregate_mask
+            hosts = self._prefix_hosts.setdefault(network, set())
+            hosts.add(ip_address)
+            if self.aggregate_threshold and len(hosts) >= self.aggregate_threshold:
+                self._aggregate(network, reason, timeout, blocked_at)
+        return new_block
+
+    def _set_block(self, key, reason, timeout, blocked_at, persist):
+        """Met à jour l'état local, la transaction en attente et l'échéancier d'une clé du set."""
+        new_block = key not in self.blocked_ips
+        # IP déjà bloquée : on met à jour le timestamp et l'échéance
+        deadline = time.monotonic() + timeout
+        self.blocked_ips[key] = (blocked_at, reason)
+        self.expires_at[key] = deadline
+        self.pending[key] = timeout
+        self._schedule(key, deadline)
+        if persist and self.store is not None:
+            self.store.record_block(key, reason, time.time() + timeout)
+        return new_block
+
+    def _aggregate(self, network, reason, timeout, blocked_at):
+        """Remplace les hôtes bloqués d'un réseau par un seul élément CIDR (appelé avec self.lock)."""
+        cidr = format_prefix(4, network, self.aggregate_prefix)
+        if self.allowlist.overlaps(cidr):
+            # Le réseau contient une plage autorisée : les hôtes restent bloqués un par un
+            return
+
+        now = time.monotonic()
+        hosts = self._absorb_hosts(network, self.aggregate_prefix)
+        # Le réseau reste bloqué au moins aussi longtemps que le dernier de ses hôtes
+        timeout = max([timeout] + [int(deadline - now) for deadline, _, _ in hosts.values()])
+
+        self.blocked_prefixes.insert(network, self.aggregate_prefix, cidr)
+        self._aggregate_members[cidr] = hosts
+        self._set_block(cidr, f"{reason} (agrégat de {len(hosts)} IPs)", timeout, blocked_at, persist=True)
+        self.stats['aggregated'] += 1
+        logger.warning(f"🚫 RÉSEAU BLOQUÉ: {cidr} ({len(hosts)} IPs bloquées)")
+
+    def _absorb_hosts(self, network, length):
+        """
+        Retire du set les hôtes bloqués couverts par un réseau qui va y entrer
+        (appelé avec self.lock). Retourne {hôte: (échéance, blocked_at, reason)}.
+        """
+        mask = ((1 << length) - 1) << (32 - length)
+        if length >= self.aggregate_prefix:
+            groups = [network & self._aggregate_mask]
+        else:
+            groups = [group for group in self._prefix_hosts if group & mask == network]
+
+        absorbed = {}
+        for group in groups:
+            hosts = self._prefix_hosts.get(group, ())
+            covered = [host for host in hosts if parse_address(host)[1] & mask == network]
+            for host in covered:
+                absorbed[host] = (self.expires_at[host],) + self.blocked_ips[host]
+                del self.blocked_ips[host]
+                del self.expires_at[host]
+                self.pending[host] = None
+            hosts = set(hosts).difference(covered)
+            if hosts:
+                self._prefix_hosts[group] = hosts
+            else:
+                self._prefix_hosts.pop(group, None)
+        if absorbed and self.store is not None:
+            self.store.record_unblock(list(absorbed))
+        return absorbed
+
+    def _drop_block(self, key):
+        """Retire une clé (IP ou réseau) de l'état local (appelé avec self.lock)."""
+        del self.blocked_ips[key]
+        del self.expires_at[key]
+        if '/' in key:
+            _, network, length = parse_prefix(key)
+            self.blocked_prefixes.remove(network, length)
+            self._aggregate_members.pop(key, None)
+        else:
+            _, address = parse_address(key)
+            hosts = self._prefix_hosts.get(address & self._aggregate_mask)
+            if hosts is not None:
+                hosts.discard(key)
+                if not hosts:
+                    del self._prefix_hosts[address & self._aggregate_mask]
+
+    def _schedule(self, ip_address, deadline):
+        """Ajoute une échéance au tas (appelé avec self.lock)."""
+        heapq.heappush(self._deadlines, (deadline, ip_address))
+        if len(self._deadlines) > 2 * len(self.expires_at) + 1024:
+            # Trop d'entrées périmées : reconstruction en O(n)
+            self._deadlines = [(expires, ip) for ip, expires in self.expires_at.items()]
+            heapq.heapify(self._deadlines)
+        if self._deadlines[0][1] == ip_address:
+            # Nouvelle échéance la plus proche : réveille l'échéancier
+            self._expiry.notify()
+
     def unblock_ip(self, ip_address):
         """Débloque une IP."""
+        return self.unblock_ips([ip_address]) == 1
+
+    def unblock_ips(self, ip_addresses, persist=True):
+        """
+        Débloque un ensemble d'IPs en une seule transaction nft, appliquée
+        immédiatement. Une IP couverte par un réseau bloqué est débloquée en
+        levant ce réseau (voir _lift_prefix). Retourne le nombre d'IPs débloquées.
+        """
         with self.lock:
-            if ip_address in self.blocked_ips:
+            unblocked = []
+            for ip in dict.fromkeys(ip_addresses):
+                if ip in self.blocked_ips:
+                    self._drop_block(ip)
+                    self.pending[ip] = None
+                    unblocked.append(ip)
+                    continue
                 try:
-                    # Trouve et supprime la règle correspondante
-                    result = subprocess.run([
-                        'sudo', 'nft', 'list', 'ruleset'
-                    ], capture_output=True, text=True)
-                    
-                    rules = result.stdout.split('\n')
-                    for i, rule in enumerate(rules):
-                        if ip_address in rule and 'drop' in rule:
-                            # Supprime la règle par son handle
-                            subprocess.run([
-                                'sudo', 'nft', 'delete', 'rule', 'ip', 'ngfw_congo', 
-                                'block_chain', 'handle', str(i+1)
-                            ], check=True, capture_output=True)
-                    
-                    del self.blocked_ips[ip_address]
-                    logger.info(f"✅ IP DÉBLOQUÉE: {ip_address}")
-                    return True
-                    
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"Erreur lors du déblocage de {ip_address}: {e.stderr.decode()}")
-                    return False
-        return False
-    
+                    version, address = parse_address(ip)
+                except ValueError:
+                    continue
+                covering = self.blocked_prefixes.lookup(address) if version == 4 else None
+                if covering is not None:
+                    self._lift_prefix(covering[2], ip)
+                    unblocked.append(ip)
+
+        if unblocked:
+            if persist and self.store is not None:
+                self.store.record_unblock(unblocked)
+            self.flush()
+            for ip in unblocked:
+                logger.info(f"✅ IP DÉBLOQUÉE: {ip}")
+        return len(unblocked)
+
+    def _lift_prefix(self, cidr, ip_address):
+        """
+        Débloque `ip_address`, couverte par le réseau bloqué `cidr` (appelé avec
+        self.lock). Un agrégat est scindé : le réseau est retiré et ses autres
+        hôtes sont rebloqués avec leur durée restante. Un réseau bloqué
+        explicitement, ou un agrégat rechargé du journal (hôtes inconnus), est
+        levé en entier.
+        """
+        members = self._aggregate_members.get(cidr)
+        self._drop_block(cidr)
+        self.pending[cidr] = None
+        if self.store is not None:
+            self.store.record_unblock([cidr])
+        if members is None:
+            logger.warning(f"✅ RÉSEAU DÉBLOQUÉ en entier: {cidr} (contient {ip_address})")
+            return
+
+        now = time.monotonic()
+        restored = 0
+        for host, (deadline, blocked_at, reason) in members.items():
+            remaining = int(deadline - now)
+            if host == ip_address or remaining <= 0:
+                continue
+            # Sans repasser par _add_block : le réseau ne doit pas être réagrégé aussitôt
+            self._set_block(host, reason, remaining, blocked_at, persist=True)
+            self._prefix_hosts.setdefault(parse_address(host)[1] & self._aggregate_mask, set()).add(host)
+            restored += 1
+        logger.warning(f"✅ Agrégat {cidr} scindé pour débloquer {ip_address}: {restored} IP(s) rebloquée(s)")
+
+    def _build_script(self, operations):
+        """
+        Script nft d'un lot d'opérations {ip ou réseau: timeout ou None}.
+
+        Chaque clé est d'abord ajoutée sans timeout (sans effet si elle est déjà
+        dans le set), puis retirée : la suppression ne peut donc pas échouer si
+        le noyau a déjà fait expirer l'élément. Un blocage est ensuite rajouté
+        avec son timeout, ce qui rafraîchit aussi l'échéance d'un élément existant.
+        Les retraits passent en premier : les hôtes absorbés par un réseau
+        agrégé quittent le set avant que le réseau n'y entre (pas de chevauchement).
+        """
+        removed = [key for key, timeout in operations.items() if timeout is None]
+        blocked = [key for key, timeout in operations.items() if timeout is not None]
+        lines = []
+        for keys in (removed, blocked):
+            if keys:
+                elements = ', '.join(keys)
+                lines.append(f"add element ip {TABLE} {BLOCK_SET} {{ {elements} }}")
+                lines.append(f"delete element ip {TABLE} {BLOCK_SET} {{ {elements} }}")
+        if blocked:
+            adds = ', '.join(f"{key} timeout {operations[key]}s" for key in blocked)
+            lines.append(f"add element ip {TABLE} {BLOCK_SET} {{ {adds} }}")
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Applique immédiatement les opérations en attente. Retourne le nombre appliqué."""
+        with self._flush_lock:
+            with self.lock:
+                operations, self.pending = self.pending, {}
+            if not operations:
+                return 0
+
+            try:
+                self.run_nft(self._build_script(operations))
+                applied, rejected = operations, {}
+            except (subprocess.CalledProcessError, OSError) as e:
+                logger.error(f"Erreur nft pour un lot de {len(operations)} IPs: {getattr(e, 'stderr', e)}")
+                applied = rejected = {}
+                # nft fonctionne et le set est en place : l'erreur vient d'éléments
+                # refusés (chevauchement d'intervalles, clé invalide), isolés par dichotomie
+                if isinstance(e, subprocess.CalledProcessError) and self.initialize_nftables():
+                    applied, rejected = self._apply_split(operations)
+                if not applied and len(operations) > 1:
+                    # Rien ne passe : erreur d'ensemble plutôt qu'éléments refusés
+                    rejected = {}
+                for key, timeout in rejected.items():
+                    logger.error(f"Élément refusé par nft, abandonné: {key} "
+                                 f"({'retrait' if timeout is None else 'blocage'})")
+
+            failed = {key: timeout for key, timeout in operations.items()
+                      if key not in applied and key not in rejected}
+            added = sum(1 for timeout in applied.values() if timeout is not None)
+            with self.lock:
+                self.stats['transactions'] += 1 if applied else 0
+                self.stats['elements_added'] += added
+                self.stats['elements_deleted'] += len(applied) - added
+                self.stats['rejected_elements'] += len(rejected)
+                for key, timeout in rejected.items():
+                    # Blocage refusé : l'état local ne doit pas le donner pour actif
+                    if timeout is not None and key not in self.pending and key in self.blocked_ips:
+                        self._drop_block(key)
+                if failed:
+                    self.stats['failed_transactions'] += 1
+                    self._failures += 1
+                    # Remises en attente pour la transaction suivante, sauf si remplacées entre-temps
+                    for key, timeout in failed.items():
+                        self.pending.setdefault(key, timeout)
+                else:
+                    self._failures = 0
+            return len(applied)
+
+    def _apply_split(self, operations):
+        """
+        Applique par moitiés un lot refusé par nft, jusqu'à isoler les éléments
+        refusés seuls, qui sont abandonnés. Les retraits passent avant les ajouts,
+        comme dans une transaction complète (voir _build_script). Retourne
+        (opérations appliquées, opérations refusées).
+        """
+        items = sorted(operations.items(), key=lambda item: item[1] is not None)
+        if len(items) == 1:
+            return {}, operations
+
+        applied, rejected = {}, {}
+        middle = len(items) // 2
+        for part in (dict(items[:middle]), dict(items[middle:])):
+            try:
+                self.run_nft(self._build_script(part))
+                applied.update(part)
+            except (subprocess.CalledProcessError, OSError):
+                part_applied, part_rejected = self._apply_split(part)
+                applied.update(part_applied)
+                rejected.update(part_rejected)
+        return applied, rejected
+
+    def _flush_loop(self):
+        """Thread d'application : une transaction par intervalle (ou dès qu'un lot est plein)."""
+        while self._running:
+            # Après un échec, attente exponentielle (bornée à 30 s) avant de réessayer
+            self._wakeup.wait(min(30.0, self.flush_interval * 2 ** self._failures))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Erreur dans le thread de blocage: {e}")
+
+    def _expiry_loop(self):
+        """Thread d'expiration : dort jusqu'à la prochaine échéance du tas."""
+        with self.lock:
+            while self._running:
+                timeout = self._deadlines[0][0] - time.monotonic() if self._deadlines else None
+                if timeout is None or timeout > 0:
+                    self._expiry.wait(timeout)
+                    continue
+                expired = self._pop_expired(time.monotonic())
+                if expired:
+                    logger.info(f"{len(expired)} blocage(s) expiré(s)")
+
+    def _pop_expired(self, now):
+        """
+        Retire en un lot les blocages dont l'échéance est passée (appelé avec
+        self.lock). Les éléments du set expirent d'eux-mêmes dans le noyau :
+        seul l'état local est mis à jour.
+        """
+        expired = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, ip = heapq.heappop(self._deadlines)
+            if self.expires_at.get(ip) == deadline:
+                self._drop_block(ip)
+                expired.append(ip)
+        self.stats['expired'] += len(expired)
+        return expired
+
+    def attach_store(self, store, sync_interval=2.0):
+        """
+        Rend l'état des blocages persistant : recharge les blocages encore
+        actifs du journal (réinstallés dans le set en une seule transaction),
+        puis y écrit chaque blocage et suit ceux faits par l'API.
+        """
+        since = time.time()
+        self.store = store
+        start = time.perf_counter()
+        count = self.rehydrate(store.load_active())
+        logger.info(f"{count} blocage(s) rechargé(s) du journal en {time.perf_counter() - start:.2f}s")
+
+        self._sync_thread = threading.Thread(target=self._sync_loop, args=(since, sync_interval), daemon=True)
+        self._sync_thread.start()
+
+    def rehydrate(self, rows):
+        """
+        Réinstalle des blocages [(ip, reason, blocked_at, expires_at)] (dates en
+        epoch) avec leur durée restante, en une transaction nft. Retourne le nombre.
+        """
+        now = time.time()
+        count = 0
+        with self.lock:
+            # Les réseaux d'abord : les hôtes qu'ils couvrent ne sont pas réinstallés
+            for ip, reason, blocked_at, expires_at in sorted(rows, key=lambda row: '/' not in row[0]):
+                remaining = int(expires_at - now)
+                try:
+                    if remaining <= 0 or parse_prefix(ip)[0] != 4 or self.allowlist.overlaps(ip):
+                        continue
+                except ValueError:
+                    logger.warning(f"Entrée invalide ignorée dans le journal des blocages: {ip}")
+                    continue
+                self._add_block(ip, reason, remaining, datetime.fromtimestamp(blocked_at or now))
+                count += 1
+        self.flush()
+        return count
+
+    def _sync_loop(self, since, interval):
+        """Applique les blocages et déblocages écrits dans le journal par l'API."""
+        while self._running:
+            time.sleep(interval)
+            try:
+                rows, since = self.store.changes_since(since)
+            except Exception as e:
+                logger.error(f"Erreur de lecture du journal des blocages: {e}")
+                continue
+            now = time.time()
+            active = [row for row in rows if row[3] > now]
+            expired = [row[0] for row in rows if row[3] <= now]
+            if active:
+                self.rehydrate(active)
+            if expired:
+                self.unblock_ips(expired, persist=False)
+
+    def close(self):
+        """Arrête les threads d'application et d'expiration après un dernier flush."""
+        self._running = False
+        self._wakeup.set()
+        with self.lock:
+            self._expiry.notify()
+        self._flusher.join(timeout=5)
+        self._scheduler.join(timeout=5)
+        self.flush()
+        if self.store is not None:
+            self.store.close()
+
     def is_private_ip(self, ip_address):
-        """Vérifie si une IP est dans une plage privée."""
-        private_ranges = [
-            ('10.0.0.0', '10.255.255.255'),
-            ('172.16.0.0', '172.31.255.255'),
-            ('192.168.0.0', '192.168.255.255')
-        ]
-        
-        from ipaddress import ip_address as ip_obj
-        ip = ip_obj(ip_address)
-        
-        for start, end in private_ranges:
-            if ip >= ip_obj(start) and ip <= ip_obj(end):
-                return True
-        return False
+        """Vérifie si une IP est dans une plage de la liste d'autorisation (privées incluses)."""
+        return ip_address in self.allowlist
+
+    def is_blocked(self, ip_address):
+        """Vérifie si une IP est bloquée, seule ou par un réseau agrégé."""
+        if ip_address in self.blocked_ips:
+            return True
+        version, address = parse_address(ip_address)
+        return version == 4 and self.blocked_prefixes.lookup(address) is not None
     
     def cleanup_expired_blocks(self):
-        """Nettoie les blocages expirés."""
+        """Oublie immédiatement les blocages expirés. Retourne leurs IPs."""
         with self.lock:
-            now = datetime.now()
-            expired_ips = []
-            
-            for ip, (timestamp, reason) in self.blocked_ips.items():
-                if now - timestamp > timedelta(minutes=60):  # 60 minutes par défaut
-                    expired_ips.append(ip)
-            
-            for ip in expired_ips:
-                self.unblock_ip(ip)
-    
+            return self._pop_expired(time.monotonic())
+
     def get_blocked_ips(self):
         """Retourne la liste des IPs actuellement bloquées."""
         with self.lock:
             return self.blocked_ips.copy()
 
-# Instance globale du bloqueur
+    def get_stats(self):
+        """Statistiques des transactions nft."""
+        with self.lock:
+            return dict(self.stats, blocked=len(self.blocked_ips), pending=len(self.pending))
+
+# Instance globale du bloqueur (une par processus, voir get_blocker)
 blocker = IPBlocker()
+_blocker_lock = threading.Lock()
+
+def _attach_default_store(instance):
+    """Recharge les blocages d'avant le redémarrage et les persiste désormais."""
+    try:
+        from block_store import BlockStore
+        instance.attach_store(BlockStore())
+    except Exception as e:
+        logger.error(f"Journal des blocages indisponible, blocages non persistants: {e}")
+
+def get_blocker():
+    """
+    Bloqueur du processus courant. L'instance globale est créée à l'import :
+    dans un processus forké ensuite (détection --transport shm), ses threads
+    d'application et d'expiration n'existent plus, un nouveau bloqueur est
+    donc créé (avec son propre journal si celui du parent en avait un).
+    """
+    global blocker
+    instance = blocker
+    if instance.pid != os.getpid():
+        with _blocker_lock:
+            if blocker.pid != os.getpid():
+                persistent = blocker.store is not None
+                blocker = IPBlocker()
+                if persistent:
+                    _attach_default_store(blocker)
+                logger.info("Bloqueur recréé dans le processus de détection.")
+            instance = blocker
+    return instance
 
 def init_blocker():
     """Initialise le bloqueur global."""
-    global blocker
-    # Démarre le thread de nettoyage périodique
-    def cleanup_loop():
-        while True:
-            time.sleep(300)  # Toutes les 5 minutes
-            blocker.cleanup_expired_blocks()
-    
-    cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
-    cleanup_thread.start()
-    
-    return blocker
+    # Les expirations sont gérées par l'échéancier du bloqueur (thread démarré
+    # avec l'instance) : plus de nettoyage périodique
+    instance = get_blocker()
+    if instance.store is None:
+        _attach_default_store(instance)
+    return instance
+
+def close_blocker():
+    """
+    Applique les blocages en attente (transaction nft et journal) puis arrête
+    le bloqueur du processus courant. Sans effet sur l'instance d'un autre processus.
+    """
+    with _blocker_lock:
+        instance = blocker
+    if instance.pid == os.getpid() and instance._running:
+        instance.close()
+        logger.info(f"Bloqueur arrêté: {instance.get_stats()}")
 
 # Test du module
 if __name__ == "__main__":
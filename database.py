@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Base de données SQLite partagée de NGFW-Congo (API, bloqueur, journal des
+blocages). Le chemin peut être changé par les variables d'environnement
+NGFW_DB_DIR ou NGFW_DB_PATH.
+
+get_connection() fournit une connexion par thread (réutilisée d'un appel à
+l'autre, en mode WAL), avec le cache de requêtes préparées de sqlite3.
+
+Le schéma évolue par migrations numérotées (MIGRATIONS), la version
+appliquée étant gardée dans PRAGMA user_version.
+"""
+
+import os
+import sqlite3
+import threading
+import logging
+from datetime import date, datetime, timedelta, timezone
+
+logger = logging.getLogger('NGFW-Database')
+
+# Configuration de la base de données
+DB_DIR = os.environ.get('NGFW_DB_DIR', "/home/biraheka/ngfw-congo/data")
+DB_PATH = os.environ.get('NGFW_DB_PATH', f"{DB_DIR}/ngfw_congo.db")
+
+# Réglages appliqués à chaque connexion du pool. En mode WAL, les lecteurs
+# ne bloquent pas l'écrivain ; synchronous=NORMAL ne fait un fsync qu'aux
+# checkpoints (aucun risque de corruption, au pire les dernières transactions
+# sont perdues en cas de coupure de courant)
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Requêtes préparées gardées en cache par connexion (par texte SQL)
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = []
+# Incrémenté par close_all() : les connexions des générations passées sont fermées
+_generation = 0
+
+def connect(db_path=None, **kwargs):
+    """Ouvre une connexion SQLite (le dossier de la base est créé au besoin)."""
+    db_path = db_path or DB_PATH
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    return sqlite3.connect(db_path, timeout=30, **kwargs)
+
+def _add_missing_columns(cursor, table, columns):
+    """Ajoute à une table existante les colonnes {nom: définition} absentes."""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+# Colonnes de la table des événements (et de ses partitions)
+EVENTS_COLUMNS = '''
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    event_type TEXT NOT NULL,
+    severity TEXT,
+    source_ip TEXT,
+    destination_ip TEXT,
+    protocol TEXT,
+    description TEXT,
+    anomaly_score REAL,
+    action_taken TEXT
+'''
+
+def _create_tables(cursor):
+    """Schéma de base (version 0), complété par les migrations."""
+    # Table des événements (remplacée par des partitions journalières, migration 4)
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS events ({EVENTS_COLUMNS})')
+
+    # Table des statistiques
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS statistics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+        packets_processed INTEGER,
+        flows_processed INTEGER,
+        anomalies_detected INTEGER,
+        ips_blocked INTEGER
+    )
+    ''')
+
+    # Table des IP bloquées, journal partagé entre le bloqueur et l'API
+    # (voir block_store.py). Un déblocage est une ligne dont expires_at est
+    # passé ; updated_at (epoch) et origin permettent à chaque processus de
+    # récupérer les changements faits par les autres.
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS blocked_ips (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ip_address TEXT UNIQUE,
+        blocked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        reason TEXT,
+        expires_at DATETIME,
+        updated_at REAL,
+        origin TEXT
+    )
+    ''')
+
+def _migrate_block_journal(cursor):
+    """Colonnes du journal des blocages (updated_at, origin)"""
+    _add_missing_columns(cursor, 'blocked_ips', {'updated_at': 'REAL', 'origin': 'TEXT'})
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blocked_ips_updated ON blocked_ips(updated_at)')
+
+def _migrate_indexes(cursor):
+    """Index des requêtes du dashboard"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_type_timestamp ON events(event_type, timestamp)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_source_ip ON events(source_ip)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_blocked_ips_expires ON blocked_ips(expires_at)')
+
+# Tables d'agrégats des statistiques : {table: format du début de l'intervalle}
+ROLLUPS = {
+    'statistics_minute': '%Y-%m-%d %H:%M:00',
+    'statistics_hourly': '%Y-%m-%d %H:00:00',
+}
+
+def _migrate_statistics_rollups(cursor):
+    """Agrégats des statistiques par minute et par heure"""
+    for table, bucket in ROLLUPS.items():
+        cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            bucket TEXT PRIMARY KEY,
+            samples INTEGER NOT NULL,
+            packets_processed INTEGER NOT NULL,
+            flows_processed INTEGER NOT NULL,
+            anomalies_detected INTEGER NOT NULL,
+            ips_blocked INTEGER NOT NULL
+        ) WITHOUT ROWID
+        ''')
+        # Reprise de l'historique existant
+        cursor.execute(f'''
+        INSERT OR REPLACE INTO {table}
+        SELECT strftime('{bucket}', timestamp), COUNT(*),
+               TOTAL(packets_processed), TOTAL(flows_processed),
+               TOTAL(anomalies_detected), TOTAL(ips_blocked)
+        FROM statistics
+        WHERE timestamp IS NOT NULL
+        GROUP BY 1
+        ''')
+
+    # Maintenus à chaque insertion. Les suppressions (rétention) ne sont pas
+    # répercutées : les agrégats gardent l'historique.
+    upserts = ''.join(f'''
+        INSERT INTO {table} VALUES (
+            strftime('{bucket}', COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)), 1,
+            COALESCE(NEW.packets_processed, 0), COALESCE(NEW.flows_processed, 0),
+            COALESCE(NEW.anomalies_detected, 0), COALESCE(NEW.ips_blocked, 0))
+        ON CONFLICT(bucket) DO UPDATE SET
+            samples = samples + 1,
+            packets_processed = packets_processed + excluded.packets_processed,
+            flows_processed = flows_processed + excluded.flows_processed,
+            anomalies_detected = anomalies_detected + excluded.anomalies_detected,
+            ips_blocked = ips_blocked + excluded.ips_blocked;
+    ''' for table, bucket in ROLLUPS.items())
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_statistics_rollup AFTER INSERT ON statistics
+    BEGIN
+    {upserts}
+    END
+    ''')
+
+# Partitionnement par jour : la table `events` est une vue (UNION ALL) sur
+# des tables journalières events_pAAAAMMJJ, recensées dans la table
+# `partitions`. Une partition expirée est supprimée d'un bloc par DROP TABLE
+# (voir retention.py) au lieu d'un DELETE ligne à ligne. Les insertions dans
+# la vue passent par un trigger vers la partition du jour.
+# {table: (colonnes, {suffixe d'index: colonnes indexées})}
+PARTITIONED = {
+    'events': (EVENTS_COLUMNS, {
+        'timestamp': 'timestamp',
+        'type_timestamp': 'event_type, timestamp',
+        'source_ip': 'source_ip',
+    }),
+}
+
+# Les identifiants d'une partition commencent à (jours depuis 1970) * PARTITION_ID_SPAN :
+# uniques dans la vue et croissants d'un jour à l'autre
+PARTITION_ID_SPAN = 10 ** 10
+
+def partition_name(table, day):
+    """Nom de la partition d'un jour (datetime.date) : events_p20261017."""
+    return f"{table}_p{day:%Y%m%d}"
+
+def create_partition(cursor, table, day):
+    """Crée la partition du jour `day` si elle n'existe pas et l'inscrit au catalogue."""
+    columns, indexes = PARTITIONED[table]
+    name = partition_name(table, day)
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {name} ({columns})')
+    for suffix, indexed in indexes.items():
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{name}_{suffix} ON {name}({indexed})')
+    cursor.execute(
+        'INSERT INTO sqlite_sequence (name, seq) SELECT ?, ? '
+        'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)',
+        (name, (day - date(1970, 1, 1)).days * PARTITION_ID_SPAN, name)
+    )
+    cursor.execute(
+        'INSERT OR IGNORE INTO partitions (name, parent, first_day, last_day) VALUES (?, ?, ?, ?)',
+        (name, table, day.isoformat(), day.isoformat())
+    )
+    return name
+
+def refresh_partition_view(cursor, table, current):
+    """
+    Recrée la vue `table` sur les partitions du catalogue et son trigger
+    d'insertion vers la partition `current`.
+    """
+    names = [row[0] for row in cursor.execute(
+        'SELECT name FROM partitions WHERE parent = ? ORDER BY first_day, name', (table,))]
+    cursor.execute(f'DROP VIEW IF EXISTS {table}')
+    cursor.execute(f'CREATE VIEW {table} AS ' + ' UNION ALL '.join(f'SELECT * FROM {name}' for name in names))
+
+    columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({current})') if row[1] != 'id']
+    values = ['COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)' if column == 'timestamp' else f'NEW.{column}'
+              for column in columns]
+    cursor.execute(f'''
+    CREATE TRIGGER {table}_insert INSTEAD OF INSERT ON {table}
+    BEGIN
+        INSERT INTO {current} ({', '.join(columns)}) VALUES ({', '.join(values)});
+    END
+    ''')
+
+def rotate_partitions(cursor, table, today):
+    """
+    Crée les partitions d'aujourd'hui et de demain et dirige les insertions
+    vers celle d'aujourd'hui. Le schéma n'est modifié (et les requêtes
+    préparées invalidées) que si quelque chose a changé. Retourne True dans ce cas.
+    """
+    current = partition_name(table, today)
+    tomorrow = partition_name(table, today + timedelta(days=1))
+    known = {row[0] for row in cursor.execute('SELECT name FROM partitions WHERE parent = ?', (table,))}
+    trigger = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (f'{table}_insert',)
+    ).fetchone()
+    if tomorrow in known and current in known and trigger and f'INSERT INTO {current} ' in trigger[0]:
+        return False
+
+    create_partition(cursor, table, today)
+    create_partition(cursor, table, today + timedelta(days=1))
+    refresh_partition_view(cursor, table, current)
+    return True
+
+def rotate_all_partitions(conn, today=None):
+    """
+    Rotation (rotate_partitions) de toutes les tables partitionnées, dans une
+    transaction. Chaque processus qui écrit des événements l'appelle au
+    démarrage et au changement de jour : sans API (et donc sans rétention),
+    les insertions iraient sinon toujours dans la partition du démarrage.
+    Retourne les tables dont le schéma a changé.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        rotated = [table for table in PARTITIONED if rotate_partitions(cursor, table, today)]
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    return rotated
+
+def _migrate_events_partitions(cursor):
+    """Partitionnement journalier de la table events"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS partitions (
+        name TEXT PRIMARY KEY,
+        parent TEXT NOT NULL,
+        first_day TEXT NOT NULL,
+        last_day TEXT NOT NULL
+    ) WITHOUT ROWID
+    ''')
+
+    # L'ancienne table devient une partition couvrant toutes ses dates
+    today = datetime.now(timezone.utc).date().isoformat()
+    count, first, last = cursor.execute(
+        'SELECT COUNT(*), date(MIN(timestamp)), date(MAX(timestamp)) FROM events').fetchone()
+    if count:
+        cursor.execute('ALTER TABLE events RENAME TO events_legacy')
+        cursor.execute('INSERT INTO partitions VALUES (?, ?, ?, ?)',
+                       ('events_legacy', 'events', first or today, last or today))
+    else:
+        cursor.execute('DROP TABLE events')
+    rotate_partitions(cursor, 'events', datetime.now(timezone.utc).date())
+
+# Migrations du schéma, appliquées dans l'ordre ; la version atteinte est
+# gardée dans PRAGMA user_version. Ne jamais modifier une migration déjà
+# publiée : en ajouter une nouvelle.
+MIGRATIONS = [
+    (1, _migrate_block_journal),
+    (2, _migrate_indexes),
+    (3, _migrate_statistics_rollups),
+    (4, _migrate_events_partitions),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def migrate(conn):
+    """
+    Applique les migrations manquantes, chacune dans sa propre transaction.
+    BEGIN IMMEDIATE sérialise les processus qui démarrent en même temps (API,
+    bloqueur, writer d'événements) : la version est relue une fois le verrou pris.
+    Retourne la version du schéma.
+    """
+    cursor = conn.cursor()
+    for version, migration in MIGRATIONS:
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            if cursor.execute('PRAGMA user_version').fetchone()[0] >= version:
+                cursor.execute('COMMIT')
+                continue
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        logger.info(f"Migration {version} appliquée: {migration.__doc__}")
+    return cursor.execute('PRAGMA user_version').fetchone()[0]
+
+def init_database(db_path=None):
+    """Initialise la base de données SQLite."""
+    try:
+        # Transactions explicites (voir migrate)
+        conn = connect(db_path, isolation_level=None)
+        cursor = conn.cursor()
+        # Sans effet sur une base existante : seule une base neuve rend au
+        # système les pages libérées (voir retention.py)
+        cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+
+        cursor.execute('BEGIN IMMEDIATE')
+        _create_tables(cursor)
+        cursor.execute('COMMIT')
+        version = migrate(conn)
+        rotate_all_partitions(conn)
+
+        conn.close()
+        logger.info(f"Base de données initialisée (schéma v{version})")
+
+    except Exception as e:
+        logger.error(f"Erreur lors de l'initialisation de la base de données: {e}")
+        raise
+
+def get_connection(db_path=None):
+    """
+    Connexion du thread courant vers la base (créée au premier appel puis
+    réutilisée). Ne doit pas être partagée entre threads.
+    """
+    db_path = db_path or DB_PATH
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.generation != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connect(db_path, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        connections[db_path] = conn
+        with _pool_lock:
+            _pool.append(conn)
+    return conn
+
+def fetch_one(sql, params=(), db_path=None):
+    """Première ligne d'une requête de lecture (ou None)."""
+    return get_connection(db_path).execute(sql, params).fetchone()
+
+_STATISTICS_TOTALS = '''
+WITH bounds AS (
+    SELECT strftime('%Y-%m-%d %H:%M:00', 'now', ?) AS first_minute,
+           strftime('%Y-%m-%d %H:00:00', 'now', ?, '+1 hour') AS first_hour
+)
+SELECT TOTAL(packets_processed), TOTAL(flows_processed),
+       TOTAL(anomalies_detected), TOTAL(ips_blocked)
+FROM (
+    SELECT h.* FROM statistics_hourly h, bounds WHERE h.bucket >= bounds.first_hour
+    UNION ALL
+    SELECT m.* FROM statistics_minute m, bounds
+    WHERE m.bucket >= bounds.first_minute AND m.bucket < bounds.first_hour
+)
+'''
+
+def statistics_totals(hours=24, db_path=None):
+    """
+    Sommes (paquets, flux, anomalies, blocages) des statistiques des `hours`
+    dernières heures, à la minute près, lues dans les agrégats : les heures
+    complètes dans statistics_hourly, l'heure de début dans statistics_minute.
+    Au plus hours + 60 lignes lues, quelle que soit la taille de l'historique.
+    """
+    offset = f'-{int(hours)} hours'
+    row = fetch_one(_STATISTICS_TOTALS, (offset, offset), db_path)
+    return tuple(int(value) for value in row)
+
+def close_all():
+    """Ferme toutes les connexions du pool (à l'arrêt de l'application)."""
+    global _generation
+    with _pool_lock:
+        connections, _pool[:] = list(_pool), []
+        # Les threads qui rouvriront une connexion en créeront une nouvelle
+        _generation += 1
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
@@ -7,45 +7,146 @@ Charge le modèle IA et prédit si un flux est normal ou anormal.
 import joblib
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import StandardScaler
 import logging
 import json
+import os
 from datetime import datetime
 
+from forest_compiler import FlatForest, compiled_path_for
+from verdict_cache import verdict_cache_from_env
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Features numériques attendues par le modèle, dans l'ordre d'entraînement
+FEATURE_NAMES = [
+    'Duration', 'Tot Fwd Pkts', 'Tot Bwd Pkts',
+    'TotLen Fwd Pkts', 'TotLen Bwd Pkts',
+    'Flow Bytes/s', 'Flow Packets/s'
+]
+
+def features_to_matrix(flows, feature_names=FEATURE_NAMES):
+    """
+    Construit une matrice N×F (float64) à partir d'une liste de dictionnaires de
+    features, dans l'ordre de `feature_names`. Les features absentes valent 0.
+    """
+    return np.array(
+        [[flow.get(name, 0) for name in feature_names] for flow in flows],
+        dtype=np.float64
+    ).reshape(len(flows), len(feature_names))
+
+def bundle_path_for(model_path):
+    """Chemin du bundle (modèle + scaler) associé à un fichier modèle."""
+    root, ext = os.path.splitext(model_path)
+    return f"{root}.bundle{ext}"
+
 class NGFWDetector:
     def __init__(self, model_path):
         """
         Initialise le détecteur avec le modèle entraîné.
+
+        Par ordre de préférence :
+        - le modèle compilé (.npz, voir forest_compiler.py) s'il est à jour :
+          scoring vectorisé sans scikit-learn ;
+        - le bundle produit par train_model.py : scaler d'entraînement et ordre
+          des features en sont repris ;
+        - le modèle seul (ancien comportement).
         """
-        logger.info(f"Chargement du modèle depuis {model_path}...")
+        bundle_path = bundle_path_for(model_path)
+        compiled_path = compiled_path_for(model_path)
+        source_path = bundle_path if os.path.exists(bundle_path) else model_path
+        bundle = None
         try:
-            self.model = joblib.load(model_path)
+            if self._is_up_to_date(compiled_path, source_path):
+                logger.info(f"Chargement du modèle compilé depuis {compiled_path}...")
+                self.model = FlatForest.load(compiled_path)
+                if self.model.scaler_mean is not None:
+                    bundle = {
+                        'feature_names': self.model.feature_names,
+                        'scaler_mean': self.model.scaler_mean,
+                        'scaler_scale': self.model.scaler_scale,
+                    }
+            elif os.path.exists(bundle_path):
+                logger.info(f"Chargement du bundle depuis {bundle_path}...")
+                bundle = joblib.load(bundle_path)
+                self.model = bundle['model']
+            else:
+                logger.info(f"Chargement du modèle depuis {model_path}...")
+                self.model = joblib.load(model_path)
             logger.info("Modèle chargé avec succès.")
         except Exception as e:
             logger.error(f"Erreur lors du chargement du modèle : {e}")
             raise
 
-        # Scaler pour normaliser les features (important pour de bonnes performances)
-        self.scaler = StandardScaler()
-        # Nous allons l'adapter avec les premières données reçues
-        self.is_scaler_fitted = False
+        if bundle is not None:
+            # Transformation affine pré-calculée : x_norm = x * coef + intercept
+            self.feature_names = list(bundle['feature_names'])
+            scale = np.asarray(bundle['scaler_scale'], dtype=np.float64).copy()
+            scale[scale == 0] = 1.0
+            self.scaler_coef = 1.0 / scale
+            self.scaler_intercept = -np.asarray(bundle['scaler_mean'], dtype=np.float64) * self.scaler_coef
+            self.scaler = None
+            self.is_scaler_fitted = True
+        else:
+            from sklearn.preprocessing import StandardScaler
+
+            logger.warning("Aucun bundle trouvé : le scaler sera ajusté sur le premier flux (ancien comportement).")
+            self.feature_names = list(FEATURE_NAMES)
+            self.scaler_coef = None
+            self.scaler_intercept = None
+            # Scaler pour normaliser les features (important pour de bonnes performances)
+            self.scaler = StandardScaler()
+            # Nous allons l'adapter avec les premières données reçues
+            self.is_scaler_fitted = False
 
         # Seuil de décision (peut être ajusté)
         self.threshold = -0.2  # Valeurs en dessous de ce seuil sont considérées comme des anomalies
 
+        # Cache des verdicts des flux répétitifs (None si NGFW_VERDICT_CACHE_SIZE=0)
+        self.verdict_cache = verdict_cache_from_env()
+
         # Statistiques
         self.total_flows_processed = 0
         self.anomalies_detected = 0
 
+    @staticmethod
+    def _is_up_to_date(compiled_path, source_path):
+        """Vrai si le modèle compilé existe et n'est pas plus ancien que sa source."""
+        if not os.path.exists(compiled_path):
+            return False
+        if os.path.exists(source_path) and os.path.getmtime(compiled_path) < os.path.getmtime(source_path):
+            logger.warning(f"{compiled_path} est plus ancien que {source_path} : modèle compilé ignoré.")
+            return False
+        return True
+
+    def flows_to_matrix(self, flows):
+        """Matrice N×F des flux, dans l'ordre des features du modèle."""
+        return features_to_matrix(flows, self.feature_names)
+
+    def transform(self, X):
+        """
+        Normalise une matrice N×F brute.
+        """
+        if self.scaler_coef is not None:
+            return X * self.scaler_coef + self.scaler_intercept
+
+        # Ancien comportement (pas de bundle) : ajustement sur le premier flux
+        columns = self.feature_names[:X.shape[1]]
+        if not self.is_scaler_fitted:
+            self.scaler.fit(pd.DataFrame(X[:1], columns=columns))
+            self.is_scaler_fitted = True
+            logger.info("Scaler ajusté avec les premières données.")
+        return self.scaler.transform(pd.DataFrame(X, columns=columns))
+
     def preprocess_features(self, features_dict):
         """
         Transforme un dictionnaire de features en format adapté pour le modèle.
         Effectue également la normalisation.
         """
+        if self.scaler_coef is not None:
+            return self.transform(self.flows_to_matrix([features_dict]))
+
         # Crée un DataFrame d'une seule ligne avec les features
         single_flow_df = pd.DataFrame([features_dict])
         
@@ -95,15 +196,53 @@ class NGFWDetector:
                 'error': str(e)
             }
 
+    def predict_batch(self, features_matrix, keys=None):
+        """
+        Fait une prédiction vectorisée sur un lot de flux.
+        `features_matrix` est une matrice N×F brute (colonnes dans l'ordre de
+        self.feature_names, voir flows_to_matrix).
+        `keys` (optionnel) donne (src, dst, port dst, protocole) pour chaque
+        ligne : les flux déjà vus sont alors servis par le cache des verdicts
+        (voir verdict_cache.flow_keys et record_keys).
+        Retourne (scores, décisions) : deux tableaux NumPy de taille N.
+        """
+        X = np.asarray(features_matrix, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if len(X) == 0:
+            return np.empty(0), np.empty(0, dtype=bool)
+
+        cache = self.verdict_cache
+        if cache is not None and keys is not None:
+            cache.validate(self.model, self.threshold)
+            scores, cache_keys = cache.lookup(keys, X)
+            missing = np.flatnonzero(np.isnan(scores))
+            if len(missing):
+                fresh = self.model.decision_function(self.transform(X[missing]))
+                scores[missing] = fresh
+                cache.store([cache_keys[i] for i in missing], fresh, self.threshold)
+        else:
+            scores = self.model.decision_function(self.transform(X))
+        decisions = scores < self.threshold
+
+        # Mise à jour des statistiques
+        self.total_flows_processed += len(X)
+        self.anomalies_detected += int(decisions.sum())
+
+        return scores, decisions
+
     def get_stats(self):
         """
         Retourne les statistiques de détection.
         """
-        return {
+        stats = {
             'total_flows_processed': self.total_flows_processed,
             'anomalies_detected': self.anomalies_detected,
             'anomaly_rate': self.anomalies_detected / self.total_flows_processed if self.total_flows_processed > 0 else 0
         }
+        if self.verdict_cache is not None:
+            stats['verdict_cache'] = self.verdict_cache.get_stats()
+        return stats
 
 # Instance globale du détecteur
 detector = None
@@ -126,6 +265,26 @@ def detect_anomaly(features_dict):
     
     return detector.predict(features_dict)
 
+def get_detector():
+    """
+    Retourne le détecteur global (initialisé à la demande).
+    """
+    global detector
+    if detector is None:
+        init_detector()
+
+    return detector
+
+def detect_anomalies(features_matrix):
+    """
+    Version par lot de detect_anomaly : retourne (scores, décisions).
+    """
+    global detector
+    if detector is None:
+        init_detector()
+
+    return detector.predict_batch(features_matrix)
+
 # Test du détecteur
 if __name__ == "__main__":
     print("Testing NGFW-Congo Detector...")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Écriture différée des événements pour NGFW-Congo.
+
+log_event (api.py) ne fait plus un INSERT + commit par événement : les lignes
+sont placées dans un tampon borné en mémoire, qu'un thread écrit avec
+executemany en une seule transaction tous les `batch_size` événements ou
+toutes les `flush_interval` secondes.
+
+Le writer fait aussi tourner les partitions journalières des événements
+(voir database.rotate_all_partitions) quand le jour change : le processus de
+capture peut tourner sans l'API et sa rétention.
+"""
+
+import os
+import time
+import atexit
+import threading
+import logging
+from collections import deque
+from datetime import date
+
+from database import get_connection, init_database, rotate_all_partitions
+
+logger = logging.getLogger('NGFW-EventWriter')
+
+# Politiques quand le tampon est plein
+POLICY_DROP_OLDEST = 'drop-oldest'   # le plus ancien événement non écrit est perdu
+POLICY_DROP_NEWEST = 'drop-newest'   # le nouvel événement est refusé
+POLICY_BLOCK = 'block'               # l'appelant attend (au plus block_timeout), puis l'événement est refusé
+
+_INSERT_EVENT = '''
+INSERT INTO events
+(timestamp, event_type, severity, source_ip, destination_ip, protocol, description, anomaly_score, action_taken)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+class EventWriter:
+    """
+    Tampon borné d'événements, vidé par lots par un thread d'écriture.
+
+    Usage :
+        writer = EventWriter(max_buffer=10000, policy=POLICY_DROP_OLDEST)
+        writer.start()
+        writer.write('anomaly', {'severity': 'high', 'source_ip': '203.0.113.7', ...})
+        writer.close()      # écrit ce qui reste, de façon durable
+    """
+    def __init__(self, db_path=None, max_buffer=10000, batch_size=500, flush_interval=0.2,
+                 policy=POLICY_DROP_OLDEST, block_timeout=1.0):
+        if policy not in (POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_BLOCK):
+            raise ValueError(f"Politique inconnue: {policy}")
+        self.db_path = db_path
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self.buffer = deque()
+        self.lock = threading.Lock()
+        self._not_empty = threading.Condition(self.lock)
+        self._not_full = threading.Condition(self.lock)
+        # Sérialise les écritures (thread d'écriture et flush() explicites)
+        self._write_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        # Jour (AAAA-MM-JJ) de la partition qui reçoit les insertions
+        self._partition_day = None
+        # Processus propriétaire : après un fork, l'enfant doit créer son propre writer
+        self.pid = os.getpid()
+
+        # Statistiques
+        self.stats = {
+            'written': 0,
+            'batches': 0,
+            'dropped': 0,
+            'errors': 0,
+            'max_buffered': 0,
+        }
+
+    def start(self):
+        """Démarre le thread d'écriture."""
+        try:
+            # Le processus de capture peut démarrer avant l'API, qui crée les tables
+            init_database(self.db_path)
+        except Exception:
+            pass  # déjà journalisé ; les lots seront réessayés
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ngfw-event-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, event_type, data):
+        """
+        Ajoute un événement au tampon. Retourne False s'il a été refusé
+        (tampon plein) ; avec drop-oldest, c'est un ancien événement qui est perdu.
+        """
+        row = (
+            time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),  # même format que CURRENT_TIMESTAMP
+            event_type,
+            data.get('severity'),
+            data.get('source_ip'),
+            data.get('destination_ip'),
+            data.get('protocol'),
+            data.get('description'),
+            data.get('anomaly_score'),
+            data.get('action_taken'),
+        )
+        with self.lock:
+            if len(self.buffer) >= self.max_buffer:
+                if self.policy == POLICY_DROP_OLDEST:
+                    self.buffer.popleft()
+                    self.stats['dropped'] += 1
+                elif self.policy == POLICY_DROP_NEWEST or not self._not_full.wait_for(
+                        lambda: len(self.buffer) < self.max_buffer, self.block_timeout):
+                    self.stats['dropped'] += 1
+                    return False
+
+            self.buffer.append(row)
+            buffered = len(self.buffer)
+            if buffered > self.stats['max_buffered']:
+                self.stats['max_buffered'] = buffered
+            if buffered >= self.batch_size:
+                self._not_empty.notify()
+        return True
+
+    def _take(self, limit):
+        """Retire au plus `limit` lignes du tampon (appelé avec self.lock)."""
+        count = min(limit, len(self.buffer))
+        rows = [self.buffer.popleft() for _ in range(count)]
+        if rows:
+            self._not_full.notify_all()
+        return rows
+
+    def _write(self, rows, durable=False):
+        """Écrit un lot en une transaction. En cas d'erreur, le lot est remis en tête du tampon."""
+        conn = get_connection(self.db_path)
+        try:
+            # Changement de jour : les insertions passent à la partition du dernier événement du lot
+            day = max(row[0][:10] for row in rows)
+            if self._partition_day is None or day > self._partition_day:
+                rotate_all_partitions(conn, date.fromisoformat(day))
+                self._partition_day = day
+            if durable:
+                # Commit avec fsync immédiat (WAL + synchronous=NORMAL ne le garantit pas)
+                conn.execute('PRAGMA synchronous=FULL')
+            with conn:
+                conn.executemany(_INSERT_EVENT, rows)
+        except Exception as e:
+            logger.error(f"Erreur d'écriture de {len(rows)} événements: {e}")
+            with self.lock:
+                self.stats['errors'] += 1
+                # Remis en tête dans l'ordre, dans la limite de la place disponible
+                room = max(0, self.max_buffer - len(self.buffer))
+                self.stats['dropped'] += len(rows) - min(room, len(rows))
+                self.buffer.extendleft(reversed(rows[:room]))
+            return False
+        finally:
+            if durable:
+                conn.execute('PRAGMA synchronous=NORMAL')
+
+        with self.lock:
+            self.stats['written'] += len(rows)
+            self.stats['batches'] += 1
+        return True
+
+    def _run(self):
+        """Thread d'écriture : un lot dès batch_size événements, ou toutes les flush_interval secondes."""
+        while True:
+            with self.lock:
+                if self._running and len(self.buffer) < self.batch_size:
+                    self._not_empty.wait(self.flush_interval)
+                if not self._running:
+                    return
+                rows = self._take(self.batch_size)
+            if rows:
+                with self._write_lock:
+                    if not self._write(rows):
+                        # Base indisponible : on réessaie à l'intervalle suivant
+                        time.sleep(self.flush_interval)
+
+    def flush(self, durable=False):
+        """Écrit immédiatement tout le tampon. Retourne le nombre d'événements écrits."""
+        written = 0
+        with self._write_lock:
+            while True:
+                with self.lock:
+                    rows = self._take(self.batch_size)
+                if not rows or not self._write(rows, durable):
+                    return written
+                written += len(rows)
+
+    def close(self, timeout=5):
+        """Arrête le thread puis écrit durablement ce qui reste dans le tampon."""
+        with self.lock:
+            self._running = False
+            self._not_empty.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        written = self.flush(durable=True)
+        if written:
+            logger.info(f"{written} événement(s) écrit(s) à l'arrêt.")
+        return written
+
+    def get_stats(self):
+        """Statistiques du writer."""
+        with self.lock:
+            return dict(self.stats, buffered=len(self.buffer), policy=self.policy)
+
+# Instance globale (une par processus), créée au premier événement
+event_writer = None
+_writer_lock = threading.Lock()
+
+def get_event_writer():
+    """Writer du processus courant (démarré à la première utilisation)."""
+    global event_writer
+    writer = event_writer
+    if writer is None or writer.pid != os.getpid():
+        with _writer_lock:
+            if event_writer is None or event_writer.pid != os.getpid():
+                event_writer = EventWriter(
+                    max_buffer=int(os.environ.get('NGFW_EVENT_BUFFER', 10000)),
+                    policy=os.environ.get('NGFW_EVENT_POLICY', POLICY_DROP_OLDEST),
+                ).start()
+                # Écriture durable de ce qui reste à la sortie normale de l'interpréteur
+                atexit.register(event_writer.close)
+            writer = event_writer
+    return writer
+
+def close_event_writer(timeout=5):
+    """Arrête le writer du processus courant s'il a été démarré."""
+    global event_writer
+    with _writer_lock:
+        writer, event_writer = event_writer, None
+    if writer is not None and writer.pid == os.getpid():
+        atexit.unregister(writer.close)
+        writer.close(timeout)
+        logger.info(f"Writer d'événements arrêté: {writer.get_stats()}")
@@ -6,6 +6,10 @@ Transforme les paquets en flux NetFlow-like et calcule des caractéristiques.
 
 from scapy.all import IP, TCP, UDP
 from datetime import datetime
+from flow_table import FlowTable, ip_to_int, int_to_ip, pack_flow_key
+from packet_parser import parse_frame, LINKTYPE_ETHERNET
+import heapq
+import time
 import pandas as pd
 import numpy as np
 import logging
@@ -13,16 +17,60 @@ import logging
 # Désactive les logs verbeux
 logging.getLogger("scapy.runtime").setLevel(logging.ERROR)
 
+def _to_seconds(value):
+    """Convertit un datetime ou un timestamp epoch en secondes (float)."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
 class FlowGenerator:
     """
     Génère des flux à partir de paquets et calcule leurs caractéristiques.
     """
-    def __init__(self, inactive_timeout=15, active_timeout=1800):
-        # Dictionnaire pour stocker les flux en cours
-        self.flows = {}
+    def __init__(self, inactive_timeout=15, active_timeout=1800, tick_interval=1.0, raw_records=False,
+                 extended_features=False):
+        # Statistiques étendues compatibles CIC-IDS (IAT, distribution des
+        # longueurs, flags TCP) en plus des totaux : voir EXTENDED_FEATURE_NAMES
+        self.extended_features = extended_features
+        # Table compacte des flux en cours (colonnes typées, voir flow_table.py)
+        self.flows = FlowTable(extended=extended_features)
+        # Format des flux expirés : (flow_id, flow_data) ou, si raw_records,
+        # tuples bruts FlowTable.pop_raw (transport en mémoire partagée)
+        self.raw_records = raw_records
         # Timeout pour considérer un flux comme terminé (en secondes)
         self.inactive_timeout = inactive_timeout
         self.active_timeout = active_timeout
+        # Intervalle (en secondes) entre deux passes d'expiration (0 = à chaque paquet)
+        self.tick_interval = tick_interval
+
+        # Sketches comportementaux par source (sketches.BehaviorSketch), alimentés
+        # par chaque paquet comptabilisé ; None = désactivés
+        self.sketches = None
+
+        # Tas min des échéances (échéance, slot). Une entrée dont l'échéance ne
+        # correspond plus à la colonne `deadline` du slot est ignorée au dépilement.
+        self._expiry_heap = []
+        self._next_tick = None
+
+    def set_extended_features(self, enabled):
+        """Active ou désactive les statistiques étendues (avant le premier paquet)."""
+        if enabled == self.extended_features:
+            return
+        if len(self.flows):
+            raise RuntimeError("Les statistiques étendues se choisissent avant la création des flux")
+        self.extended_features = enabled
+        self.flows = FlowTable(extended=enabled)
+        self._expiry_heap = []
+
+    @staticmethod
+    def get_header_info(packet):
+        """(flags TCP, longueur de l'en-tête TCP/UDP) d'un paquet Scapy."""
+        if packet.haslayer(TCP):
+            tcp = packet[TCP]
+            return int(tcp.flags), (tcp.dataofs or 5) * 4
+        if packet.haslayer(UDP):
+            return 0, 8
+        return 0, 0
 
     def get_flow_id(self, packet):
         """
@@ -58,80 +106,187 @@ class FlowGenerator:
         """
         Met à jour les statistiques d'un flux avec un nouveau paquet.
         """
-        if flow_id not in self.flows:
+        src_ip, dst_ip, src_port, dst_port, proto = flow_id
+        src_ip = ip_to_int(src_ip)
+        dst_ip = ip_to_int(dst_ip)
+        timestamp = _to_seconds(timestamp)
+
+        key = pack_flow_key(src_ip, dst_ip, src_port, dst_port, proto)
+        slot = self.flows.find(key)
+        if slot is None:
             # Initialisation d'un nouveau flux
-            self.flows[flow_id] = {
-                'Start Time': timestamp,
-                'Last Seen': timestamp,
-                'Fwd Packets': 0,
-                'Bwd Packets': 0,
-                'Fwd Bytes': 0,
-                'Bwd Bytes': 0,
-                'Protocol': flow_id[4],  # Le protocole est le 5ème élément du tuple
-                'Src IP': flow_id[0],
-                'Dst IP': flow_id[1],
-                'Src Port': flow_id[2],
-                'Dst Port': flow_id[3],
-            }
-
-        flow = self.flows[flow_id]
-        packet_length = len(packet)
+            slot = self._new_flow(key, src_ip, dst_ip, src_port, dst_port, proto, timestamp)
 
         # Détermine la direction du paquet (Forward = Source -> Destination)
-        if packet[IP].src == flow_id[0]:
-            flow['Fwd Packets'] += 1
-            flow['Fwd Bytes'] += packet_length
+        forward = ip_to_int(packet[IP].src) == src_ip
+        if self.extended_features:
+            self.flows.add_packet_stats(slot, forward, len(packet), timestamp, *self.get_header_info(packet))
+        else:
+            self.flows.add_packet(slot, forward, len(packet), timestamp)
+        if self.sketches is not None:
+            source, destination = (src_ip, dst_ip) if forward else (dst_ip, src_ip)
+            self.sketches.add(source, destination, dst_port if forward else src_port, len(packet), timestamp)
+
+    def _account(self, src_ip, dst_ip, src_port, dst_port, proto, length, timestamp,
+                 tcp_flags=0, header_len=0):
+        """
+        Comptabilise un paquet déjà décodé (IPs entières, timestamp en secondes)
+        dans son flux, en le créant si nécessaire. Les flags TCP et la longueur
+        d'en-tête ne servent qu'aux statistiques étendues.
+        """
+        flows = self.flows
+        slot = flows.find(pack_flow_key(src_ip, dst_ip, src_port, dst_port, proto))
+        if slot is None:
+            # Le paquet est peut-être dans le sens inverse d'un flux enregistré
+            slot = flows.find(pack_flow_key(dst_ip, src_ip, dst_port, src_port, proto))
+            if slot is None:
+                # C'est un tout nouveau flux
+                slot = self._new_flow(
+                    pack_flow_key(src_ip, dst_ip, src_port, dst_port, proto),
+                    src_ip, dst_ip, src_port, dst_port, proto, timestamp
+                )
+        if self.extended_features:
+            flows.add_packet_stats(slot, src_ip == flows.src_ip[slot], length, timestamp, tcp_flags, header_len)
         else:
-            flow['Bwd Packets'] += 1
-            flow['Bwd Bytes'] += packet_length
+            flows.add_packet(slot, src_ip == flows.src_ip[slot], length, timestamp)
+        if self.sketches is not None:
+            self.sketches.add(src_ip, dst_ip, dst_port, length, timestamp)
+
+    def _new_flow(self, key, src_ip, dst_ip, src_port, dst_port, proto, timestamp):
+        """Crée un flux dans la table et programme sa première échéance."""
+        slot = self.flows.insert(key, src_ip, dst_ip, src_port, dst_port, proto, timestamp)
+        self._schedule(slot, timestamp + min(self.inactive_timeout, self.active_timeout))
+        return slot
 
-        flow['Last Seen'] = timestamp
+    def _schedule(self, slot, deadline):
+        """Programme (ou reprogramme) l'échéance d'un flux dans le tas."""
+        self.flows.deadline[slot] = deadline
+        heapq.heappush(self._expiry_heap, (deadline, slot))
 
     def check_timeouts(self, current_time):
         """
         Vérifie et retourne les flux qui ont expiré (inactifs ou trop longs).
+
+        Seules les entrées du tas dont l'échéance est dépassée sont examinées :
+        une entrée dont le flux a été vu depuis est simplement reprogrammée.
         """
+        now = _to_seconds(current_time)
+        flows = self.flows
+        heap = self._expiry_heap
         expired_flows = []
-        for flow_id, flow_data in list(self.flows.items()):
-            duration = (current_time - flow_data['Start Time']).total_seconds()
-            inactive_time = (current_time - flow_data['Last Seen']).total_seconds()
 
-            if inactive_time > self.inactive_timeout or duration > self.active_timeout:
-                expired_flows.append((flow_id, flow_data))
-                del self.flows[flow_id]
+        while heap and heap[0][0] < now:
+            deadline, slot = heapq.heappop(heap)
+            if flows.deadline[slot] != deadline:
+                continue  # Entrée périmée (flux déjà expiré ou reprogrammé)
+
+            real_deadline = min(
+                flows.last_seen[slot] + self.inactive_timeout,
+                flows.start_time[slot] + self.active_timeout
+            )
+            if real_deadline < now:
+                expired_flows.append(flows.pop_raw(slot) if self.raw_records else flows.pop(slot))
+            else:
+                self._schedule(slot, real_deadline)
 
         return expired_flows
 
+    def flush(self):
+        """
+        Termine et retourne tous les flux encore actifs (fin de capture ou de rejeu).
+        """
+        flows = self.flows
+        pop = flows.pop_raw if self.raw_records else flows.pop
+        expired_flows = [pop(slot) for slot in flows.slots()]
+        self._expiry_heap = []
+        return expired_flows
+
     def process_packet(self, packet):
         """
         Traite un paquet : l'ajoute à un flux existant ou crée un nouveau flux.
-        Retourne une liste de flux expirés (terminés) à cause de ce paquet.
+        Retourne une liste de flux expirés (terminés) lors de ce tick.
         """
         if not packet.haslayer(IP):
             return []  # Ignore les paquets non-IP
 
-        timestamp = datetime.now()
+        timestamp = time.time()
         flow_id_tuple = self.get_flow_id(packet)
 
         if not flow_id_tuple:
             return []
 
-        flow_id, reverse_flow_id = flow_id_tuple
+        # Recherche le flux dans un sens ou dans l'autre, ou le crée
+        src_ip, dst_ip, src_port, dst_port, proto = flow_id_tuple[0]
+        tcp_flags, header_len = self.get_header_info(packet) if self.extended_features else (0, 0)
+        self._account(
+            ip_to_int(src_ip), ip_to_int(dst_ip), src_port, dst_port, proto,
+            len(packet), timestamp, tcp_flags, header_len
+        )
 
-        # Vérifie si le flux existe déjà dans un sens ou dans l'autre
-        if flow_id in self.flows:
-            self.update_flow(packet, flow_id, timestamp)
-        elif reverse_flow_id in self.flows:
-            # Le paquet est dans le sens inverse du flux enregistré
-            self.update_flow(packet, reverse_flow_id, timestamp)
-        else:
-            # C'est un tout nouveau flux
-            self.update_flow(packet, flow_id, timestamp)
+        return self._tick(timestamp)
+
+    def process_frame(self, frame, timestamp=None, linktype=LINKTYPE_ETHERNET):
+        """
+        Chemin rapide : traite une trame brute sans dissection Scapy.
+        `timestamp` est l'horodatage de capture en secondes epoch (maintenant par défaut).
+        Retourne une liste de flux expirés (terminés) lors de ce tick.
+        """
+        parsed = parse_frame(frame, linktype)
+        if parsed is None:
+            return []  # Ignore les trames non-IPv4
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        src_ip, dst_ip, src_port, dst_port, proto, tcp_flags, header_len = parsed
+        self._account(src_ip, dst_ip, src_port, dst_port, proto, len(frame), timestamp, tcp_flags, header_len)
+        return self._tick(timestamp)
+
+    def process_frames(self, batch, linktype=LINKTYPE_ETHERNET):
+        """
+        Traite un lot [(trame, timestamp), ...] (par exemple un bloc de l'anneau
+        TPACKET_V3). Les timeouts ne sont vérifiés qu'une fois, en fin de lot ;
+        un lot vide fait avancer les timeouts sur l'horloge courante.
+        """
+        account = self._account
+        timestamp = None
+        for frame, timestamp in batch:
+            parsed = parse_frame(frame, linktype)
+            if parsed is None:
+                continue
+            src_ip, dst_ip, src_port, dst_port, proto, tcp_flags, header_len = parsed
+            account(src_ip, dst_ip, src_port, dst_port, proto, len(frame), timestamp, tcp_flags, header_len)
+
+        if timestamp is None:
+            timestamp = time.time()
+        return self._tick(timestamp)
+
+    def process_parsed(self, batch):
+        """
+        Traite un lot de paquets déjà décodés
+        [(src_ip, dst_ip, src_port, dst_port, proto, longueur, timestamp, flags TCP, longueur d'en-tête), ...]
+        (IPs entières, voir sharded_pipeline.py). Les timeouts avancent paquet
+        par paquet comme dans process_frame (un lot peut couvrir plusieurs
+        ticks) ; un lot vide les fait avancer sur l'horloge courante.
+        """
+        if not batch:
+            return self._tick(time.time())
 
-        # Vérifie les timeouts après la mise à jour
-        expired_flows = self.check_timeouts(timestamp)
+        account = self._account
+        tick = self._tick
+        expired_flows = []
+        for src_ip, dst_ip, src_port, dst_port, proto, length, timestamp, tcp_flags, header_len in batch:
+            account(src_ip, dst_ip, src_port, dst_port, proto, length, timestamp, tcp_flags, header_len)
+            expired_flows += tick(timestamp)
         return expired_flows
 
+    def _tick(self, timestamp):
+        """Vérifie les timeouts au plus une fois par tick."""
+        if self._next_tick is not None and timestamp < self._next_tick:
+            return []
+        self._next_tick = timestamp + self.tick_interval
+        return self.check_timeouts(timestamp)
+
 # Instance globale du générateur de flux
 flow_gen = FlowGenerator()
 
@@ -154,6 +309,179 @@ def filter_numeric_features(features_dict):
     
     return numeric_features
 
+# Features produites avec FlowGenerator(extended_features=True), noms
+# CSE-CIC-IDS2018 (correspondance CIC-IDS2017 dans train_model.py). Les
+# longueurs sont celles de TotLen (octets capturés), les durées en secondes
+# et les écarts-types ceux de l'échantillon (n - 1), comme CICFlowMeter.
+EXTENDED_FEATURE_NAMES = [
+    'Fwd Pkt Len Max', 'Fwd Pkt Len Min', 'Fwd Pkt Len Mean', 'Fwd Pkt Len Std',
+    'Bwd Pkt Len Max', 'Bwd Pkt Len Min', 'Bwd Pkt Len Mean', 'Bwd Pkt Len Std',
+    'Flow IAT Mean', 'Flow IAT Std', 'Flow IAT Max', 'Flow IAT Min',
+    'Fwd IAT Tot', 'Fwd IAT Mean', 'Fwd IAT Std', 'Fwd IAT Max', 'Fwd IAT Min',
+    'Bwd IAT Tot', 'Bwd IAT Mean', 'Bwd IAT Std', 'Bwd IAT Max', 'Bwd IAT Min',
+    'Fwd PSH Flags', 'Bwd PSH Flags', 'Fwd URG Flags', 'Bwd URG Flags',
+    'Fwd Header Len', 'Bwd Header Len', 'Fwd Pkts/s', 'Bwd Pkts/s',
+    'Pkt Len Min', 'Pkt Len Max', 'Pkt Len Mean', 'Pkt Len Std', 'Pkt Len Var',
+    'FIN Flag Cnt', 'SYN Flag Cnt', 'RST Flag Cnt', 'PSH Flag Cnt',
+    'ACK Flag Cnt', 'URG Flag Cnt', 'CWE Flag Count', 'ECE Flag Cnt',
+    'Down/Up Ratio', 'Pkt Size Avg', 'Fwd Seg Size Avg', 'Bwd Seg Size Avg',
+]
+
+def _std(m2, count):
+    """Écart-type d'échantillon à partir du M2 de Welford."""
+    return (m2 / (count - 1)) ** 0.5 if count > 1 else 0.0
+
+def extended_features(flow_data, duration):
+    """
+    Features étendues (EXTENDED_FEATURE_NAMES) d'un flux, à partir des
+    accumulateurs de FlowTable (flow_data['Stats']).
+    """
+    stats = flow_data['Stats']
+    fwd, bwd = flow_data['Fwd Packets'], flow_data['Bwd Packets']
+    packets = fwd + bwd
+    total_bytes = flow_data['Fwd Bytes'] + flow_data['Bwd Bytes']
+
+    # Longueurs toutes directions : combinaison des deux accumulateurs (Chan et al.)
+    if fwd and bwd:
+        delta = stats['bwd_len_mean'] - stats['fwd_len_mean']
+        len_mean = total_bytes / packets
+        len_m2 = stats['fwd_len_m2'] + stats['bwd_len_m2'] + delta * delta * fwd * bwd / packets
+        len_min = min(stats['fwd_len_min'], stats['bwd_len_min'])
+        len_max = max(stats['fwd_len_max'], stats['bwd_len_max'])
+    else:
+        side = 'fwd' if fwd else 'bwd'
+        len_mean = stats[f'{side}_len_mean']
+        len_m2 = stats[f'{side}_len_m2']
+        len_min = stats[f'{side}_len_min']
+        len_max = stats[f'{side}_len_max']
+    len_var = len_m2 / (packets - 1) if packets > 1 else 0.0
+
+    return {
+        'Fwd Pkt Len Max': stats['fwd_len_max'],
+        'Fwd Pkt Len Min': stats['fwd_len_min'],
+        'Fwd Pkt Len Mean': stats['fwd_len_mean'],
+        'Fwd Pkt Len Std': _std(stats['fwd_len_m2'], fwd),
+        'Bwd Pkt Len Max': stats['bwd_len_max'],
+        'Bwd Pkt Len Min': stats['bwd_len_min'],
+        'Bwd Pkt Len Mean': stats['bwd_len_mean'],
+        'Bwd Pkt Len Std': _std(stats['bwd_len_m2'], bwd),
+        'Flow IAT Mean': stats['flow_iat_mean'],
+        'Flow IAT Std': _std(stats['flow_iat_m2'], packets - 1),
+        'Flow IAT Max': stats['flow_iat_max'],
+        'Flow IAT Min': stats['flow_iat_min'],
+        'Fwd IAT Tot': stats['fwd_iat_mean'] * max(fwd - 1, 0),
+        'Fwd IAT Mean': stats['fwd_iat_mean'],
+        'Fwd IAT Std': _std(stats['fwd_iat_m2'], fwd - 1),
+        'Fwd IAT Max': stats['fwd_iat_max'],
+        'Fwd IAT Min': stats['fwd_iat_min'],
+        'Bwd IAT Tot': stats['bwd_iat_mean'] * max(bwd - 1, 0),
+        'Bwd IAT Mean': stats['bwd_iat_mean'],
+        'Bwd IAT Std': _std(stats['bwd_iat_m2'], bwd - 1),
+        'Bwd IAT Max': stats['bwd_iat_max'],
+        'Bwd IAT Min': stats['bwd_iat_min'],
+        'Fwd PSH Flags': stats['fwd_psh'],
+        'Bwd PSH Flags': stats['bwd_psh'],
+        'Fwd URG Flags': stats['fwd_urg'],
+        'Bwd URG Flags': stats['bwd_urg'],
+        'Fwd Header Len': stats['fwd_header_bytes'],
+        'Bwd Header Len': stats['bwd_header_bytes'],
+        'Fwd Pkts/s': fwd / duration if duration > 0 else 0,
+        'Bwd Pkts/s': bwd / duration if duration > 0 else 0,
+        'Pkt Len Min': len_min,
+        'Pkt Len Max': len_max,
+        'Pkt Len Mean': len_mean,
+        'Pkt Len Std': len_var ** 0.5,
+        'Pkt Len Var': len_var,
+        'FIN Flag Cnt': stats['fin_count'],
+        'SYN Flag Cnt': stats['syn_count'],
+        'RST Flag Cnt': stats['rst_count'],
+        'PSH Flag Cnt': stats['psh_count'],
+        'ACK Flag Cnt': stats['ack_count'],
+        'URG Flag Cnt': stats['urg_count'],
+        'CWE Flag Count': stats['cwr_count'],
+        'ECE Flag Cnt': stats['ece_count'],
+        'Down/Up Ratio': bwd / fwd if fwd else 0,
+        'Pkt Size Avg': total_bytes / packets if packets else 0,
+        'Fwd Seg Size Avg': stats['fwd_len_mean'],
+        'Bwd Seg Size Avg': stats['bwd_len_mean'],
+    }
+
+def flow_to_features(flow_data):
+    """
+    Calcule le dictionnaire de features d'un flux expiré.
+    """
+    # Calcule la durée du flux
+    duration = (flow_data['Last Seen'] - flow_data['Start Time']).total_seconds()
+
+    # Crée un dictionnaire de features pour ce flux AVEC TOUTES LES INFORMATIONS
+    features = {
+        # Features numériques pour le modèle IA
+        'Duration': duration,
+        'Tot Fwd Pkts': flow_data['Fwd Packets'],
+        'Tot Bwd Pkts': flow_data['Bwd Packets'],
+        'TotLen Fwd Pkts': flow_data['Fwd Bytes'],
+        'TotLen Bwd Pkts': flow_data['Bwd Bytes'],
+        'Flow Bytes/s': (flow_data['Fwd Bytes'] + flow_data['Bwd Bytes']) / duration if duration > 0 else 0,
+        'Flow Packets/s': (flow_data['Fwd Packets'] + flow_data['Bwd Packets']) / duration if duration > 0 else 0,
+
+        # Informations critiques pour le logging et blocage (DOIT ÊTRE INCLUS)
+        'Src IP': flow_data['Src IP'],
+        'Dst IP': flow_data['Dst IP'],
+        'Protocol': flow_data['Protocol'],
+        'Src Port': flow_data['Src Port'],
+        'Dst Port': flow_data['Dst Port'],
+        'Start Time': flow_data['Start Time'].isoformat(),
+        'Last Seen': flow_data['Last Seen'].isoformat()
+    }
+    if 'Stats' in flow_data:
+        features.update(extended_features(flow_data, duration))
+    return features
+
+def records_to_matrix(records, feature_names):
+    """
+    Version vectorisée de flow_to_features pour des flux bruts : `records` est
+    un tableau NumPy structuré aux champs de FlowTable.RECORD_FIELDS (voir
+    shm_ring.py). Retourne la matrice N×F dans l'ordre de `feature_names`
+    (les features inconnues valent 0).
+    """
+    duration = records['last_seen'] - records['start_time']
+    packets = records['fwd_packets'].astype(np.float64) + records['bwd_packets']
+    total_bytes = records['fwd_bytes'].astype(np.float64) + records['bwd_bytes']
+    positive = duration > 0
+    zeros = np.zeros(len(records))
+
+    columns = {
+        'Duration': duration,
+        'Tot Fwd Pkts': records['fwd_packets'],
+        'Tot Bwd Pkts': records['bwd_packets'],
+        'TotLen Fwd Pkts': records['fwd_bytes'],
+        'TotLen Bwd Pkts': records['bwd_bytes'],
+        'Flow Bytes/s': np.divide(total_bytes, duration, out=zeros.copy(), where=positive),
+        'Flow Packets/s': np.divide(packets, duration, out=zeros.copy(), where=positive),
+    }
+    return np.column_stack([columns.get(name, zeros) for name in feature_names]).astype(np.float64)
+
+def record_to_features(record):
+    """
+    Dictionnaire de features (format de flow_to_features) d'un flux brut,
+    pour le logging et le blocage.
+    """
+    start_time = datetime.fromtimestamp(float(record['start_time']))
+    last_seen = datetime.fromtimestamp(float(record['last_seen']))
+    return flow_to_features({
+        'Start Time': start_time,
+        'Last Seen': last_seen,
+        'Fwd Packets': int(record['fwd_packets']),
+        'Bwd Packets': int(record['bwd_packets']),
+        'Fwd Bytes': int(record['fwd_bytes']),
+        'Bwd Bytes': int(record['bwd_bytes']),
+        'Protocol': int(record['protocol']),
+        'Src IP': int_to_ip(int(record['src_ip'])),
+        'Dst IP': int_to_ip(int(record['dst_ip'])),
+        'Src Port': int(record['src_port']),
+        'Dst Port': int(record['dst_port']),
+    })
+
 def packet_to_features(packet):
     """
     Fonction principale appelée pour chaque paquet.
@@ -161,43 +489,27 @@ def packet_to_features(packet):
     Si le paquet a provoqué l'expiration d'un flux, on retourne les features de ce flux.
     """
     expired_flows = flow_gen.process_packet(packet)
+    return [flow_to_features(flow_data) for _, flow_data in expired_flows]
 
-    def packet_to_features(packet):
-        """
-        Fonction principale appelée pour chaque paquet.
-        Reçoit un paquet, le donne au générateur de flux.
-        Si le paquet a provoqué l'expiration d'un flux, on retourne les features de ce flux.
-        """
-        expired_flows = flow_gen.process_packet(packet)
-
-        features_list = []
-        for flow_id, flow_data in expired_flows:
-            # Calcule la durée du flux
-            duration = (flow_data['Last Seen'] - flow_data['Start Time']).total_seconds()
-
-            # Crée un dictionnaire de features pour ce flux AVEC TOUTES LES INFORMATIONS
-            flow_features = {
-                # Features numériques pour le modèle IA
-                'Duration': duration,
-                'Tot Fwd Pkts': flow_data['Fwd Packets'],
-                'Tot Bwd Pkts': flow_data['Bwd Packets'],
-                'TotLen Fwd Pkts': flow_data['Fwd Bytes'],
-                'TotLen Bwd Pkts': flow_data['Bwd Bytes'],
-                'Flow Bytes/s': (flow_data['Fwd Bytes'] + flow_data['Bwd Bytes']) / duration if duration > 0 else 0,
-                'Flow Packets/s': (flow_data['Fwd Packets'] + flow_data['Bwd Packets']) / duration if duration > 0 else 0,
-                
-                # Informations critiques pour le logging et blocage (DOIT ÊTRE INCLUS)
-                'Src IP': flow_data['Src IP'],
-                'Dst IP': flow_data['Dst IP'], 
-                'Protocol': flow_data['Protocol'],
-                'Src Port': flow_data['Src Port'],
-                'Dst Port': flow_data['Dst Port'],
-                'Start Time': flow_data['Start Time'].isoformat(),
-                'Last Seen': flow_data['Last Seen'].isoformat()
-            }
-            features_list.append(flow_features)
-
-        return features_list
+def frame_to_features(frame, timestamp=None, linktype=LINKTYPE_ETHERNET):
+    """
+    Équivalent de packet_to_features pour une trame brute (chemin rapide).
+    """
+    expired_flows = flow_gen.process_frame(frame, timestamp, linktype)
+    return [flow_to_features(flow_data) for _, flow_data in expired_flows]
+
+def frames_to_features(batch, linktype=LINKTYPE_ETHERNET):
+    """
+    Équivalent de frame_to_features pour un lot de trames brutes.
+    """
+    expired_flows = flow_gen.process_frames(batch, linktype)
+    return [flow_to_features(flow_data) for _, flow_data in expired_flows]
+
+def flush_features():
+    """
+    Termine tous les flux actifs du générateur global et retourne leurs features.
+    """
+    return [flow_to_features(flow_data) for _, flow_data in flow_gen.flush()]
 
 # Test simple si le script est exécuté directement
 if __name__ == "__main__":
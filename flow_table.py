@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Table de flux compacte pour NGFW-Congo.
+Stocke les flux actifs en colonnes (struct-of-arrays) plutôt qu'en dictionnaires.
+"""
+
+from array import array
+from datetime import datetime
+import socket
+
+def ip_to_int(ip):
+    """Convertit une adresse IPv4 texte en entier 32 bits."""
+    return int.from_bytes(socket.inet_aton(ip), 'big')
+
+def int_to_ip(value):
+    """Convertit un entier 32 bits en adresse IPv4 texte."""
+    return socket.inet_ntoa(value.to_bytes(4, 'big'))
+
+def _welford(mins, maxs, means, m2s, slot, value, count):
+    """
+    Ajoute `value` (la count-ième valeur) aux min, max, moyenne et M2 (somme
+    des carrés des écarts, algorithme de Welford) stockés au slot `slot`.
+    """
+    if count == 1:
+        mins[slot] = maxs[slot] = means[slot] = value
+        m2s[slot] = 0.0
+        return
+    if value < mins[slot]:
+        mins[slot] = value
+    elif value > maxs[slot]:
+        maxs[slot] = value
+    mean = means[slot]
+    delta = value - mean
+    mean += delta / count
+    means[slot] = mean
+    m2s[slot] += delta * (value - mean)
+
+def pack_flow_key(src_ip, dst_ip, src_port, dst_port, proto):
+    """
+    Empaquette une 5-tuple (IPs entières) dans un seul entier de 104 bits.
+    Beaucoup plus compact qu'un tuple de chaînes comme clé de dictionnaire.
+    """
+    return (src_ip << 72) | (dst_ip << 40) | (src_port << 24) | (dst_port << 8) | proto
+
+class FlowTable:
+    """
+    Table des flux actifs organisée en colonnes `array` typées.
+
+    Chaque flux occupe un "slot" (indice commun à toutes les colonnes). Les slots
+    libérés sont recyclés via une free-list, et un index {clé empaquetée: slot}
+    permet de retrouver un flux en O(1).
+    """
+    # (nom de colonne, typecode array)
+    COLUMNS = (
+        ('start_time', 'd'),
+        ('last_seen', 'd'),
+        ('deadline', 'd'),      # Échéance programmée dans le tas d'expiration
+        ('fwd_packets', 'Q'),
+        ('bwd_packets', 'Q'),
+        ('fwd_bytes', 'Q'),
+        ('bwd_bytes', 'Q'),
+        ('src_ip', 'I'),
+        ('dst_ip', 'I'),
+        ('src_port', 'H'),
+        ('dst_port', 'H'),
+        ('protocol', 'B'),
+    )
+
+    # Statistiques étendues (extended=True), compatibles CIC-IDS : longueurs de
+    # paquets et temps inter-arrivées (IAT) par direction et pour le flux
+    # (min, max, moyenne et M2 de Welford), flags TCP et octets d'en-tête.
+    # Taille fixe par flux : aucune liste par paquet.
+    EXTENDED_COLUMNS = (
+        ('fwd_len_min', 'd'), ('fwd_len_max', 'd'), ('fwd_len_mean', 'd'), ('fwd_len_m2', 'd'),
+        ('fwd_last', 'd'),
+        ('fwd_iat_min', 'd'), ('fwd_iat_max', 'd'), ('fwd_iat_mean', 'd'), ('fwd_iat_m2', 'd'),
+        ('fwd_header_bytes', 'Q'), ('fwd_psh', 'I'), ('fwd_urg', 'I'),
+        ('bwd_len_min', 'd'), ('bwd_len_max', 'd'), ('bwd_len_mean', 'd'), ('bwd_len_m2', 'd'),
+        ('bwd_last', 'd'),
+        ('bwd_iat_min', 'd'), ('bwd_iat_max', 'd'), ('bwd_iat_mean', 'd'), ('bwd_iat_m2', 'd'),
+        ('bwd_header_bytes', 'Q'), ('bwd_psh', 'I'), ('bwd_urg', 'I'),
+        ('flow_iat_min', 'd'), ('flow_iat_max', 'd'), ('flow_iat_mean', 'd'), ('flow_iat_m2', 'd'),
+        ('fin_count', 'I'), ('syn_count', 'I'), ('rst_count', 'I'), ('psh_count', 'I'),
+        ('ack_count', 'I'), ('urg_count', 'I'), ('ece_count', 'I'), ('cwr_count', 'I'),
+    )
+
+    # Champs d'un flux exporté brut (pop_raw), dans l'ordre du tuple retourné
+    RECORD_FIELDS = (
+        'start_time', 'last_seen',
+        'fwd_packets', 'bwd_packets', 'fwd_bytes', 'bwd_bytes',
+        'src_ip', 'dst_ip', 'src_port', 'dst_port', 'protocol',
+    )
+
+    def __init__(self, extended=False):
+        self.extended = extended
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array(typecode))
+        self._columns = [getattr(self, name) for name, _ in self.COLUMNS]
+
+        self._extended_columns = []
+        if extended:
+            for name, typecode in self.EXTENDED_COLUMNS:
+                setattr(self, name, array(typecode))
+            self._extended_columns = [getattr(self, name) for name, _ in self.EXTENDED_COLUMNS]
+            # Colonnes par direction (True = forward), dans l'ordre de EXTENDED_COLUMNS
+            self._directions = {True: self._extended_columns[:12], False: self._extended_columns[12:24]}
+            self._flow_iat = self._extended_columns[24:28]
+
+        self._index = {}
+        self._free = array('I')
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, flow_id):
+        return self.key_for(flow_id) in self._index
+
+    def __getitem__(self, flow_id):
+        return self.record(self._index[self.key_for(flow_id)])
+
+    @staticmethod
+    def key_for(flow_id):
+        """Clé empaquetée d'un flow_id (Src IP, Dst IP, Src Port, Dst Port, Protocol)."""
+        src_ip, dst_ip, src_port, dst_port, proto = flow_id
+        return pack_flow_key(ip_to_int(src_ip), ip_to_int(dst_ip), src_port, dst_port, proto)
+
+    def find(self, key):
+        """Retourne le slot du flux de clé `key`, ou None."""
+        return self._index.get(key)
+
+    def insert(self, key, src_ip, dst_ip, src_port, dst_port, proto, timestamp):
+        """Crée un nouveau flux et retourne son slot."""
+        if self._free:
+            slot = self._free.pop()
+            self.start_time[slot] = timestamp
+            self.last_seen[slot] = timestamp
+            self.deadline[slot] = -1.0
+            self.fwd_packets[slot] = 0
+            self.bwd_packets[slot] = 0
+            self.fwd_bytes[slot] = 0
+            self.bwd_bytes[slot] = 0
+            self.src_ip[slot] = src_ip
+            self.dst_ip[slot] = dst_ip
+            self.src_port[slot] = src_port
+            self.dst_port[slot] = dst_port
+            self.protocol[slot] = proto
+            for column in self._extended_columns:
+                column[slot] = 0
+        else:
+            slot = len(self.start_time)
+            for column, value in zip(self._columns, (
+                timestamp, timestamp, -1.0, 0, 0, 0, 0,
+                src_ip, dst_ip, src_port, dst_port, proto
+            )):
+                column.append(value)
+            for column in self._extended_columns:
+                column.append(0)
+
+        self._index[key] = slot
+        return slot
+
+    def add_packet(self, slot, forward, length, timestamp):
+        """Comptabilise un paquet dans le flux `slot`."""
+        if forward:
+            self.fwd_packets[slot] += 1
+            self.fwd_bytes[slot] += length
+        else:
+            self.bwd_packets[slot] += 1
+            self.bwd_bytes[slot] += length
+        self.last_seen[slot] = timestamp
+
+    def add_packet_stats(self, slot, forward, length, timestamp, tcp_flags=0, header_len=0):
+        """
+        Comme add_packet, en tenant aussi à jour les statistiques étendues
+        (table créée avec extended=True). Coût constant par paquet.
+        """
+        if forward:
+            self.fwd_packets[slot] += 1
+            self.fwd_bytes[slot] += length
+            count = self.fwd_packets[slot]
+        else:
+            self.bwd_packets[slot] += 1
+            self.bwd_bytes[slot] += length
+            count = self.bwd_packets[slot]
+        total = self.fwd_packets[slot] + self.bwd_packets[slot]
+        previous = self.last_seen[slot]
+        self.last_seen[slot] = timestamp
+
+        (len_min, len_max, len_mean, len_m2, last,
+         iat_min, iat_max, iat_mean, iat_m2, header_bytes, psh, urg) = self._directions[forward]
+        _welford(len_min, len_max, len_mean, len_m2, slot, length, count)
+        if count > 1:
+            _welford(iat_min, iat_max, iat_mean, iat_m2, slot, timestamp - last[slot], count - 1)
+        last[slot] = timestamp
+        if total > 1:
+            flow_min, flow_max, flow_mean, flow_m2 = self._flow_iat
+            _welford(flow_min, flow_max, flow_mean, flow_m2, slot, timestamp - previous, total - 1)
+
+        header_bytes[slot] += header_len
+        if tcp_flags:
+            # FIN, SYN, RST, PSH, ACK, URG, ECE, CWR (bits 0 à 7)
+            if tcp_flags & 0x01:
+                self.fin_count[slot] += 1
+            if tcp_flags & 0x02:
+                self.syn_count[slot] += 1
+            if tcp_flags & 0x04:
+                self.rst_count[slot] += 1
+            if tcp_flags & 0x08:
+                self.psh_count[slot] += 1
+                psh[slot] += 1
+            if tcp_flags & 0x10:
+                self.ack_count[slot] += 1
+            if tcp_flags & 0x20:
+                self.urg_count[slot] += 1
+                urg[slot] += 1
+            if tcp_flags & 0x40:
+                self.ece_count[slot] += 1
+            if tcp_flags & 0x80:
+                self.cwr_count[slot] += 1
+
+    def flow_id(self, slot):
+        """Reconstruit le flow_id (tuple de chaînes) d'un slot."""
+        return (
+            int_to_ip(self.src_ip[slot]),
+            int_to_ip(self.dst_ip[slot]),
+            self.src_port[slot],
+            self.dst_port[slot],
+            self.protocol[slot],
+        )
+
+    def record(self, slot):
+        """
+        Matérialise un flux sous forme de dictionnaire, au format historique
+        de FlowGenerator (datetimes, adresses IP texte).
+        """
+        flow_id = self.flow_id(slot)
+        record = {
+            'Start Time': datetime.fromtimestamp(self.start_time[slot]),
+            'Last Seen': datetime.fromtimestamp(self.last_seen[slot]),
+            'Fwd Packets': self.fwd_packets[slot],
+            'Bwd Packets': self.bwd_packets[slot],
+            'Fwd Bytes': self.fwd_bytes[slot],
+            'Bwd Bytes': self.bwd_bytes[slot],
+            'Protocol': flow_id[4],
+            'Src IP': flow_id[0],
+            'Dst IP': flow_id[1],
+            'Src Port': flow_id[2],
+            'Dst Port': flow_id[3],
+        }
+        if self.extended:
+            # Accumulateurs bruts, convertis en features par feature_extractor.flow_to_features
+            record['Stats'] = {name: column[slot] for (name, _), column
+                               in zip(self.EXTENDED_COLUMNS, self._extended_columns)}
+        return record
+
+    def pop(self, slot):
+        """Retire un flux de la table et retourne (flow_id, flow_data)."""
+        flow_id = self.flow_id(slot)
+        flow_data = self.record(slot)
+        self._release(slot)
+        return flow_id, flow_data
+
+    def pop_raw(self, slot):
+        """
+        Retire un flux de la table et retourne ses valeurs brutes (nombres
+        seulement, IPs entières), dans l'ordre de RECORD_FIELDS.
+        """
+        raw = (
+            self.start_time[slot], self.last_seen[slot],
+            self.fwd_packets[slot], self.bwd_packets[slot],
+            self.fwd_bytes[slot], self.bwd_bytes[slot],
+            self.src_ip[slot], self.dst_ip[slot],
+            self.src_port[slot], self.dst_port[slot], self.protocol[slot],
+        )
+        self._release(slot)
+        return raw
+
+    def _release(self, slot):
+        """Retire le flux de l'index et rend son slot à la free-list."""
+        del self._index[pack_flow_key(
+            self.src_ip[slot], self.dst_ip[slot],
+            self.src_port[slot], self.dst_port[slot], self.protocol[slot]
+        )]
+        self.deadline[slot] = -1.0
+        self._free.append(slot)
+
+    def slots(self):
+        """Liste des slots occupés par des flux actifs."""
+        return list(self._index.values())
+
+    def items(self):
+        """Itère sur (flow_id, flow_data) pour tous les flux actifs."""
+        for slot in self.slots():
+            yield self.flow_id(slot), self.record(slot)
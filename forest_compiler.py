@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Compilation de l'Isolation Forest pour NGFW-Congo.
+Aplatit les arbres entraînés par scikit-learn en tableaux NumPy contigus
+(feature, seuil, fils gauche/droit, longueur de chemin) et les évalue par lots,
+niveau par niveau, sans importer scikit-learn à l'exécution.
+"""
+
+import os
+import numpy as np
+
+def average_path_length(n_samples):
+    """
+    Longueur moyenne c(n) d'une recherche infructueuse dans un arbre binaire de
+    n échantillons (correction de profondeur de l'article Isolation Forest).
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    mask = n > 2
+    result[mask] = 2.0 * (np.log(n[mask] - 1.0) + np.euler_gamma) - 2.0 * (n[mask] - 1.0) / n[mask]
+    return result
+
+def compiled_path_for(model_path):
+    """Chemin du modèle compilé (.npz) associé à un fichier modèle."""
+    root, _ = os.path.splitext(model_path)
+    if root.endswith('.bundle'):
+        root = root[:-len('.bundle')]
+    return f"{root}.npz"
+
+def compile_forest(model, feature_names=None, scaler_mean=None, scaler_scale=None):
+    """
+    Aplatit un IsolationForest entraîné en un dictionnaire de tableaux NumPy.
+
+    Tous les arbres sont concaténés dans des tableaux de nœuds communs. Une
+    feuille pointe sur elle-même (fils gauche = fils droit = elle-même, seuil
+    +inf) pour que le parcours par niveaux n'ait aucun branchement, et porte sa
+    contribution à la profondeur : profondeur + c(n_échantillons) - 1.
+    """
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+
+    for tree, tree_features in zip(model.estimators_, model.estimators_features_):
+        t = tree.tree_
+        n_nodes = t.node_count
+        is_leaf = t.children_left == -1
+
+        # Profondeur de chaque nœud (racine = 1, comme decision_path)
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        depth[0] = 1
+        for node in range(n_nodes):
+            if not is_leaf[node]:
+                depth[t.children_left[node]] = depth[node] + 1
+                depth[t.children_right[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()) - 1)
+
+        node_ids = np.arange(n_nodes)
+        tree_features = np.asarray(tree_features)
+        features.append(np.where(is_leaf, 0, tree_features[np.maximum(t.feature, 0)]))
+        thresholds.append(np.where(is_leaf, np.inf, t.threshold))
+        lefts.append(np.where(is_leaf, node_ids, t.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, t.children_right) + offset)
+        values.append(np.where(
+            is_leaf,
+            depth + average_path_length(t.n_node_samples) - 1.0,
+            0.0
+        ))
+        roots.append(offset)
+        offset += n_nodes
+
+    n_trees = len(model.estimators_)
+    n_features = model.n_features_in_
+    if feature_names is None:
+        feature_names = getattr(model, 'feature_names_in_', [f"f{i}" for i in range(n_features)])
+
+    compiled = {
+        'feature': np.concatenate(features).astype(np.int32),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.int32),
+        'right': np.concatenate(rights).astype(np.int32),
+        'value': np.concatenate(values).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'max_depth': np.int32(max_depth),
+        'denominator': np.float64(n_trees * average_path_length([model._max_samples])[0]),
+        'offset': np.float64(model.offset_),
+        'feature_names': np.asarray(list(feature_names), dtype=str),
+    }
+    # Le scaler n'est présent que si le modèle vient d'un bundle
+    if scaler_mean is not None and scaler_scale is not None:
+        compiled['scaler_mean'] = np.asarray(scaler_mean, dtype=np.float64)
+        compiled['scaler_scale'] = np.asarray(scaler_scale, dtype=np.float64)
+    return compiled
+
+def save_compiled(path, compiled):
+    """Sauvegarde un modèle compilé au format .npz."""
+    np.savez(path, **compiled)
+
+class FlatForest:
+    """
+    Isolation Forest compilé : évaluation vectorisée de tous les arbres sur
+    tout un lot, niveau par niveau. Expose decision_function / score_samples
+    avec la même sémantique que scikit-learn.
+
+    Au chargement, chaque arbre est réorganisé en arbre binaire complet de
+    profondeur max_depth (fils de i en 2i+1 / 2i+2) : le parcours n'a alors plus
+    besoin des tableaux left/right. Les feuilles précoces sont prolongées par
+    leur branche gauche (seuil +inf). Au-delà de COMPLETE_MAX_DEPTH, on garde le
+    parcours par left/right pour borner la mémoire.
+    """
+    COMPLETE_MAX_DEPTH = 12
+    # Taille des tranches du lot : les tampons de travail restent dans le cache
+    CHUNK_SIZE = 512
+
+    def __init__(self, compiled):
+        self.feature = compiled['feature']
+        self.threshold = compiled['threshold']
+        self.left = compiled['left']
+        self.right = compiled['right']
+        self.value = compiled['value']
+        self.roots = compiled['roots']
+        self.max_depth = int(compiled['max_depth'])
+        self.denominator = float(compiled['denominator'])
+        self.offset_ = float(compiled['offset'])
+        self.feature_names = [str(name) for name in compiled['feature_names']]
+        self.scaler_mean = compiled.get('scaler_mean')
+        self.scaler_scale = compiled.get('scaler_scale')
+
+        self.complete = self.max_depth <= self.COMPLETE_MAX_DEPTH
+        if self.complete:
+            self._build_complete()
+
+    @classmethod
+    def load(cls, path):
+        """Charge un modèle compilé (.npz)."""
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def _build_complete(self):
+        """Construit la disposition en arbres binaires complets (voir la classe)."""
+        n_trees = len(self.roots)
+        width = 2 ** (self.max_depth + 1) - 1
+        feature = np.zeros((n_trees, width), dtype=np.intp)
+        threshold = np.full((n_trees, width), np.inf)
+        value = np.zeros((n_trees, width))
+
+        for tree_index, root in enumerate(self.roots):
+            stack = [(int(root), 0)]
+            while stack:
+                node, position = stack.pop()
+                if self.left[node] == node:
+                    # Feuille : sa valeur descend le long de la branche gauche
+                    while position < width:
+                        value[tree_index, position] = self.value[node]
+                        position = 2 * position + 1
+                    continue
+                feature[tree_index, position] = self.feature[node]
+                threshold[tree_index, position] = self.threshold[node]
+                stack.append((int(self.left[node]), 2 * position + 1))
+                stack.append((int(self.right[node]), 2 * position + 2))
+
+        # Seuils en float32 : plus grand float32 <= seuil, de sorte que
+        # (x32 <= t) == (x32 <= t32) pour tout x32 (X est évalué en float32)
+        threshold32 = threshold.astype(np.float32)
+        rounded_up = threshold32.astype(np.float64) > threshold
+        threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+
+        self._width = width
+        self._feature_c = feature.ravel()
+        self._threshold_c = threshold32.ravel()
+        self._value_c = value.ravel()
+        # Indice global de la racine de chaque arbre, et 1 - base pour passer
+        # directement de l'indice global d'un nœud à celui de son fils gauche
+        self._base = (np.arange(n_trees, dtype=np.intp) * width)[None, :]
+        self._step = 1 - self._base
+
+    def _depths(self, X):
+        """Somme, sur tous les arbres, de la longueur de chemin de chaque échantillon."""
+        # scikit-learn évalue les arbres en float32 : on fait de même pour
+        # obtenir exactement les mêmes feuilles
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if not self.complete:
+            return self._depths_sparse(X)
+
+        n_samples, n_features = X.shape
+        n_trees = len(self.roots)
+        flat = X.ravel()
+        depths = np.empty(n_samples)
+
+        # Tampons réutilisés d'un niveau et d'une tranche à l'autre
+        size = min(self.CHUNK_SIZE, n_samples)
+        nodes = np.empty((size, n_trees), dtype=np.intp)
+        columns = np.empty((size, n_trees), dtype=np.intp)
+        x = np.empty((size, n_trees), dtype=np.float32)
+        thresholds = np.empty((size, n_trees), dtype=np.float32)
+        go_right = np.empty((size, n_trees), dtype=bool)
+
+        for start in range(0, n_samples, self.CHUNK_SIZE):
+            count = min(self.CHUNK_SIZE, n_samples - start)
+            g, c, xv, tv, gr = nodes[:count], columns[:count], x[:count], thresholds[:count], go_right[:count]
+            row_offset = (np.arange(start, start + count, dtype=np.intp) * n_features)[:, None]
+
+            g[...] = self._base
+            for _ in range(self.max_depth):
+                np.take(self._feature_c, g, out=c)
+                c += row_offset
+                np.take(flat, c, out=xv)
+                np.take(self._threshold_c, g, out=tv)
+                np.greater(xv, tv, out=gr)
+                g *= 2
+                g += self._step
+                g += gr
+
+            depths[start:start + count] = self._accumulate(self._value_c.take(g))
+        return depths
+
+    def _depths_sparse(self, X):
+        """Parcours par left/right, pour les arbres trop profonds."""
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = np.take_along_axis(X, self.feature[nodes], axis=1)
+            nodes = np.where(x <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+        return self._accumulate(self.value[nodes])
+
+    @staticmethod
+    def _accumulate(values):
+        """Accumulation arbre par arbre, dans le même ordre que scikit-learn."""
+        if values.shape[0] < values.shape[1]:
+            # Petits lots : un seul appel (cumsum somme aussi dans l'ordre des arbres)
+            return np.cumsum(values, axis=1)[:, -1]
+        depths = np.zeros(values.shape[0])
+        for tree_index in range(values.shape[1]):
+            depths += values[:, tree_index]
+        return depths
+
+    def score_samples(self, X):
+        """Opposé du score d'anomalie de l'article (comme IsolationForest.score_samples)."""
+        depths = self._depths(X)
+        if self.denominator == 0:
+            return -np.ones_like(depths)
+        return -(2 ** (-depths / self.denominator))
+
+    def decision_function(self, X):
+        """Score de décision : négatif pour les anomalies (comme IsolationForest)."""
+        return self.score_samples(X) - self.offset_
+
+def compile_model_file(model_path, output_path=None):
+    """
+    Compile un modèle (.pkl) ou un bundle produit par train_model.py et écrit
+    le fichier .npz correspondant. Retourne le chemin écrit.
+    """
+    import joblib
+
+    loaded = joblib.load(model_path)
+    if isinstance(loaded, dict):
+        compiled = compile_forest(
+            loaded['model'], loaded['feature_names'],
+            loaded['scaler_mean'], loaded['scaler_scale']
+        )
+    else:
+        compiled = compile_forest(loaded)
+
+    output_path = output_path or compiled_path_for(model_path)
+    save_compiled(output_path, compiled)
+    return output_path
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile un Isolation Forest en tableaux NumPy plats")
+    parser.add_argument('model', help='Modèle .pkl ou bundle .bundle.pkl')
+    parser.add_argument('-o', '--output', default=None, help='Fichier .npz de sortie')
+    args = parser.parse_args()
+
+    path = compile_model_file(args.model, args.output)
+    print(f"[+] Modèle compilé sauvegardé sous : {path}")
@@ -18,18 +18,57 @@ logger.info("🛠️ DEBUT DE L'IMPORT DES MODULES")
 
 import time
 import json
-from scapy.all import sniff
-from feature_extractor import packet_to_features, FlowGenerator
-from detector import init_detector, detect_anomaly
-from blocker import init_blocker
+import argparse
+from scapy.all import sniff, conf, Ether
+import multiprocessing
+import signal
+import numpy as np
+from feature_extractor import (
+    packet_to_features, frame_to_features, frames_to_features, flush_features,
+    flow_gen, records_to_matrix, record_to_features, EXTENDED_FEATURE_NAMES
+)
+from packet_parser import LINKTYPE_ETHERNET
+from ring_capture import RingCapture
+from pcap_replay import replay
+from sharded_pipeline import ShardedPipeline
+from shm_ring import ShmFlowRing, POLICY_BLOCK, POLICY_DROP_OLDEST
+from detector import init_detector, get_detector
+from blocker import init_blocker, close_blocker
+from flow_table import ip_to_int
+from sketches import init_sketches
+from verdict_cache import flow_keys, record_keys
+from action_dispatcher import (
+    get_action_dispatcher, close_action_dispatcher, ACTION_LOG, ACTION_BLOCK, ACTION_SIEM, ACTION_SOC
+)
 import logging
 import threading
-from queue import Queue
-from api import log_event, update_stats
+from queue import Queue, Empty
+from api import update_stats
+from event_writer import close_event_writer
 
 # File d'attente pour passer les features du thread de capture au thread de détection
 features_queue = Queue(maxsize=1000)
 
+# Pipeline multi-processus (--workers N), None en mode mono-processus
+pipeline = None
+
+# Anneau en mémoire partagée vers le processus de détection (--transport shm)
+flow_ring = None
+
+# Sketches comportementaux par source (None si désactivés, voir sketches.py)
+behavior_sketch = None
+# Dernier signalement comportemental de chaque source (monotonic)
+behavior_reported = {}
+
+# Micro-lots de détection : taille maximale et attente maximale (secondes)
+BATCH_MAX_SIZE = 256
+BATCH_MAX_WAIT = 0.05
+
+# Intervalle minimal (secondes) entre deux logs de statistiques des chemins
+# par lots (workers, anneau shm), qui reçoivent plusieurs lots par seconde
+STATS_LOG_INTERVAL = 10.0
+last_stats_log = 0.0
+
 # Compteurs pour les statistiques
 stats = {
     'packets_captured': 0,
@@ -38,20 +77,6 @@ stats = {
     'start_time': time.time()
 }
 
-def extract_numeric_features(flow_features):
-    """
-    Extrait uniquement les features numériques pour le modèle IA
-    en conservant les informations originales pour le logging.
-    """
-    # Liste des clés à conserver (features numériques)
-    numeric_keys = [
-        'Duration', 'Tot Fwd Pkts', 'Tot Bwd Pkts', 
-        'TotLen Fwd Pkts', 'TotLen Bwd Pkts', 
-        'Flow Bytes/s', 'Flow Packets/s'
-    ]
-    
-    return {k: v for k, v in flow_features.items() if k in numeric_keys}
-
 def packet_handler(packet):
     """
     Callback appelé par Scapy pour chaque paquet capturé.
@@ -59,6 +84,13 @@ def packet_handler(packet):
     stats['packets_captured'] += 1
     
     try:
+        if pipeline is not None:
+            pipeline.dispatch_packet(packet)
+            return
+        if flow_ring is not None:
+            flow_ring.put_many(flow_gen.process_packet(packet))
+            return
+
         # Traite le paquet et obtient les features des flux expirés
         expired_flows = packet_to_features(packet)
         
@@ -70,69 +102,322 @@ def packet_handler(packet):
     except Exception as e:
         logger.error(f"Erreur dans packet_handler: {e}")
 
+def frame_handler(frame, timestamp, linktype=LINKTYPE_ETHERNET):
+    """
+    Équivalent de packet_handler pour le chemin rapide (trame brute, sans Scapy).
+    """
+    stats['packets_captured'] += 1
+
+    try:
+        if pipeline is not None:
+            pipeline.dispatch_frame(frame, timestamp, linktype)
+            return
+        if flow_ring is not None:
+            flow_ring.put_many(flow_gen.process_frame(frame, timestamp, linktype))
+            return
+
+        for flow_features in frame_to_features(frame, timestamp, linktype):
+            features_queue.put(flow_features)
+
+    except Exception as e:
+        logger.error(f"Erreur dans frame_handler: {e}")
+
+def capture_raw(interface, bpf_filter=None):
+    """
+    Capture en mode brut : les trames sont lues sans dissection Scapy et
+    décodées par le parseur rapide. Si le type de lien de l'interface n'est
+    pas Ethernet, on retombe sur la dissection Scapy.
+    """
+    sock = conf.L2listen(iface=interface, filter=bpf_filter)
+    fast_path = sock.LL is Ether
+    if not fast_path:
+        logger.warning(f"Type de lien {sock.LL.__name__} non supporté par le parseur rapide, dissection Scapy utilisée.")
+
+    try:
+        while True:
+            cls, frame, timestamp = sock.recv_raw()
+            if frame is None:
+                continue
+            if fast_path:
+                frame_handler(frame, timestamp)
+            else:
+                packet_handler(cls(frame))
+    finally:
+        sock.close()
+
+def batch_handler(batch):
+    """
+    Traite un lot de trames brutes (un bloc de l'anneau TPACKET_V3).
+    """
+    stats['packets_captured'] += len(batch)
+
+    try:
+        if pipeline is not None:
+            pipeline.dispatch_frames(batch)
+            return
+        if flow_ring is not None:
+            flow_ring.put_many(flow_gen.process_frames(batch))
+            return
+
+        for flow_features in frames_to_features(batch):
+            features_queue.put(flow_features)
+
+    except Exception as e:
+        logger.error(f"Erreur dans batch_handler: {e}")
+
+def capture_ring(interface, bpf_filter=None):
+    """
+    Capture via l'anneau mmap TPACKET_V3 : un lot de trames par bloc noyau,
+    décodées sans copie par le parseur rapide.
+    """
+    with RingCapture(interface, bpf_filter=bpf_filter) as ring:
+        for batch in ring.batches():
+            batch_handler(batch)
+
+def replay_pcap(paths, speed=0.0):
+    """
+    Rejoue des captures pcap/pcapng dans tout le pipeline (extraction,
+    détection, logging) en utilisant les horodatages des paquets.
+    """
+    count = replay(paths, frame_handler, speed)
+
+    # Fin de capture : tous les flux encore ouverts sont terminés et analysés
+    if pipeline is not None:
+        pipeline.close(flush=True)
+    elif flow_ring is not None:
+        flow_ring.put_many(flow_gen.flush())
+        flow_ring.close_producer()
+    else:
+        for flow_features in flush_features():
+            features_queue.put(flow_features)
+        features_queue.join()
+
+    logger.info(f"Rejeu terminé: {count} paquets.")
+
+def next_batch(max_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT):
+    """
+    Attend un premier flux puis draine la file pendant au plus `max_wait`
+    secondes, jusqu'à `max_size` éléments. Le signal d'arrêt (None) termine le lot.
+    """
+    batch = [features_queue.get()]
+    deadline = time.monotonic() + max_wait
+
+    while len(batch) < max_size and batch[-1] is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(features_queue.get(timeout=remaining))
+        except Empty:
+            break
+
+    return batch
+
+def source_signals(sources):
+    """Signaux comportementaux {IP source: signaux} des sources données."""
+    sources = [src_ip for src_ip in set(sources) if src_ip]
+    if behavior_sketch is None or not sources:
+        return {}
+    return dict(zip(sources, behavior_sketch.signals([ip_to_int(src_ip) for src_ip in sources])))
+
+def behavior_check(src_ip, signals):
+    """
+    Motif du signalement comportemental d'une source ('flood', 'port-scan',
+    'host-sweep'), ou None si aucun seuil n'est atteint. Une source n'est
+    signalée qu'une fois par fenêtre : un balayage produit des milliers de flux.
+    """
+    reason = behavior_sketch.verdict(signals)
+    if reason is None:
+        return None
+    now = time.monotonic()
+    last = behavior_reported.get(src_ip)
+    if last is not None and now - last < behavior_sketch.window:
+        return None
+    if len(behavior_reported) >= 10000:
+        for ip in [ip for ip, seen in behavior_reported.items() if now - seen >= behavior_sketch.window]:
+            del behavior_reported[ip]
+    behavior_reported[src_ip] = now
+    return reason
+
+def handle_anomaly(flow_features, detection_result):
+    """
+    Soumet les actions d'un flux détecté comme anormal (journalisation,
+    blocage de la source, SIEM, SOC) au répartiteur d'actions : elles sont
+    exécutées hors du thread de détection.
+    """
+    stats['anomalies_detected'] += 1
+    behavior = detection_result.get('behavior')
+    if behavior:
+        description = f"Comportement anormal de la source ({behavior})"
+        logger.warning(f"🚨 COMPORTEMENT ANORMAL ({behavior}): {flow_features.get('Src IP')}")
+    else:
+        description = "Anomalie réseau détectée par IA"
+        logger.warning(f"🚨 ANOMALIE DÉTECTÉE! Score: {detection_result['anomaly_score']:.3f}")
+
+    src_ip = flow_features.get('Src IP')
+    event = {
+        "severity": "high",
+        "source_ip": src_ip,
+        "destination_ip": flow_features.get('Dst IP'),
+        "protocol": str(flow_features.get('Protocol', 'UNKNOWN')),
+        "source_port": flow_features.get('Src Port'),
+        "destination_port": flow_features.get('Dst Port'),
+        "description": description,
+        "anomaly_score": detection_result['anomaly_score'],
+        "action_taken": "blocked" if src_ip else "logged"
+    }
+    dispatcher = get_action_dispatcher()
+    dispatcher.submit(ACTION_LOG, (event, flow_features, detection_result))
+    dispatcher.submit(ACTION_SIEM, event)
+    dispatcher.submit(ACTION_SOC, event)
+
+    # BLOQUAGE AUTOMATIQUE de l'IP source (fusionné avec un blocage déjà en cours)
+    if src_ip and src_ip != '0.0.0.0':
+        reason = (description if behavior else
+                  f"Anomalie détectée (score: {detection_result['anomaly_score']:.3f})")
+        dispatcher.submit(ACTION_BLOCK, (src_ip, reason), key=src_ip)
+
+def process_flow_batch(flows):
+    """
+    Score un lot de flux en un seul appel au modèle, puis traite les anomalies.
+    """
+    # Matrice N×F des features numériques, dans l'ordre attendu par le modèle
+    detector = get_detector()
+    scores, decisions = detector.predict_batch(detector.flows_to_matrix(flows), flow_keys(flows))
+    signals = source_signals(flow_features.get('Src IP') for flow_features in flows)
+    
+    for flow_features, score, is_anomaly in zip(flows, scores, decisions):
+        # DEBUG: Afficher périodiquement les flux traités
+        if stats['flows_processed'] % 5 == 0 and logger.isEnabledFor(logging.DEBUG):  # Log tous les 5 flux
+            logger.debug(f"📋 Flux traité: {json.dumps(flow_features)}")
+        
+        stats['flows_processed'] += 1
+
+        # Signaux de la source sur la fenêtre des sketches (débit, fan-out)
+        behavior = None
+        src_signals = signals.get(flow_features.get('Src IP'))
+        if src_signals is not None:
+            flow_features.update(src_signals)
+            behavior = behavior_check(flow_features['Src IP'], src_signals)
+        
+        # Log les résultats si anomalie détectée
+        if is_anomaly or behavior:
+            detection_result = {
+                'anomaly_score': float(score),
+                'is_anomaly': True,
+                'decision_threshold': float(detector.threshold)
+            }
+            if behavior:
+                detection_result['behavior'] = behavior
+                detection_result['behavior_scores'] = behavior_sketch.score_signals(src_signals)
+            handle_anomaly(flow_features, detection_result)
+            
+        # Log périodique des statistiques
+        if stats['flows_processed'] % 10 == 0:  # Log tous les 10 flux
+            log_stats()
+
+def process_flow_records(records):
+    """
+    Équivalent de process_flow_batch pour des flux bruts lus dans l'anneau en
+    mémoire partagée : la matrice est calculée directement sur les champs, et
+    un dictionnaire de features n'est construit que pour les anomalies.
+    """
+    detector = get_detector()
+    scores, decisions = detector.predict_batch(records_to_matrix(records, detector.feature_names),
+                                               record_keys(records))
+    stats['flows_processed'] += len(records)
+
+    for index in np.flatnonzero(decisions):
+        handle_anomaly(record_to_features(records[index]), {
+            'anomaly_score': float(scores[index]),
+            'is_anomaly': True,
+            'decision_threshold': float(detector.threshold)
+        })
+    log_stats_throttled()
+
+def ring_detection_worker(ring_name):
+    """
+    Processus de détection alimenté par l'anneau en mémoire partagée : lit
+    des micro-lots d'enregistrements jusqu'à la fermeture par le producteur.
+    """
+    # L'arrêt (Ctrl+C) est piloté par le processus de capture
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logger.info("Processus de détection démarré.")
+
+    ring = ShmFlowRing.attach(ring_name)
+    try:
+        while True:
+            records = ring.read_batch(BATCH_MAX_SIZE, BATCH_MAX_WAIT)
+            if len(records) == 0:
+                if ring.closed and len(ring) == 0:
+                    break
+                continue
+            try:
+                process_flow_records(records)
+            except Exception as e:
+                logger.error(f"Erreur dans ring_detection_worker: {e}")
+    finally:
+        ring.close()
+        logger.info(f"Détecteur: {get_detector().get_stats()}")
+        # Les actions, les blocages puis les événements de ce processus sont terminés avant sa sortie
+        close_action_dispatcher()
+        close_blocker()
+        close_event_writer()
+
+def handle_shard_results(flow_count, anomalies, threshold, sources=()):
+    """
+    Résultats d'un lot scoré par un worker du pipeline multi-processus
+    (appelé dans le processus principal, qui garde le logging, le blocage et
+    les sketches comportementaux, alimentés par le répartiteur).
+    """
+    stats['flows_processed'] += flow_count
+    signals = source_signals(sources)
+    for flow_features, score in anomalies:
+        flow_features.update(signals.get(flow_features.get('Src IP'), {}))
+        handle_anomaly(flow_features, {
+            'anomaly_score': score,
+            'is_anomaly': True,
+            'decision_threshold': threshold
+        })
+
+    # Sources dont le comportement dépasse un seuil, même si aucun de leurs flux n'est anormal
+    for src_ip, src_signals in signals.items():
+        behavior = behavior_check(src_ip, src_signals)
+        if behavior:
+            scores = behavior_sketch.score_signals(src_signals)
+            handle_anomaly(dict(src_signals, **{'Src IP': src_ip}), {
+                'anomaly_score': max(scores.values()),
+                'is_anomaly': True,
+                'behavior': behavior,
+                'behavior_scores': scores
+            })
+    log_stats_throttled()
+
 def detection_worker():
     """
-    Worker qui traite les features des flux depuis la file d'attente.
+    Worker qui traite les features des flux depuis la file d'attente,
+    par micro-lots (au plus BATCH_MAX_SIZE flux ou BATCH_MAX_WAIT secondes).
     """
     logger.info("Thread de détection démarré.")
     
     while True:
+        batch = next_batch()
+        stop = batch[-1] is None  # Signal d'arrêt
+        flows = [flow_features for flow_features in batch if flow_features is not None]
+        
         try:
-            # Attend un flux à traiter
-            flow_features = features_queue.get()
-            
-            if flow_features is None:  # Signal d'arrêt
-                break
-                
-            # DEBUG: Afficher périodiquement les flux traités
-            if stats['flows_processed'] % 5 == 0:  # Log tous les 5 flux
-                logger.info(f"📋 Flux traité: {json.dumps(flow_features, indent=2)}")
-            
-            # Extraire uniquement les features numériques pour le modèle IA
-            numeric_features = extract_numeric_features(flow_features)
-            
-            # Fait la prédiction avec le modèle IA
-            detection_result = detect_anomaly(numeric_features)
-            
-            stats['flows_processed'] += 1
-            
-            # Log les résultats si anomalie détectée
-            if detection_result.get('is_anomaly', False):
-                stats['anomalies_detected'] += 1
-                logger.warning(f"🚨 ANOMALIE DÉTECTÉE! Score: {detection_result['anomaly_score']:.3f}")
-                
-                # Log dans la base de données avec TOUTES les informations
-                log_event("anomaly", {
-                    "severity": "high",
-                    "source_ip": flow_features.get('Src IP'),  # ← Maintenant disponible !
-                    "destination_ip": flow_features.get('Dst IP'),  # ← Maintenant disponible !
-                    "protocol": str(flow_features.get('Protocol', 'UNKNOWN')),  # ← Maintenant disponible !
-                    "description": "Anomalie réseau détectée par IA",
-                    "anomaly_score": detection_result['anomaly_score'],
-                    "action_taken": "blocked" if flow_features.get('Src IP') else "logged"
-                })
-                
-                # BLOQUAGE AUTOMATIQUE de l'IP source
-                src_ip = flow_features.get('Src IP')
-                if src_ip and src_ip != '0.0.0.0':
-                    try:
-                        from blocker import blocker
-                        blocker.block_ip(src_ip, f"Anomalie détectée (score: {detection_result['anomaly_score']:.3f})")
-                        logger.warning(f"🔒 IP bloquée: {src_ip}")
-                    except Exception as e:
-                        logger.error(f"Erreur lors du blocage IP {src_ip}: {e}")
-                
-                logger.warning(f"   Détails du flux: {json.dumps(flow_features, indent=2)}")
-                logger.warning(f"   Résultat complet: {json.dumps(detection_result, indent=2)}")
-                
-            # Log périodique des statistiques
-            if stats['flows_processed'] % 10 == 0:  # Log tous les 10 flux
-                log_stats()
-                
-            features_queue.task_done()
+            if flows:
+                process_flow_batch(flows)
             
         except Exception as e:
             logger.error(f"Erreur dans detection_worker: {e}")
+        finally:
+            # Toujours signaler la fin du traitement (features_queue.join() en dépend)
+            for _ in batch:
+                features_queue.task_done()
+        
+        if stop:
+            break
 
 def log_stats():
     """
@@ -147,10 +432,51 @@ def log_stats():
                 f"Flux: {stats['flows_processed']} | "
                 f"Anomalies: {stats['anomalies_detected']}")
 
-def main():
+def log_stats_throttled():
+    """log_stats au plus une fois toutes les STATS_LOG_INTERVAL secondes."""
+    global last_stats_log
+    now = time.monotonic()
+    if now - last_stats_log >= STATS_LOG_INTERVAL:
+        last_stats_log = now
+        log_stats()
+
+def parse_args():
+    """Analyse les arguments de la ligne de commande."""
+    parser = argparse.ArgumentParser(description='NGFW-Congo - capture, extraction et détection')
+    parser.add_argument('-i', '--interface', type=str, default='enp0s3',
+                        help='Interface réseau à écouter (défaut: enp0s3)')
+    parser.add_argument('--capture', choices=['socket', 'ring'], default='socket',
+                        help='socket: un recvfrom par paquet, ring: anneau mmap TPACKET_V3 (lots par bloc)')
+    parser.add_argument('--parser', choices=['raw', 'scapy'], default='raw',
+                        help='raw: décodage direct des octets (rapide), scapy: dissection Scapy complète')
+    parser.add_argument('--filter', type=str, default=None,
+                        help='Filtre BPF noyau (syntaxe tcpdump, ex: "ip and not port 22")')
+    parser.add_argument('--pcap', type=str, nargs='+', default=None,
+                        help='Rejoue des fichiers pcap/pcapng au lieu de capturer en direct')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='Vitesse de rejeu: 0 = le plus vite possible, N = temps réel xN')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='N > 0: répartit les flux entre N processus (FlowGenerator + détecteur chacun)')
+    parser.add_argument('--transport', choices=['queue', 'shm'], default='queue',
+                        help='queue: thread de détection, shm: processus de détection via un anneau en mémoire partagée')
+    parser.add_argument('--ring-size', type=int, default=65536,
+                        help="Capacité de l'anneau shm (nombre de flux)")
+    parser.add_argument('--ring-policy', choices=[POLICY_DROP_OLDEST, POLICY_BLOCK], default=None,
+                        help="Anneau plein: drop-oldest écrase les plus anciens, block attend "
+                             "(défaut: block en rejeu, drop-oldest en direct)")
+    parser.add_argument('--extended-features', action='store_true',
+                        help="Statistiques de flux étendues CIC-IDS (IAT, longueurs, flags TCP) ; "
+                             "activées d'office si le modèle les utilise")
+    parser.add_argument('--no-sketches', action='store_true',
+                        help="Désactive les sketches comportementaux par source (inondation, "
+                             "balayage de ports ou d'hôtes ; seuils NGFW_SKETCH_*)")
+    return parser.parse_args()
+
+def main(args):
     """
     Fonction principale.
     """
+    global pipeline, flow_ring, behavior_sketch
     logger.info("🚀 Démarrage de NGFW-Congo...")
     
     # Initialisation du détecteur
@@ -169,18 +495,75 @@ def main():
         logger.error(f"Échec de l'initialisation du bloqueur: {e}")
         return
     
-    # Démarrage du thread de détection
-    detection_thread = threading.Thread(target=detection_worker, daemon=True)
-    detection_thread.start()
-    logger.info("Thread de détection démarré.")
+    # Statistiques étendues : demandées, ou nécessaires au modèle chargé
+    model_extended = [name for name in detector.feature_names if name in EXTENDED_FEATURE_NAMES]
+    extended = args.extended_features or bool(model_extended)
+    if extended and args.workers == 0 and args.transport == 'shm':
+        # Les enregistrements de l'anneau (72 octets) ne portent que les totaux
+        if model_extended:
+            # records_to_matrix mettrait ces colonnes à 0 : le modèle scorerait des vecteurs faux
+            logger.error(f"Le modèle utilise des statistiques étendues ({', '.join(model_extended[:3])}...), "
+                         f"non disponibles avec --transport shm : utilisez --transport queue ou --workers N.")
+            return
+        logger.warning("Statistiques étendues non disponibles avec --transport shm : features de base seulement.")
+        extended = False
+    if extended:
+        logger.info("Statistiques de flux étendues activées.")
+        flow_gen.set_extended_features(True)
+
+    # Sketches comportementaux : alimentés par le chemin paquet de ce processus
+    if not args.no_sketches:
+        if args.workers == 0 and args.transport == 'shm':
+            # La détection tourne dans un autre processus, qui n'a pas accès aux sketches
+            logger.warning("Sketches comportementaux non disponibles avec --transport shm.")
+        else:
+            behavior_sketch = init_sketches()
+            flow_gen.sketches = behavior_sketch
+
+    # Démarrage de la détection : workers multi-processus ou thread unique
+    detection_thread = None
+    detection_process = None
+    if args.workers > 0:
+        if args.transport == 'shm':
+            logger.warning("--transport shm ignoré avec --workers (chaque worker détecte lui-même).")
+        pipeline = ShardedPipeline(args.workers, live=not args.pcap, extended_features=extended)
+        pipeline.sketches = behavior_sketch
+        pipeline.start(handle_shard_results)
+    elif args.transport == 'shm':
+        policy = args.ring_policy or (POLICY_BLOCK if args.pcap else POLICY_DROP_OLDEST)
+        flow_ring = ShmFlowRing.create(args.ring_size, policy=policy)
+        # Les flux expirés sortent bruts du générateur, directement vers l'anneau
+        flow_gen.raw_records = True
+        detection_process = multiprocessing.Process(
+            target=ring_detection_worker, args=(flow_ring.name,), name="ngfw-detection", daemon=True
+        )
+        detection_process.start()
+    else:
+        detection_thread = threading.Thread(target=detection_worker, daemon=True)
+        detection_thread.start()
+        logger.info("Thread de détection démarré.")
     
     # Configuration de la capture
-    interface = "enp0s3"  # Remplacez par votre interface réseau
-    logger.info(f"Démarrage de la capture sur l'interface {interface}...")
+    interface = args.interface
+    if args.pcap:
+        logger.info(f"Rejeu de {len(args.pcap)} fichier(s) de capture...")
+    else:
+        logger.info(f"Démarrage de la capture sur l'interface {interface} "
+                    f"(capture {args.capture}, parseur {args.parser})...")
     
     try:
-        # Capture en continu (appelle packet_handler pour chaque paquet)
-        sniff(iface=interface, prn=packet_handler, store=0)
+        if args.pcap:
+            # Rejeu hors ligne avec les horodatages d'origine
+            replay_pcap(args.pcap, args.speed)
+        elif args.capture == 'ring':
+            # Capture par blocs via l'anneau mmap (toujours avec le parseur rapide)
+            capture_ring(interface, args.filter)
+        elif args.parser == 'raw':
+            # Capture en continu sans dissection Scapy
+            capture_raw(interface, args.filter)
+        else:
+            # Capture en continu (appelle packet_handler pour chaque paquet)
+            sniff(iface=interface, prn=packet_handler, store=0, filter=args.filter)
         
     except KeyboardInterrupt:
         logger.info("Arrêt demandé par l'utilisateur.")
@@ -191,16 +574,37 @@ def main():
     finally:
         # Nettoyage
         logger.info("Nettoyage et arrêt...")
-        features_queue.put(None)  # Signal d'arrêt pour le thread
-        detection_thread.join(timeout=5)
+        if pipeline is not None:
+            pipeline.close(timeout=5)
+            pipeline = None
+        elif flow_ring is not None:
+            flow_ring.close_producer()
+            detection_process.join(timeout=None if args.pcap else 5)
+            logger.info(f"Anneau shm: {flow_ring.get_stats()}")
+            flow_ring.close()
+            flow_ring = None
+        else:
+            features_queue.put(None)  # Signal d'arrêt pour le thread
+            detection_thread.join(timeout=5)
+        # Actions en file (journalisation, blocages, alertes), puis dernière transaction
+        # nft et journal des blocages, avant l'écriture finale des événements
+        close_action_dispatcher()
+        close_blocker()
+        close_event_writer()
+        if behavior_sketch is not None:
+            logger.info(f"Sketches comportementaux: {behavior_sketch.get_stats()}")
+        if detection_thread is not None:
+            logger.info(f"Détecteur: {detector.get_stats()}")
         log_stats()
         logger.info("NGFW-Congo arrêté.")
 
 if __name__ == "__main__":
-    # Vérification des privilèges
+    args = parse_args()
+
+    # Vérification des privilèges (inutile pour le rejeu de fichiers)
     import os
-    if os.geteuid() != 0:
+    if not args.pcap and os.geteuid() != 0:
         print("❌ Erreur: Ce script doit être exécuté avec sudo (pour la capture réseau)")
         exit(1)
     
-    main()
+    main(args)
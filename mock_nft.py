@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Faux binaire nft pour tester blocker.py sans privilèges ni nftables.
+
+Usage :
+    NGFW_NFT_CMD="python mock_nft.py" python bench_blocker.py
+
+Comprend le sous-ensemble de commandes utilisé par IPBlocker (table, chaîne,
+set, règle, éléments avec timeout), lues sur la ligne de commande ou par
+`-f -`. Un script est appliqué comme une transaction : en cas d'erreur (par
+exemple la suppression d'un élément absent), rien n'est modifié. Avec
+`--echo --handle`, les règles ajoutées sont réaffichées avec leur handle.
+
+Variables d'environnement :
+    NGFW_MOCK_NFT_STATE  fichier JSON où l'état est conservé entre deux appels
+    NGFW_MOCK_NFT_LOG    fichier où chaque script reçu est ajouté
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+_ELEMENTS = re.compile(r'^(add|delete) element (\w+) (\w+) (\w+) \{(.*)\}$')
+
+def load_state(path):
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'tables': [], 'chains': [], 'rules': {}, 'sets': {}, 'next_handle': 1}
+
+def save_state(path, state):
+    if path:
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+def apply_line(state, line, now, echo=False):
+    """
+    Applique une commande à l'état. Lève ValueError si elle échoue.
+    Retourne le texte à afficher (ou None).
+    """
+    match = _ELEMENTS.match(line)
+    if match:
+        action, family, table, set_name, body = match.groups()
+        elements = state['sets'].get(f"{family} {table} {set_name}")
+        if elements is None:
+            raise ValueError(f"No such file or directory: set {set_name}")
+        # Les éléments expirés ont disparu, comme dans le noyau
+        for key in [key for key, expires in elements.items() if expires is not None and expires <= now]:
+            del elements[key]
+
+        for item in filter(None, (part.strip() for part in body.split(','))):
+            words = item.split()
+            key = words[0]
+            if action == 'add':
+                timeout = None
+                if 'timeout' in words:
+                    timeout = now + float(words[words.index('timeout') + 1].rstrip('s'))
+                # Comme nft : ajouter un élément existant ne change pas son timeout
+                elements.setdefault(key, timeout)
+            else:
+                if key not in elements:
+                    raise ValueError(f"No such file or directory: element {key}")
+                del elements[key]
+        return None
+
+    words = line.split()
+    if words[:2] == ['add', 'table']:
+        if ' '.join(words[2:4]) not in state['tables']:
+            state['tables'].append(' '.join(words[2:4]))
+    elif words[:2] == ['add', 'chain']:
+        chain = ' '.join(words[2:5])
+        if chain not in state['chains']:
+            state['chains'].append(chain)
+            state['rules'][chain] = []
+    elif words[:2] == ['flush', 'chain']:
+        state['rules'][' '.join(words[2:5])] = []
+    elif words[:2] == ['add', 'set']:
+        state['sets'].setdefault(' '.join(words[2:5]), {})
+    elif words[:2] == ['add', 'rule']:
+        chain = ' '.join(words[2:5])
+        if chain not in state['rules']:
+            raise ValueError(f"No such file or directory: chain {chain}")
+        handle = state['next_handle']
+        state['next_handle'] += 1
+        state['rules'][chain].append([' '.join(words[5:]), handle])
+        if echo:
+            return f"{line} # handle {handle}"
+    elif words[:2] == ['delete', 'rule'] and words[5:6] == ['handle']:
+        chain = ' '.join(words[2:5])
+        rules = state['rules'].get(chain, [])
+        kept = [rule for rule in rules if rule[1] != int(words[6])]
+        if len(kept) == len(rules):
+            raise ValueError(f"No such file or directory: rule handle {words[6]}")
+        state['rules'][chain] = kept
+    elif words[:2] == ['list', 'chain']:
+        chain = ' '.join(words[2:5])
+        if chain not in state['rules']:
+            raise ValueError(f"No such file or directory: chain {chain}")
+        family, table, name = words[2:5]
+        rules = '\n'.join(f"\t\t{text} # handle {handle}" for text, handle in state['rules'][chain])
+        return f"table {family} {table} {{\n\tchain {name} {{\n{rules}\n\t}}\n}}"
+    elif words[:2] == ['list', 'set']:
+        elements = state['sets'].get(' '.join(words[2:5]), {})
+        return json.dumps(sorted(key for key, expires in elements.items() if expires is None or expires > now))
+    else:
+        raise ValueError(f"syntax error, unexpected {line!r}")
+    return None
+
+def main(argv):
+    state_path = os.environ.get('NGFW_MOCK_NFT_STATE')
+    log_path = os.environ.get('NGFW_MOCK_NFT_LOG')
+
+    if '-f' in argv:
+        source = argv[argv.index('-f') + 1]
+        script = sys.stdin.read() if source == '-' else open(source).read()
+    else:
+        script = ' '.join(arg for arg in argv if not arg.startswith('-'))
+
+    if log_path:
+        with open(log_path, 'a') as f:
+            f.write(script.rstrip('\n') + '\n')
+
+    echo = '--echo' in argv or '-e' in argv
+    state = load_state(state_path)
+    now = time.time()
+    output = []
+    for number, line in enumerate(script.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            text = apply_line(state, line, now, echo)
+        except ValueError as e:
+            print(f"Error: Could not process rule: {e}", file=sys.stderr)
+            print(f"line {number}: {line}", file=sys.stderr)
+            return 1
+        if text is not None:
+            output.append(text)
+
+    save_state(state_path, state)
+    if output:
+        print('\n'.join(output))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
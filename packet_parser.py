@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Parseur rapide de trames brutes pour NGFW-Congo.
+Extrait la 5-tuple, les flags TCP et la longueur d'en-tête de transport
+directement des octets de la trame (struct + memoryview), sans construire
+d'objets Scapy.
+"""
+
+import struct
+
+# Types de lien (numérotation LINKTYPE_* de libpcap)
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+
+SUPPORTED_LINKTYPES = (LINKTYPE_ETHERNET, LINKTYPE_RAW, LINKTYPE_LINUX_SLL, LINKTYPE_IPV4)
+
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+# version/IHL, longueur totale, fragmentation, protocole, IP source, IP destination
+_IPV4_HEADER = struct.Struct('!BxHxxHxBxxII')
+_L4_PORTS = struct.Struct('!HH')
+_ETHERTYPE = struct.Struct('!H')
+
+def _ipv4_offset(frame, linktype):
+    """Retourne l'offset de l'en-tête IPv4 dans la trame, ou -1."""
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype, = _ETHERTYPE.unpack_from(frame, offset)
+        # Saute les tags VLAN (802.1Q / QinQ)
+        while ethertype == ETH_P_8021Q or ethertype == ETH_P_8021AD:
+            offset += 4
+            ethertype, = _ETHERTYPE.unpack_from(frame, offset)
+        return offset + 2 if ethertype == ETH_P_IP else -1
+
+    if linktype == LINKTYPE_LINUX_SLL:
+        ethertype, = _ETHERTYPE.unpack_from(frame, 14)
+        return 16 if ethertype == ETH_P_IP else -1
+
+    if linktype == LINKTYPE_RAW or linktype == LINKTYPE_IPV4:
+        return 0 if frame[0] >> 4 == 4 else -1
+
+    return -1
+
+def parse_frame(frame, linktype=LINKTYPE_ETHERNET):
+    """
+    Décode une trame brute (bytes, bytearray ou memoryview).
+
+    Retourne (src_ip, dst_ip, src_port, dst_port, proto, tcp_flags, header_len)
+    avec les adresses IPv4 sous forme d'entiers et header_len la longueur de
+    l'en-tête TCP/UDP (0 pour les autres protocoles et les fragments suivants),
+    ou None si la trame n'est pas de l'IPv4 exploitable (autre ethertype,
+    trame tronquée...).
+    """
+    try:
+        offset = _ipv4_offset(frame, linktype)
+        if offset < 0:
+            return None
+
+        version_ihl, _, frag, proto, src_ip, dst_ip = _IPV4_HEADER.unpack_from(frame, offset)
+        if version_ihl >> 4 != 4:
+            return None
+
+        src_port = 0
+        dst_port = 0
+        tcp_flags = 0
+        header_len = 0
+        # Les ports ne sont présents que dans le premier fragment
+        if (proto == PROTO_TCP or proto == PROTO_UDP) and not frag & 0x1FFF:
+            l4_offset = offset + (version_ihl & 0x0F) * 4
+            src_port, dst_port = _L4_PORTS.unpack_from(frame, l4_offset)
+            if proto == PROTO_TCP:
+                header_len = (frame[l4_offset + 12] >> 4) * 4
+                tcp_flags = frame[l4_offset + 13]
+            else:
+                header_len = 8
+
+        return src_ip, dst_ip, src_port, dst_port, proto, tcp_flags, header_len
+
+    except (struct.error, IndexError):
+        return None  # Trame tronquée
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Rejeu de captures pcap/pcapng pour NGFW-Congo.
+Lit les trames brutes avec leurs horodatages d'origine, sans dissection Scapy,
+et les rejoue soit le plus vite possible, soit en temps réel ×N.
+"""
+
+import struct
+import time
+import logging
+
+logger = logging.getLogger('NGFW-Replay')
+
+# Nombres magiques pcap (µs / ns), et type de bloc SHB pcapng
+PCAP_MAGIC_USEC = 0xA1B2C3D4
+PCAP_MAGIC_NSEC = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+# Types de blocs pcapng
+PCAPNG_IDB = 0x00000001
+PCAPNG_EPB = 0x00000006
+
+# Option if_tsresol de l'IDB
+IF_TSRESOL = 9
+
+def _read_pcap(f, header):
+    """Lecteur pcap classique. Génère (trame, timestamp, linktype)."""
+    for endian in ('<', '>'):
+        magic, = struct.unpack(endian + 'I', header[:4])
+        if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC):
+            break
+    divisor = 1e9 if magic == PCAP_MAGIC_NSEC else 1e6
+
+    # Suite de l'en-tête global : thiszone, sigfigs, snaplen, network
+    rest = f.read(16)
+    if len(rest) < 16:
+        return
+    linktype = struct.unpack(endian + 'I', rest[12:16])[0] & 0x0FFFFFFF
+
+    record = struct.Struct(endian + 'IIII')
+    while True:
+        record_header = f.read(record.size)
+        if len(record_header) < record.size:
+            return
+        sec, frac, caplen, _ = record.unpack(record_header)
+        frame = f.read(caplen)
+        if len(frame) < caplen:
+            return  # Fichier tronqué
+        yield frame, sec + frac / divisor, linktype
+
+def _parse_tsresol(options, endian):
+    """Extrait le diviseur de timestamp de l'option if_tsresol d'un IDB."""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, offset)
+        if code == 0:
+            break
+        if code == IF_TSRESOL and length >= 1:
+            value = options[offset + 4]
+            return float(2 ** (value & 0x7F)) if value & 0x80 else 10.0 ** value
+        offset += 4 + ((length + 3) & ~3)
+    return 1e6
+
+def _read_pcapng(f, header):
+    """
+    Lecteur pcapng (SHB, IDB, EPB). Génère (trame, timestamp, linktype).
+    Les autres blocs (dont les Simple Packet Blocks, sans horodatage) sont ignorés,
+    ainsi que les EPB d'une interface sans IDB (capture tronquée ou fusionnée).
+    """
+    interfaces = []  # [(linktype, diviseur de timestamp)]
+    unknown = {}     # {interface sans IDB: EPB ignorés}
+    endian = '<'
+    block = header
+
+    while True:
+        if len(block) < 8:
+            return
+        block_type, = struct.unpack(endian + 'I', block[:4])
+
+        if block_type == PCAPNG_SHB:
+            # Le SHB fixe l'ordre des octets de la section qui suit
+            block += f.read(4)
+            bom, = struct.unpack('<I', block[8:12])
+            endian = '<' if bom == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            interfaces = []
+
+        block_length, = struct.unpack(endian + 'I', block[4:8])
+        body = f.read(block_length - len(block))
+        if len(body) < block_length - len(block):
+            return  # Fichier tronqué
+        body = block[8:] + body[:-4]
+
+        if block_type == PCAPNG_IDB:
+            linktype, = struct.unpack_from(endian + 'H', body, 0)
+            interfaces.append((linktype, _parse_tsresol(body[8:], endian)))
+
+        elif block_type == PCAPNG_EPB:
+            interface_id, ts_high, ts_low, caplen, _ = struct.unpack_from(endian + 'IIIII', body, 0)
+            if interface_id >= len(interfaces):
+                if interface_id not in unknown:
+                    logger.warning(f"EPB à l'offset {f.tell() - block_length}: interface {interface_id} "
+                                   f"sans IDB, ses paquets sont ignorés.")
+                unknown[interface_id] = unknown.get(interface_id, 0) + 1
+                block = f.read(8)
+                continue
+            linktype, divisor = interfaces[interface_id]
+            yield body[20:20 + caplen], ((ts_high << 32) | ts_low) / divisor, linktype
+
+        block = f.read(8)
+        if len(block) < 8 and unknown:
+            logger.warning(f"{sum(unknown.values())} paquet(s) ignoré(s) (interfaces sans IDB: {sorted(unknown)}).")
+
+def read_capture(path):
+    """
+    Ouvre un fichier pcap ou pcapng et génère (trame, timestamp, linktype)
+    pour chaque paquet, dans l'ordre du fichier.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        magic_le, = struct.unpack('<I', header[:4])
+        magic_be, = struct.unpack('>I', header[:4])
+
+        if magic_le == PCAPNG_SHB:
+            yield from _read_pcapng(f, header)
+        elif {magic_le, magic_be} & {PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC}:
+            yield from _read_pcap(f, header)
+        else:
+            raise ValueError(f"{path}: format de capture non reconnu")
+
+def replay(paths, handler, speed=0.0):
+    """
+    Rejoue une ou plusieurs captures en appelant handler(trame, timestamp, linktype).
+
+    speed = 0 : le plus vite possible.
+    speed = N : temps réel ×N (les écarts entre paquets sont divisés par N).
+    Retourne le nombre de paquets rejoués.
+    """
+    count = 0
+    first_ts = None
+    wall_start = None
+
+    for path in paths:
+        logger.info(f"Rejeu de {path} (vitesse: {'max' if not speed else f'x{speed:g}'})...")
+        for frame, timestamp, linktype in read_capture(path):
+            if speed:
+                if first_ts is None:
+                    first_ts = timestamp
+                    wall_start = time.monotonic()
+                delay = (timestamp - first_ts) / speed - (time.monotonic() - wall_start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            handler(frame, timestamp, linktype)
+            count += 1
+
+    return count
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Arbre de préfixes (trie Patricia) IPv4/IPv6 pour NGFW-Congo.
+
+Recherche du plus long préfixe correspondant en O(longueur du préfixe),
+indépendamment du nombre de préfixes : utilisé pour la liste d'autorisation
+(plages jamais bloquées) et pour les blocs CIDR agrégés du bloqueur.
+"""
+
+import socket
+from ipaddress import ip_network
+
+class _Node:
+    __slots__ = ('prefix', 'length', 'value', 'has_value', 'children')
+
+    def __init__(self, prefix, length, value=None, has_value=False):
+        self.prefix = prefix
+        self.length = length
+        self.value = value
+        self.has_value = has_value
+        self.children = [None, None]
+
+class PrefixTree:
+    """
+    Trie Patricia (chemins compressés) sur des adresses entières de `bits` bits.
+    Un préfixe est un couple (adresse réseau entière, longueur).
+
+    Usage :
+        tree = PrefixTree(32)
+        tree.insert(0x0A000000, 8, 'rfc1918')
+        tree.lookup(0x0A010203)          # (0x0A000000, 8, 'rfc1918')
+    """
+    def __init__(self, bits=32):
+        self.bits = bits
+        self.root = _Node(0, 0)
+        self.count = 0
+
+    def _mask(self, length):
+        return ((1 << length) - 1) << (self.bits - length)
+
+    def _bit(self, address, position):
+        """Bit de rang `position` (0 = bit de poids fort)."""
+        return (address >> (self.bits - 1 - position)) & 1
+
+    def insert(self, prefix, length, value=True):
+        """Ajoute (ou remplace la valeur d') un préfixe."""
+        if not 0 <= length <= self.bits:
+            raise ValueError(f"Longueur de préfixe invalide: {length}")
+        prefix &= self._mask(length)
+        node = self.root
+        while True:
+            if length == node.length:
+                if not node.has_value:
+                    self.count += 1
+                node.value, node.has_value = value, True
+                return
+
+            bit = self._bit(prefix, node.length)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(prefix, length, value, True)
+                self.count += 1
+                return
+
+            # Longueur du préfixe commun au nouveau préfixe et à l'enfant
+            common = min(self.bits - (child.prefix ^ prefix).bit_length(), child.length, length)
+            if common == child.length:
+                node = child
+                continue
+
+            self.count += 1
+            if common == length:
+                # Le nouveau préfixe englobe l'enfant
+                new = _Node(prefix, length, value, True)
+                new.children[self._bit(child.prefix, length)] = child
+                node.children[bit] = new
+            else:
+                # Nœud intermédiaire sans valeur au point de divergence
+                fork = _Node(prefix & self._mask(common), common)
+                fork.children[self._bit(child.prefix, common)] = child
+                fork.children[self._bit(prefix, common)] = _Node(prefix, length, value, True)
+                node.children[bit] = fork
+            return
+
+    def remove(self, prefix, length):
+        """Retire un préfixe. Retourne False s'il était absent."""
+        prefix &= self._mask(length)
+        path = []
+        node = self.root
+        while node is not None and node.length < length:
+            if (prefix ^ node.prefix) >> (self.bits - node.length):
+                return False
+            path.append(node)
+            node = node.children[self._bit(prefix, node.length)]
+        if node is None or node.length != length or node.prefix != prefix or not node.has_value:
+            return False
+
+        node.value, node.has_value = None, False
+        self.count -= 1
+        # Compaction : un nœud sans valeur n'est gardé que s'il a deux enfants
+        while path and not node.has_value:
+            parent = path.pop()
+            children = [child for child in node.children if child is not None]
+            if len(children) == 2:
+                break
+            parent.children[self._bit(node.prefix, parent.length)] = children[0] if children else None
+            node = parent
+            if node is self.root:
+                break
+        return True
+
+    def lookup(self, address):
+        """
+        Plus long préfixe contenant `address` : (préfixe, longueur, valeur),
+        ou None si aucun ne correspond.
+        """
+        bits = self.bits
+        best = None
+        node = self.root
+        while node is not None:
+            if (address ^ node.prefix) >> (bits - node.length):
+                break
+            if node.has_value:
+                best = node
+            if node.length == bits:
+                break
+            node = node.children[(address >> (bits - 1 - node.length)) & 1]
+        if best is None:
+            return None
+        return best.prefix, best.length, best.value
+
+    def overlaps(self, prefix, length):
+        """Vrai si un préfixe de l'arbre contient (prefix, length) ou y est contenu."""
+        bits = self.bits
+        prefix &= self._mask(length)
+        node = self.root
+        while node is not None:
+            common = min(node.length, length)
+            if (prefix ^ node.prefix) >> (bits - common):
+                return False
+            if node.has_value:
+                return True
+            if node.length >= length:
+                # Sous-arbre non vide (un nœud sans valeur a toujours des enfants, sauf la racine)
+                return node is not self.root or any(node.children)
+            node = node.children[self._bit(prefix, node.length)]
+        return False
+
+    def __len__(self):
+        return self.count
+
+    def items(self):
+        """Itère sur les préfixes (préfixe, longueur, valeur)."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.has_value:
+                yield node.prefix, node.length, node.value
+            stack.extend(child for child in node.children if child is not None)
+
+def parse_address(address):
+    """Adresse textuelle -> (version, entier). Lève ValueError si invalide."""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, address), 'big')
+    except OSError:
+        raise ValueError(f"Adresse IP invalide: {address}") from None
+
+def parse_prefix(prefix):
+    """'a.b.c.d/n', '2001:db8::/32' ou adresse seule -> (version, réseau entier, longueur)."""
+    if '/' not in prefix:
+        version, address = parse_address(prefix)
+        return version, address, 32 if version == 4 else 128
+    network = ip_network(prefix, strict=False)
+    return network.version, int(network.network_address), network.prefixlen
+
+def format_prefix(version, prefix, length):
+    """Inverse de parse_prefix : (version, réseau entier, longueur) -> 'a.b.c.d/n'."""
+    if version == 4:
+        return f"{socket.inet_ntop(socket.AF_INET, prefix.to_bytes(4, 'big'))}/{length}"
+    return f"{socket.inet_ntop(socket.AF_INET6, prefix.to_bytes(16, 'big'))}/{length}"
+
+class PrefixSet:
+    """
+    Ensemble de préfixes IPv4 et IPv6 (un PrefixTree par famille), adressé
+    par chaînes : 'a.b.c.d/n', '2001:db8::/32' ou une adresse seule.
+    """
+    def __init__(self, prefixes=()):
+        self.trees = {4: PrefixTree(32), 6: PrefixTree(128)}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def add(self, prefix, value=True):
+        version, network, length = parse_prefix(prefix)
+        self.trees[version].insert(network, length, value)
+
+    def remove(self, prefix):
+        version, network, length = parse_prefix(prefix)
+        return self.trees[version].remove(network, length)
+
+    def overlaps(self, prefix):
+        """Vrai si l'ensemble a un préfixe qui contient `prefix` ou y est contenu."""
+        version, network, length = parse_prefix(prefix)
+        return self.trees[version].overlaps(network, length)
+
+    def lookup(self, address):
+        """Plus long préfixe contenant l'adresse : ('réseau/longueur', valeur) ou None."""
+        version, value = parse_address(address)
+        match = self.trees[version].lookup(value)
+        if match is None:
+            return None
+        return format_prefix(version, match[0], match[1]), match[2]
+
+    def __contains__(self, address):
+        version, value = parse_address(address)
+        return self.trees[version].lookup(value) is not None
+
+    def __len__(self):
+        return sum(len(tree) for tree in self.trees.values())
+
+# Test du module
+if __name__ == "__main__":
+    allowlist = PrefixSet(['10.0.0.0/8', '172.16.0.0/12', '192.168.0.0/16', '127.0.0.0/8', 'fc00::/7'])
+    for ip in ['10.1.2.3', '172.20.0.1', '8.8.8.8', 'fd00::1', '2001:db8::1']:
+        print(f"{ip:>12} -> {allowlist.lookup(ip)}")
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Rétention des données de NGFW-Congo.
+
+Chaque table a une durée de conservation (RETENTION_DAYS, surchargeable par
+variables d'environnement, 0 = illimitée) :
+- events est partitionnée par jour (voir database.PARTITIONED) : une
+  partition entièrement expirée est archivée si demandé (JSONL gzip ou
+  Parquet), puis supprimée d'un bloc par DROP TABLE ;
+- les autres tables sont purgées par petits lots, chacun dans sa propre
+  transaction courte, pour ne pas bloquer les écrivains.
+Les pages libérées sont ensuite rendues au système (auto_vacuum incrémental,
+bases créées depuis cette version) et le WAL est tronqué.
+
+Le tout tourne dans un thread de fond (RetentionManager.start()) ;
+`python retention.py` fait une seule passe (tâche cron).
+"""
+
+import os
+import gzip
+import json
+import time
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+
+from database import (DB_PATH, PARTITIONED, PRAGMAS, connect, init_database,
+                      partition_name, refresh_partition_view, rotate_partitions)
+
+logger = logging.getLogger('NGFW-Retention')
+
+def _days(variable, default):
+    """Durée en jours lue dans l'environnement ; 0 = conservation illimitée."""
+    return int(os.environ.get(variable, default)) or None
+
+# Durées de conservation par table, en jours (None = illimitée).
+# statistics_minute doit couvrir au moins 25h (totaux du dashboard).
+RETENTION_DAYS = {
+    'events': _days('NGFW_RETENTION_EVENTS_DAYS', 30),
+    'statistics': _days('NGFW_RETENTION_STATISTICS_DAYS', 7),
+    'statistics_minute': _days('NGFW_RETENTION_MINUTE_DAYS', 7),
+    'statistics_hourly': _days('NGFW_RETENTION_HOURLY_DAYS', 365),
+    'blocked_ips': _days('NGFW_RETENTION_BLOCKS_DAYS', 30),
+}
+
+# Tables non partitionnées : {table: (clé, colonne de date)}. Pour
+# blocked_ips, seuls les blocages expirés depuis plus de N jours sont purgés.
+PURGED = {
+    'statistics': ('id', 'timestamp'),
+    'statistics_minute': ('bucket', 'bucket'),
+    'statistics_hourly': ('bucket', 'bucket'),
+    'blocked_ips': ('id', 'expires_at'),
+}
+
+# Formats d'archive des partitions supprimées
+ARCHIVE_JSONL = 'jsonl'       # une ligne JSON par événement, compressé gzip
+ARCHIVE_PARQUET = 'parquet'   # compressé zstd, nécessite pyarrow
+
+class RetentionManager:
+    """
+    Applique les durées de conservation, en tâche de fond.
+
+    Usage :
+        retention = RetentionManager(archive_format=ARCHIVE_JSONL)
+        retention.start()             # une passe toutes les `interval` secondes
+        retention.run_once()          # ou une passe immédiate
+        retention.close()
+    """
+    def __init__(self, db_path=None, retention=None, archive_format=None, archive_dir=None,
+                 interval=300, batch_size=5000, vacuum_pages=2000):
+        if archive_format not in (None, ARCHIVE_JSONL, ARCHIVE_PARQUET):
+            raise ValueError(f"Format d'archive inconnu: {archive_format}")
+        if archive_format == ARCHIVE_PARQUET:
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise ImportError("L'archivage Parquet nécessite pyarrow (pip install pyarrow)") from None
+
+        self.db_path = db_path or DB_PATH
+        self.retention = dict(RETENTION_DAYS, **(retention or {}))
+        self.archive_format = archive_format
+        self.archive_dir = archive_dir or os.path.join(os.path.dirname(self.db_path), 'archive')
+        self.interval = interval
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+
+        self.conn = None
+        self.lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Statistiques
+        self.stats = {
+            'runs': 0,
+            'partitions_dropped': 0,
+            'partitions_archived': 0,
+            'rows_deleted': 0,
+            'pages_freed': 0,
+            'errors': 0,
+            'last_run': None,
+        }
+
+    def _connection(self):
+        """Connexion dédiée, en mode autocommit (transactions explicites)."""
+        if self.conn is None:
+            self.conn = connect(self.db_path, isolation_level=None, check_same_thread=False)
+            for pragma in PRAGMAS:
+                self.conn.execute(pragma)
+        return self.conn
+
+    def _transaction(self, func, *args):
+        """Exécute func(cursor, *args) dans une transaction d'écriture."""
+        cursor = self._connection().cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(cursor, *args)
+            cursor.execute('COMMIT')
+            return result
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+
+    def run_once(self, now=None):
+        """
+        Une passe complète : rotation des partitions, suppression (et
+        archivage) des partitions expirées, purge des autres tables,
+        compactage. Retourne un résumé.
+        """
+        now = now or datetime.now(timezone.utc)
+        report = {'rotated': [], 'dropped': [], 'archived': [], 'deleted': {}, 'pages_freed': 0}
+        with self.lock:
+            for table in PARTITIONED:
+                if self._transaction(rotate_partitions, table, now.date()):
+                    report['rotated'].append(table)
+                days = self.retention.get(table)
+                if days:
+                    self._expire_partitions(table, (now - timedelta(days=days)).date(), now.date(), report)
+
+            for table, (key, column) in PURGED.items():
+                days = self.retention.get(table)
+                if days:
+                    cutoff = (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+                    deleted = self._purge(table, key, column, cutoff)
+                    if deleted:
+                        report['deleted'][table] = deleted
+
+            if report['dropped'] or report['deleted']:
+                report['pages_freed'] = self._compact()
+
+            self.stats['runs'] += 1
+            self.stats['partitions_dropped'] += len(report['dropped'])
+            self.stats['partitions_archived'] += len(report['archived'])
+            self.stats['rows_deleted'] += sum(report['deleted'].values())
+            self.stats['pages_freed'] += report['pages_freed']
+            self.stats['last_run'] = time.time()
+
+        if report['dropped'] or report['deleted']:
+            logger.info(f"Rétention: {len(report['dropped'])} partition(s) supprimée(s), "
+                        f"lignes purgées {report['deleted']}, {report['pages_freed']} page(s) libérée(s)")
+        return report
+
+    def _expire_partitions(self, table, cutoff_day, today, report):
+        """Archive puis supprime les partitions dont le dernier jour précède cutoff_day."""
+        # Le catalogue peut être en retard sur les lignes (un écrivain qui n'a pas
+        # encore changé de partition) : last_day est recalé avant de choisir
+        self._transaction(self._refresh_last_days, table)
+        expired = [row[0] for row in self._connection().execute(
+            'SELECT name FROM partitions WHERE parent = ? AND last_day < ? AND name != ? ORDER BY first_day',
+            (table, cutoff_day.isoformat(), partition_name(table, today))
+        )]
+        for name in expired:
+            if self.archive_format:
+                try:
+                    report['archived'].append(self._archive(name))
+                except Exception as e:
+                    # Jamais de suppression sans archive : réessayé à la passe suivante
+                    logger.error(f"Erreur d'archivage de {name}: {e}")
+                    self.stats['errors'] += 1
+                    continue
+            if self._transaction(self._drop_partition, table, name, cutoff_day, today):
+                report['dropped'].append(name)
+
+    def _refresh_last_days(self, cursor, table):
+        """Recale le last_day du catalogue sur date(MAX(timestamp)) de chaque partition."""
+        partitions = cursor.execute(
+            'SELECT name, last_day FROM partitions WHERE parent = ?', (table,)).fetchall()
+        for name, last_day in partitions:
+            newest = cursor.execute(f'SELECT date(MAX(timestamp)) FROM {name}').fetchone()[0]
+            if newest and newest > last_day:
+                cursor.execute('UPDATE partitions SET last_day = ? WHERE name = ?', (newest, name))
+
+    def _drop_partition(self, cursor, table, name, cutoff_day, today):
+        """Supprime une partition, sauf si elle a reçu des lignes récentes entre-temps. Retourne True si supprimée."""
+        newest = cursor.execute(f'SELECT date(MAX(timestamp)) FROM {name}').fetchone()[0]
+        if newest and newest >= cutoff_day.isoformat():
+            cursor.execute('UPDATE partitions SET last_day = ? WHERE name = ?', (newest, name))
+            logger.warning(f"Partition {name} conservée: lignes du {newest}, postérieures à la limite.")
+            return False
+        cursor.execute('DELETE FROM partitions WHERE name = ?', (name,))
+        refresh_partition_view(cursor, table, partition_name(table, today))
+        cursor.execute(f'DROP TABLE {name}')
+        cursor.execute('DELETE FROM sqlite_sequence WHERE name = ?', (name,))
+        return True
+
+    def _archive(self, name):
+        """
+        Copie une partition dans archive_dir. Lue hors transaction d'écriture
+        (instantané WAL) ; le fichier n'apparaît sous son nom qu'une fois complet.
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        suffix = 'jsonl.gz' if self.archive_format == ARCHIVE_JSONL else 'parquet'
+        path = os.path.join(self.archive_dir, f"{name}.{suffix}")
+        tmp_path = f"{path}.tmp"
+
+        conn = self._connection()
+        declared = {row[1]: row[2].upper() for row in conn.execute(f'PRAGMA table_info({name})')}
+        cursor = conn.execute(f'SELECT * FROM {name} ORDER BY id')
+        columns = [description[0] for description in cursor.description]
+
+        if self.archive_format == ARCHIVE_JSONL:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                for row in cursor:
+                    f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n')
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Schéma fixé d'après les types déclarés : une colonne vide dans un lot ne change pas de type
+            types = {'INTEGER': pa.int64(), 'REAL': pa.float64()}
+            schema = pa.schema([(column, types.get(declared.get(column), pa.string())) for column in columns])
+            with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+                while True:
+                    rows = cursor.fetchmany(self.batch_size * 10)
+                    if not rows:
+                        break
+                    writer.write_table(pa.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema))
+
+        os.replace(tmp_path, path)
+        logger.info(f"Partition {name} archivée dans {path}")
+        return path
+
+    def _purge(self, table, key, column, cutoff):
+        """Supprime par lots de batch_size les lignes antérieures à cutoff. Retourne leur nombre."""
+        delete = (f'DELETE FROM {table} WHERE {key} IN '
+                  f'(SELECT {key} FROM {table} WHERE {column} < ? LIMIT ?)')
+        deleted = 0
+        while not self._stop.is_set():
+            # Une transaction par lot : les écrivains passent entre deux lots
+            count = self._transaction(lambda cursor: cursor.execute(delete, (cutoff, self.batch_size)).rowcount)
+            deleted += count
+            if count < self.batch_size:
+                break
+        return deleted
+
+    def _compact(self):
+        """Rend les pages libres au système (auto_vacuum incrémental) et tronque le WAL."""
+        conn = self._connection()
+        freed = 0
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            while not self._stop.is_set():
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if not free:
+                    break
+                # Par tranches, chacune dans sa propre transaction
+                conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+                freed += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        return freed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erreur de rétention: {e}")
+                self.stats['errors'] += 1
+            # Réveil aussi juste après minuit (UTC) pour changer de partition à l'heure
+            now = datetime.now(timezone.utc)
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), timezone.utc)
+            self._stop.wait(min(self.interval, (midnight - now).total_seconds() + 1))
+
+    def start(self):
+        """Démarre le thread de rétention."""
+        try:
+            init_database(self.db_path)
+        except Exception:
+            pass  # déjà journalisé ; réessayé à chaque passe
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ngfw-retention", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=10):
+        """Arrête le thread (une purge en cours s'interrompt entre deux lots)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def get_stats(self):
+        """Statistiques de rétention."""
+        partitions = 0
+        if self.conn is not None:
+            with self.lock:
+                partitions = self.conn.execute('SELECT COUNT(*) FROM partitions').fetchone()[0]
+        return dict(self.stats, partitions=partitions, retention_days=self.retention,
+                    archive_format=self.archive_format)
+
+# Instance globale
+retention_manager = None
+
+def init_retention():
+    """Démarre la rétention en tâche de fond (réglages lus dans l'environnement)."""
+    global retention_manager
+    if retention_manager is None:
+        retention_manager = RetentionManager(
+            archive_format=os.environ.get('NGFW_ARCHIVE_FORMAT') or None,
+            archive_dir=os.environ.get('NGFW_ARCHIVE_DIR') or None,
+            interval=float(os.environ.get('NGFW_RETENTION_INTERVAL', 300)),
+        ).start()
+    return retention_manager
+
+def close_retention():
+    """Arrête la rétention si elle a été démarrée."""
+    global retention_manager
+    if retention_manager is not None:
+        retention_manager.close()
+        retention_manager = None
+
+# Passe unique (cron)
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_database()
+    manager = RetentionManager(archive_format=os.environ.get('NGFW_ARCHIVE_FORMAT') or None)
+    print(manager.run_once())
+    print(manager.get_stats())
+    manager.close()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Backend de capture AF_PACKET / TPACKET_V3 pour NGFW-Congo.
+Le noyau dépose les trames dans un anneau de blocs partagé (mmap) : on lit un
+bloc entier par réveil, sans appel système ni copie par paquet.
+"""
+
+import ctypes
+import mmap
+import select
+import socket
+import struct
+import logging
+
+logger = logging.getLogger('NGFW-RingCapture')
+
+# Constantes linux/if_packet.h
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+ETH_P_ALL = 0x0003
+SO_ATTACH_FILTER = 26
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+# struct tpacket_req3
+_TPACKET_REQ3 = struct.Struct('=7I')
+# struct tpacket_block_desc : version, offset_to_priv, puis tpacket_hdr_v1
+# (block_status, num_pkts, offset_to_first_pkt, blk_len)
+_BLOCK_DESC = struct.Struct('=IIIIII')
+_BLOCK_STATUS_OFFSET = 8
+# struct tpacket3_hdr : next_offset, sec, nsec, snaplen, len, status, mac, net
+_TPACKET3_HDR = struct.Struct('=IIIIIIHH')
+# struct tpacket_stats_v3 : packets, drops, freeze_q_cnt
+_STATS_V3 = struct.Struct('=III')
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [('code', ctypes.c_uint16), ('jt', ctypes.c_uint8),
+                ('jf', ctypes.c_uint8), ('k', ctypes.c_uint32)]
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [('len', ctypes.c_uint16), ('filter', ctypes.POINTER(_SockFilter))]
+
+def attach_bpf(sock, bpf_filter, iface):
+    """
+    Attache un filtre BPF noyau au socket.
+
+    `bpf_filter` est soit une expression tcpdump (compilée via libpcap par
+    Scapy), soit une liste d'instructions (code, jt, jf, k) telle que produite
+    par `tcpdump -dd`.
+    """
+    if isinstance(bpf_filter, str):
+        from scapy.arch.common import attach_filter
+        attach_filter(sock, bpf_filter, iface)
+        return
+
+    instructions = (_SockFilter * len(bpf_filter))(*[_SockFilter(*insn) for insn in bpf_filter])
+    program = _SockFprog(len(bpf_filter), instructions)
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, bytes(program))
+
+class RingCapture:
+    """
+    Capture par anneau TPACKET_V3.
+
+    Usage :
+        with RingCapture('eth0', bpf_filter='ip') as ring:
+            for batch in ring.batches():
+                for frame, timestamp in batch:
+                    ...
+
+    Chaque lot correspond à un bloc de l'anneau. Les trames sont des memoryview
+    pointant directement dans l'anneau : elles ne sont valides que jusqu'à la
+    demande du lot suivant (le bloc est alors rendu au noyau).
+    """
+    def __init__(self, interface, bpf_filter=None, block_size=1 << 20, block_count=64,
+                 frame_size=2048, block_timeout_ms=100):
+        self.interface = interface
+        self.block_size = block_size
+        self.block_count = block_count
+        self.block_timeout_ms = block_timeout_ms
+        self.running = False
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            # Le filtre est attaché avant le bind pour ne rien recevoir de non filtré
+            if bpf_filter:
+                attach_bpf(self.sock, bpf_filter, interface)
+
+            req = _TPACKET_REQ3.pack(
+                block_size, block_count, frame_size,
+                (block_size * block_count) // frame_size,
+                block_timeout_ms,  # Délai de retrait d'un bloc partiellement rempli
+                0, 0
+            )
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, req)
+            self.ring = mmap.mmap(self.sock.fileno(), block_size * block_count,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            self.sock.bind((interface, ETH_P_ALL))
+        except Exception:
+            self.sock.close()
+            raise
+
+        self._view = memoryview(self.ring)
+        self._poller = select.poll()
+        self._poller.register(self.sock.fileno(), select.POLLIN | select.POLLERR)
+        logger.info(f"Anneau TPACKET_V3 prêt sur {interface}: {block_count} blocs de {block_size} octets.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def batches(self, poll_timeout_ms=1000):
+        """
+        Génère un lot [(trame, timestamp), ...] par bloc rendu par le noyau.
+        Un lot vide est produit quand le délai de poll expire sans trafic,
+        ce qui permet à l'appelant de faire avancer ses timeouts.
+        """
+        view = self._view
+        block_index = 0
+        self.running = True
+
+        while self.running:
+            base = block_index * self.block_size
+            _, _, status, num_pkts, offset, _ = _BLOCK_DESC.unpack_from(view, base)
+
+            if not status & TP_STATUS_USER:
+                if not self._poller.poll(poll_timeout_ms):
+                    yield []
+                continue
+
+            batch = []
+            offset += base
+            for _ in range(num_pkts):
+                next_offset, sec, nsec, snaplen, _, _, mac, _ = _TPACKET3_HDR.unpack_from(view, offset)
+                start = offset + mac
+                batch.append((view[start:start + snaplen], sec + nsec * 1e-9))
+                offset += next_offset
+
+            try:
+                yield batch
+            finally:
+                # Libère les vues puis rend le bloc au noyau
+                for frame, _ in batch:
+                    frame.release()
+                struct.pack_into('=I', view, base + _BLOCK_STATUS_OFFSET, TP_STATUS_KERNEL)
+
+            block_index = (block_index + 1) % self.block_count
+
+    def stop(self):
+        """Demande l'arrêt de la boucle de batches()."""
+        self.running = False
+
+    def get_stats(self):
+        """Compteurs noyau (remis à zéro à chaque lecture)."""
+        packets, drops, freezes = _STATS_V3.unpack(
+            self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _STATS_V3.size)
+        )
+        return {'packets': packets, 'drops': drops, 'freeze_count': freezes}
+
+    def close(self):
+        """Libère l'anneau et ferme le socket."""
+        self.running = False
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+            self.ring.close()
+        self.sock.close()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Pipeline multi-processus de NGFW-Congo.
+Le processus de capture décode les trames et répartit les paquets entre N
+processus workers selon un hachage symétrique de la 5-tuple : les deux sens
+d'un flux arrivent toujours au même worker. Chaque worker possède son propre
+FlowGenerator et son propre détecteur ; les résultats (anomalies, nombre de
+flux) sont renvoyés au processus principal pour le logging et le blocage.
+"""
+
+import multiprocessing
+import signal
+import threading
+import time
+import logging
+from queue import Empty
+
+import numpy as np
+
+from flow_table import ip_to_int
+from packet_parser import parse_frame, LINKTYPE_ETHERNET
+
+logger = logging.getLogger('NGFW-Shard')
+
+# Messages de contrôle envoyés aux workers
+STOP = 'stop'
+STOP_FLUSH = 'stop-flush'  # Termine d'abord tous les flux encore ouverts (fin de rejeu)
+
+def symmetric_flow_hash(src_ip, dst_ip, src_port, dst_port, proto):
+    """
+    Hachage 32 bits d'une 5-tuple (IPs entières), identique dans les deux sens
+    du flux : les champs source et destination sont combinés par XOR.
+    Déterministe d'un processus à l'autre (contrairement à hash() sur des chaînes).
+    """
+    h = ((src_ip ^ dst_ip) * 0x9E3779B1) ^ ((((src_port ^ dst_port) << 8) | proto) * 0x85EBCA6B)
+    h &= 0xFFFFFFFF
+    return h ^ (h >> 16)
+
+def shard_worker(shard, inbox, results, model_path, live, tick_interval, extended_features=False):
+    """
+    Boucle d'un worker : comptabilise les lots de paquets reçus dans son
+    FlowGenerator, score les flux expirés par lot et renvoie les anomalies.
+    """
+    # L'arrêt (Ctrl+C) est piloté par le processus principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from feature_extractor import FlowGenerator, flow_to_features
+    from detector import NGFWDetector
+    from verdict_cache import flow_keys
+
+    flow_gen = FlowGenerator(tick_interval=tick_interval, extended_features=extended_features)
+    detector = NGFWDetector(model_path)
+
+    def score(expired_flows):
+        if not expired_flows:
+            return
+        flows = [flow_to_features(flow_data) for _, flow_data in expired_flows]
+        scores, decisions = detector.predict_batch(detector.flows_to_matrix(flows), flow_keys(flows))
+        anomalies = [(flows[i], float(scores[i])) for i in np.flatnonzero(decisions)]
+        # Sources des flux scorés : le processus principal y applique ses sketches comportementaux
+        sources = list({flow['Src IP'] for flow in flows})
+        results.put((shard, len(flows), anomalies, float(detector.threshold), sources))
+
+    while True:
+        try:
+            message = inbox.get(timeout=tick_interval)
+        except Empty:
+            # Pas de trafic : en direct, les timeouts avancent sur l'horloge courante
+            if live:
+                score(flow_gen.process_parsed([]))
+            continue
+
+        try:
+            if message == STOP or message == STOP_FLUSH:
+                if message == STOP_FLUSH:
+                    score(flow_gen.flush())
+                break
+            score(flow_gen.process_parsed(message))
+        except Exception as e:
+            logger.error(f"Erreur dans le worker {shard}: {e}")
+
+    logger.info(f"Worker {shard}: {detector.get_stats()}")
+    results.put((shard, None, None, None, None))
+
+class ShardedPipeline:
+    """
+    Répartiteur côté capture et collecte des résultats.
+
+    Usage :
+        pipeline = ShardedPipeline(workers=8)
+        pipeline.start(on_results)
+        for frame, timestamp in ...:
+            pipeline.dispatch_frame(frame, timestamp)
+        pipeline.close(flush=True)
+
+    `on_results(flow_count, anomalies, threshold, sources)` est appelé dans le
+    processus principal (thread de collecte) pour chaque lot scoré par un
+    worker, avec anomalies = [(flow_features, score), ...] et sources la liste
+    des IP sources distinctes des flux du lot.
+    """
+    def __init__(self, workers, model_path="isolation_forest_model.pkl", live=True,
+                 batch_size=512, max_wait=0.05, queue_size=64, tick_interval=1.0,
+                 extended_features=False):
+        self.workers = workers
+        self.model_path = model_path
+        self.live = live
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.queue_size = queue_size
+        self.tick_interval = tick_interval
+        # Statistiques étendues des flux (FlowGenerator(extended_features=True)) dans les workers
+        self.extended_features = extended_features
+
+        self._pending = [[] for _ in range(workers)]
+        self._next_flush = time.monotonic() + max_wait
+        # Protège les lots en attente, partagés avec le thread d'envoi périodique
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._flusher = None
+        self._inboxes = []
+        self._processes = []
+        self._results = None
+        self._collector = None
+
+        # Statistiques par shard
+        self.packets_dispatched = [0] * workers
+        self.flows_scored = [0] * workers
+
+        # Sketches comportementaux par source (sketches.BehaviorSketch), alimentés
+        # ici dans le processus principal, qui voit toutes les sources
+        self.sketches = None
+
+        # Sert uniquement à get_flow_id pour le chemin Scapy
+        self._flow_ids = None
+
+    def start(self, on_results):
+        """Démarre les workers et le thread de collecte des résultats."""
+        self._results = multiprocessing.Queue()
+        for shard in range(self.workers):
+            inbox = multiprocessing.Queue(maxsize=self.queue_size)
+            process = multiprocessing.Process(
+                target=shard_worker,
+                args=(shard, inbox, self._results, self.model_path, self.live, self.tick_interval,
+                      self.extended_features),
+                name=f"ngfw-shard-{shard}",
+                daemon=True
+            )
+            process.start()
+            self._inboxes.append(inbox)
+            self._processes.append(process)
+
+        self._collector = threading.Thread(target=self._collect, args=(on_results,), daemon=True)
+        self._collector.start()
+        self._stopping.clear()
+        self._flusher = threading.Thread(target=self._flush_loop, name="ngfw-shard-flush", daemon=True)
+        self._flusher.start()
+        logger.info(f"Pipeline multi-processus démarré: {self.workers} workers.")
+
+    def _collect(self, on_results):
+        """Reçoit les résultats des workers jusqu'à ce que tous soient arrêtés."""
+        running = self.workers
+        while running:
+            shard, flow_count, anomalies, threshold, sources = self._results.get()
+            if flow_count is None:
+                running -= 1
+                continue
+            self.flows_scored[shard] += flow_count
+            try:
+                on_results(flow_count, anomalies, threshold, sources)
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement des résultats du worker {shard}: {e}")
+
+    def dispatch(self, src_ip, dst_ip, src_port, dst_port, proto, length, timestamp,
+                 tcp_flags=0, header_len=0):
+        """Met un paquet décodé (IPs entières) dans le lot en attente de son shard."""
+        shard = symmetric_flow_hash(src_ip, dst_ip, src_port, dst_port, proto) % self.workers
+        if self.sketches is not None:
+            self.sketches.add(src_ip, dst_ip, dst_port, length, timestamp)
+
+        with self._lock:
+            pending = self._pending[shard]
+            pending.append((src_ip, dst_ip, src_port, dst_port, proto, length, timestamp, tcp_flags, header_len))
+            if len(pending) >= self.batch_size:
+                self._send(shard)
+            elif time.monotonic() >= self._next_flush:
+                self._flush_pending()
+
+    def dispatch_frame(self, frame, timestamp, linktype=LINKTYPE_ETHERNET):
+        """Décode une trame brute et la répartit (les trames non-IPv4 sont ignorées)."""
+        parsed = parse_frame(frame, linktype)
+        if parsed is not None:
+            src_ip, dst_ip, src_port, dst_port, proto, tcp_flags, header_len = parsed
+            self.dispatch(src_ip, dst_ip, src_port, dst_port, proto, len(frame), timestamp,
+                          tcp_flags, header_len)
+
+    def dispatch_frames(self, batch, linktype=LINKTYPE_ETHERNET):
+        """Répartit un lot [(trame, timestamp), ...] (bloc de l'anneau TPACKET_V3)."""
+        for frame, timestamp in batch:
+            self.dispatch_frame(frame, timestamp, linktype)
+
+    def dispatch_packet(self, packet):
+        """Répartit un paquet Scapy, à partir de la 5-tuple de FlowGenerator.get_flow_id."""
+        if self._flow_ids is None:
+            from feature_extractor import FlowGenerator
+            self._flow_ids = FlowGenerator()
+
+        flow_id_tuple = self._flow_ids.get_flow_id(packet)
+        if not flow_id_tuple:
+            return
+        src_ip, dst_ip, src_port, dst_port, proto = flow_id_tuple[0]
+        tcp_flags, header_len = self._flow_ids.get_header_info(packet) if self.extended_features else (0, 0)
+        self.dispatch(ip_to_int(src_ip), ip_to_int(dst_ip), src_port, dst_port, proto,
+                      len(packet), float(packet.time), tcp_flags, header_len)
+
+    def _send(self, shard):
+        """Envoie le lot en attente d'un shard (bloquant si sa file est pleine ; appelé avec self._lock)."""
+        pending = self._pending[shard]
+        self._inboxes[shard].put(pending)
+        self.packets_dispatched[shard] += len(pending)
+        self._pending[shard] = []
+
+    def flush_pending(self):
+        """Envoie tous les lots en attente, quelle que soit leur taille."""
+        with self._lock:
+            self._flush_pending()
+
+    def _flush_pending(self):
+        """flush_pending, appelé avec self._lock."""
+        for shard in range(self.workers):
+            if self._pending[shard]:
+                self._send(shard)
+        self._next_flush = time.monotonic() + self.max_wait
+
+    def _flush_loop(self):
+        """
+        Envoie les lots partiels toutes les max_wait secondes. Sur une liaison
+        calme, plus aucun paquet ne déclenche l'envoi : sans ce thread, les
+        derniers paquets d'un flux resteraient en attente pendant que le worker
+        fait expirer le flux, puis ouvriraient un nouveau flux à leur arrivée.
+        """
+        while not self._stopping.wait(self.max_wait):
+            with self._lock:
+                if time.monotonic() >= self._next_flush:
+                    self._flush_pending()
+
+    def close(self, flush=False, timeout=None):
+        """
+        Arrête les workers. Avec `flush`, ils terminent et scorent d'abord tous
+        les flux encore ouverts. Attend la fin de la collecte des résultats.
+        """
+        if not self._processes:
+            return  # Jamais démarré ou déjà arrêté
+
+        self._stopping.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush_pending()
+        for inbox in self._inboxes:
+            inbox.put(STOP_FLUSH if flush else STOP)
+
+        if self._collector is not None:
+            self._collector.join(timeout)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+        logger.info(f"Pipeline arrêté. Paquets par worker: {self.packets_dispatched} | "
+                    f"Flux par worker: {self.flows_scored}")
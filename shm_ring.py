@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Anneau SPSC (un producteur, un consommateur) en mémoire partagée pour NGFW-Congo.
+Transporte les flux expirés sous forme d'enregistrements binaires de taille
+fixe entre le processus de capture et le processus de détection, sans
+sérialisation (pickle) ni verrou.
+"""
+
+import struct
+import time
+import logging
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from flow_table import FlowTable
+
+logger = logging.getLogger('NGFW-ShmRing')
+
+# Politiques quand l'anneau est plein
+POLICY_DROP_OLDEST = 'drop-oldest'
+POLICY_BLOCK = 'block'
+
+RING_MAGIC = 0x474E495257464E47  # "NGFWRING"
+
+# Enregistrement d'un flux : numéro de séquence (seqlock), puis les champs de
+# FlowTable.RECORD_FIELDS. 72 octets, champs 8 octets alignés.
+RECORD_DTYPE = np.dtype([
+    ('seq', 'u8'),
+    ('start_time', 'f8'),
+    ('last_seen', 'f8'),
+    ('fwd_packets', 'u8'),
+    ('bwd_packets', 'u8'),
+    ('fwd_bytes', 'u8'),
+    ('bwd_bytes', 'u8'),
+    ('src_ip', 'u4'),
+    ('dst_ip', 'u4'),
+    ('src_port', 'u2'),
+    ('dst_port', 'u2'),
+    ('protocol', 'u1'),
+    ('_pad', 'V3'),
+])
+assert RECORD_DTYPE.names[1:-1] == FlowTable.RECORD_FIELDS
+
+# Corps d'un enregistrement (après seq). struct.pack_into remet la zone à zéro
+# avant d'écrire : sans danger ici puisque le slot est alors marqué "en cours
+# d'écriture". Les compteurs et les séquences passent en revanche par une vue
+# memoryview 'Q', dont chaque affectation est un unique accès 8 octets aligné.
+_RECORD = struct.Struct('@ddQQQQIIHHB')
+
+# En-tête : chaque compteur n'a qu'un seul écrivain, et les champs du
+# producteur et du consommateur sont sur des lignes de cache distinctes.
+HEADER_SIZE = 192
+_OFF_MAGIC, _OFF_CAPACITY, _OFF_RECORD_SIZE = 0, 8, 16
+# Producteur (head = nombre total d'enregistrements publiés)
+_OFF_HEAD, _OFF_OVERWRITTEN, _OFF_BLOCKED, _OFF_CLOSED = 64, 72, 80, 88
+# Consommateur
+_OFF_TAIL, _OFF_LOST = 128, 136
+
+class ShmFlowRing:
+    """
+    Anneau circulaire d'enregistrements de flux en mémoire partagée.
+
+    head et tail sont des compteurs monotones (position = compteur % capacité),
+    écrits respectivement par le seul producteur et le seul consommateur.
+    Chaque slot porte un numéro de séquence façon seqlock : 2p+1 pendant
+    l'écriture de la position p, 2p+2 une fois publiée. Le consommateur
+    vérifie ce numéro avant et après sa copie, ce qui détecte aussi bien les
+    écritures en cours que les slots écrasés (politique drop-oldest).
+
+    Usage :
+        ring = ShmFlowRing.create(capacity=65536)       # processus de capture
+        ring.put_many(flow_gen.process_frame(...))     # FlowGenerator(raw_records=True)
+
+        ring = ShmFlowRing.attach(name)                 # processus de détection
+        records = ring.read_batch(256, timeout=0.05)   # tableau NumPy structuré
+    """
+    def __init__(self, shm, owner, policy=POLICY_DROP_OLDEST):
+        if policy not in (POLICY_DROP_OLDEST, POLICY_BLOCK):
+            raise ValueError(f"Politique inconnue: {policy}")
+        self.shm = shm
+        self.owner = owner
+        self.policy = policy
+        self.name = shm.name
+        self._buf = shm.buf
+        self._words = shm.buf.cast('Q')
+
+        magic = self._get(_OFF_MAGIC)
+        if magic != RING_MAGIC:
+            raise ValueError(f"{shm.name} n'est pas un anneau de flux NGFW")
+        self.capacity = self._get(_OFF_CAPACITY)
+        if self._get(_OFF_RECORD_SIZE) != RECORD_DTYPE.itemsize:
+            raise ValueError("Taille d'enregistrement incompatible")
+
+        self.records = np.ndarray(
+            (self.capacity,), dtype=RECORD_DTYPE, buffer=self._buf, offset=HEADER_SIZE
+        )
+        # Copies locales des compteurs dont ce processus est l'unique écrivain
+        self._head = self._get(_OFF_HEAD)
+        self._tail = self._get(_OFF_TAIL)
+        # Dernier tail lu par le producteur : relu seulement si l'anneau semble plein
+        self._seen_tail = self._tail
+
+    @classmethod
+    def create(cls, capacity=65536, name=None, policy=POLICY_DROP_OLDEST):
+        """Crée l'anneau (côté producteur)."""
+        size = HEADER_SIZE + capacity * RECORD_DTYPE.itemsize
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        words = shm.buf.cast('Q')
+        words[_OFF_MAGIC // 8] = RING_MAGIC
+        words[_OFF_CAPACITY // 8] = capacity
+        words[_OFF_RECORD_SIZE // 8] = RECORD_DTYPE.itemsize
+        words.release()
+        # Aucun slot publié : séquence 0
+        np.ndarray((capacity,), dtype=RECORD_DTYPE, buffer=shm.buf, offset=HEADER_SIZE)['seq'] = 0
+        logger.info(f"Anneau {shm.name} créé: {capacity} enregistrements ({size} octets, {policy}).")
+        return cls(shm, owner=True, policy=policy)
+
+    @classmethod
+    def attach(cls, name):
+        """S'attache à un anneau existant (côté consommateur)."""
+        try:
+            # Le segment appartient au producteur : pas de suivi côté consommateur
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 : un processus lancé par multiprocessing partage le
+            # resource_tracker du producteur, l'enregistrement y est sans effet
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    def _get(self, offset):
+        return self._words[offset >> 3]
+
+    def _set(self, offset, value):
+        self._words[offset >> 3] = value
+
+    # ----- Producteur -----
+
+    def put(self, raw, timeout=None):
+        """
+        Publie un flux brut (tuple FlowTable.pop_raw). Retourne False si
+        l'anneau est resté plein au-delà de `timeout` (politique block).
+        """
+        head = self._head
+        if head - self._seen_tail >= self.capacity:
+            self._seen_tail = self._get(_OFF_TAIL)
+        if head - self._seen_tail >= self.capacity:
+            if self.policy == POLICY_DROP_OLDEST:
+                # Le plus ancien enregistrement non lu est écrasé
+                self._set(_OFF_OVERWRITTEN, self._get(_OFF_OVERWRITTEN) + 1)
+            elif not self._wait_for_space(head, timeout):
+                return False
+
+        offset = HEADER_SIZE + (head % self.capacity) * RECORD_DTYPE.itemsize
+        words = self._words
+        words[offset >> 3] = 2 * head + 1
+        _RECORD.pack_into(self._buf, offset + 8, *raw)
+        words[offset >> 3] = 2 * head + 2
+
+        self._head = head + 1
+        self._set(_OFF_HEAD, head + 1)
+        return True
+
+    def put_many(self, raws, timeout=None):
+        """Publie une liste de flux bruts. Retourne le nombre publié."""
+        published = 0
+        for raw in raws:
+            if not self.put(raw, timeout):
+                break
+            published += 1
+        return published
+
+    def _wait_for_space(self, head, timeout):
+        """Politique block : attend que le consommateur libère un slot."""
+        self._set(_OFF_BLOCKED, self._get(_OFF_BLOCKED) + 1)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while head - self._seen_tail >= self.capacity:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.0005)
+            self._seen_tail = self._get(_OFF_TAIL)
+        return True
+
+    def close_producer(self):
+        """Signale au consommateur qu'aucun flux ne sera plus publié."""
+        self._set(_OFF_CLOSED, 1)
+
+    # ----- Consommateur -----
+
+    @property
+    def closed(self):
+        return self._get(_OFF_CLOSED) == 1
+
+    def read_batch(self, max_records=256, timeout=0.05):
+        """
+        Lit jusqu'à `max_records` enregistrements (copiés hors de l'anneau),
+        en attendant au plus `timeout` secondes le premier. Retourne un tableau
+        NumPy structuré (RECORD_DTYPE), éventuellement vide.
+        """
+        tail = self._tail
+        head = self._get(_OFF_HEAD)
+        if head == tail and timeout:
+            deadline = time.monotonic() + timeout
+            while head == tail and time.monotonic() < deadline and not self.closed:
+                time.sleep(0.0005)
+                head = self._get(_OFF_HEAD)
+        if head == tail:
+            return self.records[:0].copy()
+
+        lost = 0
+        if head - tail > self.capacity:
+            # Le producteur a fait plus d'un tour : les plus anciens sont perdus
+            lost = head - self.capacity - tail
+            tail = head - self.capacity
+
+        count = min(head - tail, max_records)
+        positions = np.arange(tail, tail + count, dtype=np.uint64)
+        slots = positions % np.uint64(self.capacity)
+        expected = 2 * positions + 2
+
+        # Seqlock : séquence attendue avant ET après la copie
+        batch = self.records[slots]
+        valid = (batch['seq'] == expected) & (self.records['seq'][slots] == expected)
+        if not valid.all():
+            lost += int(count - valid.sum())
+            batch = batch[valid]
+
+        self._tail = tail + count
+        self._set(_OFF_TAIL, self._tail)
+        if lost:
+            self._set(_OFF_LOST, self._get(_OFF_LOST) + lost)
+        return batch
+
+    # ----- Commun -----
+
+    def __len__(self):
+        """Nombre d'enregistrements publiés et pas encore lus (approximatif)."""
+        return min(self._get(_OFF_HEAD) - self._get(_OFF_TAIL), self.capacity)
+
+    def get_stats(self):
+        """Compteurs de l'anneau."""
+        lost = self._get(_OFF_LOST)
+        return {
+            'capacity': self.capacity,
+            'policy': self.policy,
+            'pending': len(self),
+            'produced': self._get(_OFF_HEAD),
+            'consumed': self._get(_OFF_TAIL) - lost,
+            'overwritten': self._get(_OFF_OVERWRITTEN),
+            'lost': lost,
+            'producer_blocked': self._get(_OFF_BLOCKED),
+        }
+
+    def close(self):
+        """Libère la mémoire partagée (et la supprime côté producteur)."""
+        self.records = None
+        self._words.release()
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Sketches comportementaux par source pour NGFW-Congo.
+
+La détection par le modèle ne voit que des flux 5-tuple expirés : une source
+qui envoie un paquet vers 10 000 ports ressemble à 10 000 petits flux
+anodins. Ce module résume le trafic par IP source sur une fenêtre glissante,
+en mémoire fixe quel que soit le nombre de sources :
+
+- paquets et octets par source : Count-Min sketch (depth × width compteurs) ;
+- nombre de ports et d'hôtes destination distincts par source : une matrice
+  Count-Min dont chaque case est un petit HyperLogLog (m registres). Les
+  collisions ne font qu'ajouter des éléments, on retient donc le minimum
+  des estimations sur les lignes, comme pour les compteurs.
+
+La fenêtre est découpée en `slots` sous-fenêtres tournantes : les compteurs
+se somment et les registres HLL se fusionnent (max) au moment de la requête.
+Les paquets sont accumulés dans un tampon et appliqués par lots numpy.
+"""
+
+import os
+import threading
+import logging
+import numpy as np
+
+logger = logging.getLogger('NGFW-Sketches')
+
+def _mix64(x):
+    """Finaliseur splitmix64 vectorisé (tableau uint64, dépassements modulo 2^64)."""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def _hll_alpha(m):
+    """Constante de correction de biais HyperLogLog pour m registres."""
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+class BehaviorSketch:
+    """
+    Signaux comportementaux par IP source (entiers 32 bits) sur une fenêtre glissante.
+
+    Usage :
+        sketch = BehaviorSketch(window=60)
+        sketch.add(src_ip, dst_ip, dst_port, length, timestamp)   # chemin paquet
+        sketch.signals([src_ip, ...])   # [{'Src Pkts/s': ..., 'Src Dst Ports': ...}, ...]
+
+    Les scores (`score_signals`) rapportent chaque signal à son seuil : un
+    score >= 1 désigne une inondation (heavy hitter) ou un balayage (fan-out).
+    """
+    def __init__(self, window=60, slots=6, depth=3, width=4096, hll_width=1024, registers=64,
+                 flood_pps=10000, scan_ports=500, sweep_hosts=1000, batch_size=4096):
+        if width & (width - 1) or hll_width & (hll_width - 1):
+            raise ValueError("width et hll_width doivent être des puissances de 2")
+        if registers not in (16, 32, 64, 128, 256):
+            raise ValueError("registers doit valoir 16, 32, 64, 128 ou 256")
+        self.window = float(window)
+        self.slots = slots
+        self.slot_seconds = self.window / slots
+        self.depth = depth
+        self.width = width
+        self.hll_width = hll_width
+        self.registers = registers
+        self.batch_size = batch_size
+
+        # Seuils des scores (0 = signal désactivé)
+        self.flood_pps = flood_pps
+        self.scan_ports = scan_ports
+        self.sweep_hosts = sweep_hosts
+
+        # Graines des fonctions de hachage, une par ligne
+        rng = np.random.default_rng(0x4E474657)
+        self._seeds = rng.integers(0, 2**63, size=(depth, 1), dtype=np.uint64)
+        self._rows = np.arange(depth)[:, None]
+
+        # Compteurs [slot, ligne, colonne] et registres HLL [slot, ligne, colonne, registre]
+        self.packets = np.zeros((slots, depth, width), dtype=np.uint32)
+        self.bytes = np.zeros((slots, depth, width), dtype=np.uint64)
+        self.ports = np.zeros((slots, depth, hll_width, registers), dtype=np.uint8)
+        self.hosts = np.zeros((slots, depth, hll_width, registers), dtype=np.uint8)
+        self.totals = np.zeros(slots, dtype=np.uint64)
+
+        self._epoch = None      # indice absolu (timestamp // slot_seconds) du slot courant
+        self._slot_end = float('-inf')   # fin du slot courant
+        self._started = None    # premier timestamp vu (fenêtre partiellement remplie)
+        self._last_time = None
+        self._pending = []
+        self.lock = threading.Lock()
+
+        self.stats = {'packets': 0, 'batches': 0, 'rotations': 0}
+
+    @property
+    def memory_bytes(self):
+        """Mémoire occupée par les sketches (indépendante du nombre de sources)."""
+        return (self.packets.nbytes + self.bytes.nbytes + self.ports.nbytes
+                + self.hosts.nbytes + self.totals.nbytes)
+
+    def add(self, src_ip, dst_ip, dst_port, length, timestamp):
+        """Comptabilise un paquet (chemin paquet ; appliqué par lots)."""
+        with self.lock:
+            if timestamp >= self._slot_end:
+                epoch = int(timestamp // self.slot_seconds)
+                if self._epoch is None:
+                    self._started = timestamp
+                else:
+                    # Les paquets en attente appartiennent au slot qui se termine
+                    self._apply()
+                    self._rotate(epoch)
+                self._epoch = epoch
+                self._slot_end = (epoch + 1) * self.slot_seconds
+            self._last_time = timestamp
+            pending = self._pending
+            pending.append((src_ip, dst_ip, dst_port, length))
+            if len(pending) >= self.batch_size:
+                self._apply()
+
+    def _rotate(self, epoch):
+        """Avance jusqu'au slot `epoch` en vidant les slots sortis de la fenêtre."""
+        for step in range(min(epoch - self._epoch, self.slots)):
+            slot = (self._epoch + 1 + step) % self.slots
+            self.packets[slot] = 0
+            self.bytes[slot] = 0
+            self.ports[slot] = 0
+            self.hosts[slot] = 0
+            self.totals[slot] = 0
+        self.stats['rotations'] += 1
+
+    def _columns(self, keys, width):
+        """Colonne de chaque clé (uint64) pour chaque ligne : tableau [depth, n]."""
+        return (_mix64(keys[None, :] ^ self._seeds) & np.uint64(width - 1)).astype(np.intp)
+
+    def _hll_update(self, registers, slot, columns, values):
+        """Ajoute des éléments (uint64) aux HLL des cases `columns` [depth, n]."""
+        h = _mix64(values ^ np.uint64(0x9E3779B97F4A7C15))
+        index = (h & np.uint64(self.registers - 1)).astype(np.intp)
+        # Rang : position du premier bit à 1 dans les 32 bits de poids fort (33 si nuls)
+        high = (h >> np.uint64(32)).astype(np.float64)
+        rank = np.full(len(values), 33, dtype=np.uint8)
+        nonzero = high > 0
+        rank[nonzero] = 32 - np.floor(np.log2(high[nonzero])).astype(np.uint8)
+        # Index à plat (colonne, registre) : ufunc.at est bien plus rapide en 1D
+        flat = columns * self.registers + index
+        for row in range(self.depth):
+            np.maximum.at(registers[slot, row].reshape(-1), flat[row], rank)
+
+    def _apply(self):
+        """Applique le tampon au slot courant (appelé avec self.lock)."""
+        if not self._pending:
+            return
+        batch = np.array(self._pending, dtype=np.uint64)
+        self._pending = []
+        src, dst, port, length = batch.T
+        slot = self._epoch % self.slots
+
+        columns = self._columns(src, self.width)
+        for row in range(self.depth):
+            # bincount plutôt que np.add.at (plusieurs dizaines de fois plus lent)
+            self.packets[slot, row] += np.bincount(columns[row], minlength=self.width).astype(np.uint32)
+            self.bytes[slot, row] += np.bincount(
+                columns[row], weights=length, minlength=self.width).astype(np.uint64)
+        self.totals[slot] += np.uint64(len(batch))
+
+        columns = self._columns(src, self.hll_width)
+        self._hll_update(self.ports, slot, columns, port)
+        self._hll_update(self.hosts, slot, columns, dst)
+
+        self.stats['packets'] += len(batch)
+        self.stats['batches'] += 1
+
+    def _estimate(self, registers):
+        """Estimation HyperLogLog vectorisée sur le dernier axe (registres)."""
+        m = self.registers
+        raw = _hll_alpha(m) * m * m / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+        zeros = np.count_nonzero(registers == 0, axis=-1)
+        # Petites cardinalités : comptage linéaire
+        small = (raw <= 2.5 * m) & (zeros > 0)
+        linear = m * np.log(m / np.maximum(zeros, 1))
+        return np.where(small, linear, raw)
+
+    def _distinct(self, registers, columns):
+        """Cardinalités estimées pour les cases `columns` [depth, n] (min sur les lignes)."""
+        # Fusion des slots (max des registres) puis estimation par ligne
+        merged = registers[:, self._rows, columns].max(axis=0)   # [depth, n, m]
+        return self._estimate(merged).min(axis=0)
+
+    def _covered(self):
+        """Durée (secondes) réellement couverte par la fenêtre."""
+        if self._epoch is None:
+            return self.window
+        current = self._last_time - self._epoch * self.slot_seconds
+        covered = (self.slots - 1) * self.slot_seconds + current
+        return max(min(covered, self._last_time - self._started, self.window), self.slot_seconds)
+
+    def signals(self, src_ips):
+        """
+        Signaux de chaque source sur la fenêtre : liste de dictionnaires
+        {Src Pkts/s, Src Bytes/s, Src Pkt Share, Src Dst Ports, Src Dst Hosts}.
+        """
+        if len(src_ips) == 0:
+            return []
+        keys = np.asarray(src_ips, dtype=np.uint64)
+        with self.lock:
+            self._apply()
+            columns = self._columns(keys, self.width)
+            packets = self.packets.sum(axis=0, dtype=np.uint64)[self._rows, columns].min(axis=0)
+            octets = self.bytes.sum(axis=0)[self._rows, columns].min(axis=0)
+            total = int(self.totals.sum())
+            columns = self._columns(keys, self.hll_width)
+            ports = self._distinct(self.ports, columns)
+            hosts = self._distinct(self.hosts, columns)
+            covered = self._covered()
+
+        return [
+            {
+                'Src Pkts/s': float(packets[i]) / covered,
+                'Src Bytes/s': float(octets[i]) / covered,
+                'Src Pkt Share': float(packets[i]) / total if total else 0.0,
+                'Src Dst Ports': round(float(ports[i])),
+                'Src Dst Hosts': round(float(hosts[i])),
+            }
+            for i in range(len(keys))
+        ]
+
+    def score_signals(self, signals):
+        """
+        Scores d'un dictionnaire de signaux : heavy_hitter (débit de paquets) et
+        fanout (ports ou hôtes distincts), rapportés à leur seuil.
+        """
+        heavy = signals['Src Pkts/s'] / self.flood_pps if self.flood_pps else 0.0
+        fanout = max(
+            signals['Src Dst Ports'] / self.scan_ports if self.scan_ports else 0.0,
+            signals['Src Dst Hosts'] / self.sweep_hosts if self.sweep_hosts else 0.0,
+        )
+        return {'heavy_hitter': heavy, 'fanout': fanout}
+
+    def verdict(self, signals):
+        """Motif ('flood', 'port-scan', 'host-sweep') si un seuil est atteint, sinon None."""
+        if self.flood_pps and signals['Src Pkts/s'] >= self.flood_pps:
+            return 'flood'
+        if self.scan_ports and signals['Src Dst Ports'] >= self.scan_ports:
+            return 'port-scan'
+        if self.sweep_hosts and signals['Src Dst Hosts'] >= self.sweep_hosts:
+            return 'host-sweep'
+        return None
+
+    def get_stats(self):
+        """Statistiques des sketches."""
+        with self.lock:
+            return dict(self.stats, pending=len(self._pending), memory_bytes=self.memory_bytes,
+                        window=self.window)
+
+# Instance globale (processus de capture)
+behavior_sketch = None
+
+def init_sketches(**kwargs):
+    """Crée les sketches comportementaux (seuils et fenêtre depuis l'environnement)."""
+    global behavior_sketch
+    options = {
+        'window': float(os.environ.get('NGFW_SKETCH_WINDOW', 60)),
+        'flood_pps': float(os.environ.get('NGFW_SKETCH_FLOOD_PPS', 10000)),
+        'scan_ports': int(os.environ.get('NGFW_SKETCH_SCAN_PORTS', 500)),
+        'sweep_hosts': int(os.environ.get('NGFW_SKETCH_SWEEP_HOSTS', 1000)),
+    }
+    options.update(kwargs)
+    behavior_sketch = BehaviorSketch(**options)
+    logger.info(f"Sketches comportementaux: fenêtre {behavior_sketch.window:.0f}s, "
+                f"{behavior_sketch.memory_bytes / 1e6:.1f} Mo")
+    return behavior_sketch
+
+def get_sketches():
+    """Sketches du processus courant (None s'ils ne sont pas activés)."""
+    return behavior_sketch
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    sketch = init_sketches(flood_pps=4000, scan_ports=300)
+    rng = random.Random(1)
+    now = time.time()
+    scanner, flooder = 0xC6336407, 0xCB007105   # 198.51.100.7, 203.0.113.5
+
+    start = time.perf_counter()
+    for i in range(200_000):
+        t = now + i * 1e-4
+        kind = i % 10
+        if kind == 0:
+            sketch.add(scanner, 0x0A000001, i % 4000, 60, t)                     # balayage de ports
+        elif kind < 6:
+            sketch.add(flooder, 0x0A000002, 80, 1500, t)                         # inondation
+        else:
+            sketch.add(rng.getrandbits(32), 0x0A000000 | rng.randrange(256), 443, 800, t)  # bruit
+    elapsed = time.perf_counter() - start
+    print(f"{200_000 / elapsed:,.0f} paquets/s, {sketch.memory_bytes / 1e6:.1f} Mo")
+
+    for name, ip in (('scanner', scanner), ('flooder', flooder), ('bruit', 0x0A0A0A0A)):
+        signals = sketch.signals([ip])[0]
+        print(name, sketch.verdict(signals), sketch.score_signals(signals), signals)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test de l'anneau TPACKET_V3 (ring_capture.py) sur l'interface de boucle
+locale : des datagrammes UDP envoyés sur `lo` doivent ressortir de l'anneau
+avec la bonne 5-tuple, et les blocs lus doivent être rendus au noyau.
+
+Nécessite CAP_NET_RAW (sudo) ; le test est ignoré sinon.
+
+    sudo python -m pytest -q test_ring_capture.py
+"""
+
+import signal
+import socket
+import struct
+import time
+import unittest
+
+from packet_parser import parse_frame, LINKTYPE_ETHERNET
+from flow_table import ip_to_int
+from ring_capture import RingCapture
+
+def _can_capture():
+    """True si un socket AF_PACKET peut être ouvert (CAP_NET_RAW)."""
+    try:
+        socket.socket(socket.AF_PACKET, socket.SOCK_RAW).close()
+        return True
+    except (PermissionError, AttributeError, OSError):
+        return False
+
+@unittest.skipUnless(_can_capture(), "CAP_NET_RAW requis pour ouvrir un socket AF_PACKET")
+class RingCaptureLoopbackTest(unittest.TestCase):
+    # Petit anneau à retrait rapide : les blocs tournent plusieurs fois pendant le test
+    BLOCK_SIZE = 1 << 16
+    BLOCK_COUNT = 4
+
+    def setUp(self):
+        self.ring = RingCapture('lo', block_size=self.BLOCK_SIZE, block_count=self.BLOCK_COUNT,
+                                block_timeout_ms=10)
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sender.bind(('127.0.0.1', 0))
+        self.src_port = self.sender.getsockname()[1]
+        self.dst_port = self.receiver.getsockname()[1]
+        self.batches = self.ring.batches(poll_timeout_ms=100)
+
+    def tearDown(self):
+        # Le générateur rend son dernier bloc avant la fermeture de l'anneau
+        self.batches.close()
+        self.ring.close()
+        self.sender.close()
+        self.receiver.close()
+
+    def _next(self, batches, timeout=5.0):
+        """
+        Lot suivant. Un anneau bloqué (blocs jamais rendus au noyau) fait
+        tourner batches() sans rien produire : l'échec est levé par une alarme.
+        """
+        def expired(signum, frame):
+            raise self.failureException(f"aucun lot de l'anneau en {timeout}s")
+        previous = signal.signal(signal.SIGALRM, expired)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return next(batches)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    def _is_ours(self, parsed):
+        return parsed is not None and parsed[2] == self.src_port and parsed[3] == self.dst_port
+
+    def _collect(self, batches, expected, timeout=5.0):
+        """Lit l'anneau jusqu'à voir `expected` datagrammes du test. Retourne leurs (5-tuple, charge utile)."""
+        seen = {}
+        deadline = time.monotonic() + timeout
+        while len(seen) < expected and time.monotonic() < deadline:
+            for frame, timestamp in self._next(batches):
+                parsed = parse_frame(frame, LINKTYPE_ETHERNET)
+                if self._is_ours(parsed):
+                    # Sur lo, chaque datagramme est vu en sortie et en entrée : une fois suffit
+                    payload = bytes(frame[-8:])
+                    seen[payload] = (parsed, timestamp)
+        return seen
+
+    def test_udp_five_tuples(self):
+        sent = [struct.pack('!Q', i) for i in range(5)]
+        before = time.time()
+        for payload in sent:
+            self.sender.sendto(payload, ('127.0.0.1', self.dst_port))
+
+        seen = self._collect(self.batches, len(sent))
+        self.assertEqual(sorted(seen), sorted(sent))
+
+        localhost = ip_to_int('127.0.0.1')
+        for (src_ip, dst_ip, src_port, dst_port, proto, tcp_flags, header_len), timestamp in seen.values():
+            self.assertEqual((src_ip, dst_ip, src_port, dst_port, proto),
+                             (localhost, localhost, self.src_port, self.dst_port, socket.IPPROTO_UDP))
+            self.assertEqual((tcp_flags, header_len), (0, 8))
+            self.assertAlmostEqual(timestamp, before, delta=5.0)
+
+    def test_blocks_released(self):
+        batches = self.batches
+        # Plus de vagues que de blocs : sans libération des blocs lus, le noyau
+        # n'aurait plus où écrire et les dernières vagues ne seraient jamais reçues
+        waves = 3 * self.BLOCK_COUNT
+        for wave in range(waves):
+            payload = struct.pack('!Q', wave)
+            self.sender.sendto(payload, ('127.0.0.1', self.dst_port))
+            batch = []
+            deadline = time.monotonic() + 5.0
+            while not any(bytes(frame[-8:]) == payload and self._is_ours(parse_frame(frame))
+                          for frame, _ in batch):
+                self.assertLess(time.monotonic(), deadline, f"datagramme {wave} non reçu")
+                batch = self._next(batches)
+            frames = [frame for frame, _ in batch]
+
+            # Demander le lot suivant rend le bloc au noyau et invalide ses trames
+            self._next(batches)
+            with self.assertRaises(ValueError):
+                bytes(frames[0])
+
+        self.assertEqual(self.ring.get_stats()['drops'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
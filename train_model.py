@@ -8,9 +8,11 @@ import pandas as pd
 import numpy as np
 import os
 from sklearn.ensemble import IsolationForest
+from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
 import joblib
+from forest_compiler import compile_model_file
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -18,6 +20,8 @@ warnings.filterwarnings('ignore')
 print("[+] Configuration de l'entraînement...")
 dataset_path = "CIC-IDS-2017"  # Chemin vers le dossier du dataset
 model_filename = "isolation_forest_model.pkl"
+bundle_filename = "isolation_forest_model.bundle.pkl"  # Modèle + scaler + ordre des features
+extended_features = False  # True : ajoute les features CIC étendues (IAT, longueurs, flags), voir feature_extractor.EXTENDED_FEATURE_NAMES
 test_size = 0.3  # 30% des données pour le test
 random_state = 42 # Seed pour la reproductibilité
 
@@ -103,16 +107,71 @@ print(f"    Labels (y) : {y.shape}")
 # 5. ===== SELECTION DES FEATURES =====
 print("[+] Sélection des features compatibles temps réel...")
 
-# Liste des features que notre extracteur temps réel peut générer
-realtime_features = [
-    ' Flow Duration',           # Correspond à 'Duration'
-    ' Total Fwd Packets',       # Correspond à 'Tot Fwd Pkts'
-    ' Total Backward Packets',  # Correspond à 'Tot Bwd Pkts'
-    'Total Length of Fwd Packets',  # Correspond à 'TotLen Fwd Packets'
-    ' Total Length of Bwd Packets', # Correspond à 'TotLen Bwd Packets'
-    'Flow Bytes/s',
-    ' Flow Packets/s'
-]
+# Features que notre extracteur temps réel peut générer : colonne CIC-IDS2017 -> nom côté extracteur
+realtime_mapping = {
+    ' Flow Duration': 'Duration',
+    ' Total Fwd Packets': 'Tot Fwd Pkts',
+    ' Total Backward Packets': 'Tot Bwd Pkts',
+    'Total Length of Fwd Packets': 'TotLen Fwd Pkts',
+    ' Total Length of Bwd Packets': 'TotLen Bwd Pkts',
+    'Flow Bytes/s': 'Flow Bytes/s',
+    ' Flow Packets/s': 'Flow Packets/s'
+}
+
+# Features étendues, calculées en flux par FlowGenerator(extended_features=True)
+# (le détecteur les active d'office si le modèle les utilise)
+extended_mapping = {
+    ' Fwd Packet Length Max': 'Fwd Pkt Len Max',
+    ' Fwd Packet Length Min': 'Fwd Pkt Len Min',
+    ' Fwd Packet Length Mean': 'Fwd Pkt Len Mean',
+    ' Fwd Packet Length Std': 'Fwd Pkt Len Std',
+    'Bwd Packet Length Max': 'Bwd Pkt Len Max',
+    ' Bwd Packet Length Min': 'Bwd Pkt Len Min',
+    ' Bwd Packet Length Mean': 'Bwd Pkt Len Mean',
+    ' Bwd Packet Length Std': 'Bwd Pkt Len Std',
+    ' Flow IAT Mean': 'Flow IAT Mean',
+    ' Flow IAT Std': 'Flow IAT Std',
+    ' Flow IAT Max': 'Flow IAT Max',
+    ' Flow IAT Min': 'Flow IAT Min',
+    'Fwd IAT Total': 'Fwd IAT Tot',
+    ' Fwd IAT Mean': 'Fwd IAT Mean',
+    ' Fwd IAT Std': 'Fwd IAT Std',
+    ' Fwd IAT Max': 'Fwd IAT Max',
+    ' Fwd IAT Min': 'Fwd IAT Min',
+    'Bwd IAT Total': 'Bwd IAT Tot',
+    ' Bwd IAT Mean': 'Bwd IAT Mean',
+    ' Bwd IAT Std': 'Bwd IAT Std',
+    ' Bwd IAT Max': 'Bwd IAT Max',
+    ' Bwd IAT Min': 'Bwd IAT Min',
+    'Fwd PSH Flags': 'Fwd PSH Flags',
+    ' Bwd PSH Flags': 'Bwd PSH Flags',
+    ' Fwd URG Flags': 'Fwd URG Flags',
+    ' Bwd URG Flags': 'Bwd URG Flags',
+    ' Fwd Header Length': 'Fwd Header Len',
+    ' Bwd Header Length': 'Bwd Header Len',
+    'Fwd Packets/s': 'Fwd Pkts/s',
+    ' Bwd Packets/s': 'Bwd Pkts/s',
+    ' Min Packet Length': 'Pkt Len Min',
+    ' Max Packet Length': 'Pkt Len Max',
+    ' Packet Length Mean': 'Pkt Len Mean',
+    ' Packet Length Std': 'Pkt Len Std',
+    ' Packet Length Variance': 'Pkt Len Var',
+    'FIN Flag Count': 'FIN Flag Cnt',
+    ' SYN Flag Count': 'SYN Flag Cnt',
+    ' RST Flag Count': 'RST Flag Cnt',
+    ' PSH Flag Count': 'PSH Flag Cnt',
+    ' ACK Flag Count': 'ACK Flag Cnt',
+    ' URG Flag Count': 'URG Flag Cnt',
+    ' CWE Flag Count': 'CWE Flag Count',
+    ' ECE Flag Count': 'ECE Flag Cnt',
+    ' Down/Up Ratio': 'Down/Up Ratio',
+    ' Average Packet Size': 'Pkt Size Avg',
+    ' Avg Fwd Segment Size': 'Fwd Seg Size Avg',
+    ' Avg Bwd Segment Size': 'Bwd Seg Size Avg',
+}
+if extended_features:
+    realtime_mapping.update(extended_mapping)
+realtime_features = list(realtime_mapping)
 
 # Trouver les features disponibles qui correspondent
 available_features = [col for col in X.columns if col in realtime_features]
@@ -128,6 +187,18 @@ else:
 
 print(f"    Features finales : {list(X.columns)}")
 
+# CIC-IDS2017 exprime la durée et les IAT en microsecondes, l'extracteur en secondes
+for col in X.columns:
+    if col == ' Flow Duration' or 'IAT' in col:
+        X[col] = X[col] / 1e6
+
+# 6bis. ===== NORMALISATION =====
+print("[+] Ajustement du scaler sur les données d'entraînement...")
+# Les flux infinis (durée nulle) faussent la moyenne : on les neutralise
+X = X.replace([np.inf, -np.inf], 0)
+scaler = StandardScaler()
+X_scaled = scaler.fit_transform(X.to_numpy(dtype=np.float64))
+
 # 6. ===== ENTRAÎNEMENT DU MODÈLE =====
 print("[+] Entraînement du modèle Isolation Forest...")
 model = IsolationForest(
@@ -138,12 +209,12 @@ model = IsolationForest(
     n_jobs=-1  # Utilise tous les coeurs CPU
 )
 
-model.fit(X)
+model.fit(X_scaled)
 print("    Entraînement terminé.")
 
 # 7. ===== ÉVALUATION DU MODÈLE =====
 print("[+] Évaluation du modèle...")
-y_pred = model.predict(X)
+y_pred = model.predict(X_scaled)
 y_pred = [1 if x == -1 else 0 for x in y_pred]  # Convertit -1->1 (attaque), 1->0 (normal)
 
 accuracy = accuracy_score(y, y_pred)
@@ -162,4 +233,18 @@ print("[+] Sauvegarde du modèle...")
 joblib.dump(model, model_filename)
 print(f"    Modèle sauvegardé sous : {model_filename}")
 
+# Bundle utilisé par le détecteur : le scaler est appliqué tel quel en temps réel
+bundle = {
+    'model': model,
+    'feature_names': [realtime_mapping.get(col, col) for col in X.columns],
+    'scaler_mean': scaler.mean_,
+    'scaler_scale': scaler.scale_,
+}
+joblib.dump(bundle, bundle_filename)
+print(f"    Bundle (modèle + scaler + ordre des features) sauvegardé sous : {bundle_filename}")
+
+# Modèle compilé en tableaux plats : scoring en temps réel sans scikit-learn
+compiled_filename = compile_model_file(bundle_filename)
+print(f"    Modèle compilé sauvegardé sous : {compiled_filename}")
+
 print("\n[+] Entraînement terminé avec succès ! Le modèle est prêt pour la détection en temps réel.")
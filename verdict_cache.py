@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Cache des verdicts du détecteur pour NGFW-Congo.
+
+Une grande partie du trafic se répète (mDNS vers 224.0.0.251, SSDP, sondes de
+supervision périodiques) : les mêmes flux expirent encore et encore avec des
+features presque identiques. Le cache associe à (source, destination, port
+destination, protocole, signature des features) le score déjà calculé, pour
+ne pas repasser ces flux dans le modèle.
+
+La signature quantifie chaque feature sur une échelle logarithmique
+(`resolution` pas par doublement) : deux flux dont les features diffèrent de
+quelques pour cent partagent la même entrée. Les scores trop proches du seuil
+ne sont pas mis en cache, pour qu'un flux limite soit toujours rescoré.
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger('NGFW-VerdictCache')
+
+class VerdictCache:
+    """
+    Cache LRU à durée de vie (TTL) des scores du détecteur.
+
+    Usage :
+        cache = VerdictCache(max_size=65536, ttl=300)
+        cache.validate(model, threshold)        # vide le cache si l'un a changé
+        scores, cache_keys = cache.lookup(keys, X)   # NaN pour les absents
+        cache.store([cache_keys[i] for i in missing], fresh_scores, threshold)
+    """
+    def __init__(self, max_size=65536, ttl=300.0, resolution=8, margin=0.02):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.resolution = resolution
+        # Écart minimal au seuil pour qu'un score soit mis en cache
+        self.margin = margin
+
+        self.entries = OrderedDict()   # clé -> (score, expiration monotonic)
+        self.lock = threading.Lock()
+        self._model = None
+        self._threshold = None
+
+        # Statistiques
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'skipped': 0,   # scores trop proches du seuil, non mis en cache
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def signatures(self, X):
+        """Signature quantifiée (bytes) de chaque ligne d'une matrice N×F brute."""
+        quantized = np.sign(X) * np.rint(np.log2(1.0 + np.abs(X)) * self.resolution)
+        quantized = quantized.astype(np.int32)
+        return [row.tobytes() for row in quantized]
+
+    def validate(self, model, threshold):
+        """Vide le cache si le modèle ou le seuil de décision a changé depuis le dernier lot."""
+        if model is self._model and threshold == self._threshold:
+            return
+        with self.lock:
+            if self.entries:
+                self.entries.clear()
+                self.stats['invalidations'] += 1
+                logger.info("Modèle ou seuil modifié : cache des verdicts vidé.")
+            self._model = model
+            self._threshold = threshold
+
+    def invalidate(self):
+        """Vide le cache (par exemple après un réentraînement du scaler)."""
+        with self.lock:
+            self.entries.clear()
+            self.stats['invalidations'] += 1
+
+    def lookup(self, keys, X):
+        """
+        Recherche un lot de flux. `keys` contient (src, dst, port dst, protocole)
+        pour chaque ligne de X. Retourne (scores, clés complètes) : les scores
+        valent NaN pour les flux absents ou expirés.
+        """
+        cache_keys = [key + (signature,) for key, signature in zip(keys, self.signatures(X))]
+        scores = np.full(len(cache_keys), np.nan)
+        now = time.monotonic()
+        entries = self.entries
+        hits = expired = 0
+        with self.lock:
+            for i, key in enumerate(cache_keys):
+                entry = entries.get(key)
+                if entry is None:
+                    continue
+                if entry[1] <= now:
+                    del entries[key]
+                    expired += 1
+                    continue
+                entries.move_to_end(key)
+                scores[i] = entry[0]
+                hits += 1
+            self.stats['hits'] += hits
+            self.stats['misses'] += len(cache_keys) - hits
+            self.stats['expired'] += expired
+        return scores, cache_keys
+
+    def store(self, cache_keys, scores, threshold):
+        """Enregistre des scores fraîchement calculés (hors marge autour du seuil)."""
+        expires = time.monotonic() + self.ttl
+        entries = self.entries
+        skipped = evictions = 0
+        with self.lock:
+            for key, score in zip(cache_keys, scores.tolist()):
+                if abs(score - threshold) < self.margin:
+                    skipped += 1
+                    continue
+                entries[key] = (score, expires)
+                entries.move_to_end(key)
+            while len(entries) > self.max_size:
+                entries.popitem(last=False)
+                evictions += 1
+            self.stats['skipped'] += skipped
+            self.stats['evictions'] += evictions
+
+    def get_stats(self):
+        """Statistiques du cache (dont le taux de succès)."""
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return dict(self.stats, size=len(self.entries), max_size=self.max_size,
+                        hit_rate=self.stats['hits'] / lookups if lookups else 0.0)
+
+def verdict_cache_from_env():
+    """Cache configuré par NGFW_VERDICT_CACHE_SIZE (0 = désactivé) et NGFW_VERDICT_CACHE_TTL."""
+    size = int(os.environ.get('NGFW_VERDICT_CACHE_SIZE', 65536))
+    if size <= 0:
+        return None
+    return VerdictCache(max_size=size, ttl=float(os.environ.get('NGFW_VERDICT_CACHE_TTL', 300)))
+
+def flow_keys(flows):
+    """Clés (src, dst, port dst, protocole) d'une liste de dictionnaires de features."""
+    return [
+        (flow.get('Src IP'), flow.get('Dst IP'), flow.get('Dst Port'), flow.get('Protocol'))
+        for flow in flows
+    ]
+
+def record_keys(records):
+    """Clés (src, dst, port dst, protocole) de flux bruts (tableau structuré, voir shm_ring.py)."""
+    return list(zip(
+        records['src_ip'].tolist(), records['dst_ip'].tolist(),
+        records['dst_port'].tolist(), records['protocol'].tolist()
+    ))
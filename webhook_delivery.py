@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Livraison asynchrone des alertes webhook (SOC) pour NGFW-Congo.
+
+Les alertes ne sont plus envoyées une par une par un requests.post bloquant :
+elles sont mises en file (appel non bloquant, depuis n'importe quel thread ou
+depuis la boucle de l'API) et livrées par une boucle asyncio dédiée, avec
+pour chaque plateforme :
+- un client HTTP persistant (httpx.AsyncClient, connexions réutilisées) ;
+- une limite de débit en seau à jetons ;
+- des nouvelles tentatives avec attente exponentielle et gigue (ou l'en-tête
+  Retry-After) sur erreur réseau, 429 et 5xx ;
+- l'agrégation : les alertes d'une fenêtre de `window` secondes partent en un
+  seul message (un résumé si elles sont plusieurs). Une rafale de 500
+  anomalies donne un message, pas 500.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+import logging
+from collections import Counter
+
+import httpx
+
+logger = logging.getLogger('NGFW-Webhooks')
+
+class TokenBucket:
+    """Seau à jetons : `rate` messages par seconde en moyenne, rafales de `burst`."""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Prend un jeton et retourne l'attente nécessaire (secondes) avant de l'utiliser."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        """Attend un jeton (boucle asyncio de livraison)."""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+class AlertDigest:
+    """Agrégat borné des alertes d'une fenêtre (compteurs, sources principales, échantillons)."""
+    MAX_SOURCES = 1000
+    MAX_SAMPLES = 5
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+        self.first_seen = self.last_seen = time.time()
+        self.max_score = None
+        self.sources = Counter()
+        self.samples = []
+
+    def add(self, alert):
+        self.count += 1
+        self.last_seen = time.time()
+        if self.first is None:
+            self.first = alert
+        if len(self.samples) < self.MAX_SAMPLES:
+            self.samples.append(alert)
+        source = alert.get('source_ip') or 'inconnue'
+        if source in self.sources or len(self.sources) < self.MAX_SOURCES:
+            self.sources[source] += 1
+        else:
+            self.sources['autres'] += 1
+        score = alert.get('anomaly_score')
+        if isinstance(score, (int, float)) and (self.max_score is None or score > self.max_score):
+            self.max_score = score
+
+    def summary(self):
+        """Résumé passé au formateur de messages de synthèse."""
+        return {
+            'count': self.count,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'max_score': self.max_score,
+            'distinct_sources': len(self.sources),
+            'top_sources': self.sources.most_common(5),
+            'samples': self.samples,
+        }
+
+class _Channel:
+    """Fenêtre d'agrégation et livraison pour une plateforme (boucle de livraison)."""
+    def __init__(self, delivery, platform, url):
+        self.delivery = delivery
+        self.platform = platform
+        self.url = url
+        self.bucket = TokenBucket(delivery.rate, delivery.burst)
+        self.client = httpx.AsyncClient(
+            timeout=delivery.timeout,
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=2),
+        )
+        self.pending = None
+        self.wakeup = asyncio.Event()
+        self.stats = {'alerts': 0, 'messages': 0, 'digests': 0, 'delivered': 0,
+                      'retries': 0, 'failed': 0, 'throttled': 0}
+
+    def add(self, alert):
+        """Ajoute une alerte à la fenêtre en cours (en ouvre une si besoin)."""
+        if self.pending is None:
+            self.pending = AlertDigest()
+            self.wakeup.set()
+        self.pending.add(alert)
+        self.stats['alerts'] += 1
+
+    async def run(self):
+        """Une livraison par fenêtre, jusqu'à l'arrêt (la dernière fenêtre est envoyée sans attendre)."""
+        stopping = self.delivery._stopping
+        while True:
+            await self.wakeup.wait()
+            if not stopping.is_set():
+                try:
+                    await asyncio.wait_for(stopping.wait(), self.delivery.window)
+                except asyncio.TimeoutError:
+                    pass
+            self.wakeup.clear()
+            digest, self.pending = self.pending, None
+            if digest is not None:
+                await self.deliver(digest)
+            if stopping.is_set() and self.pending is None:
+                await self.client.aclose()
+                return
+
+    async def deliver(self, digest):
+        """Envoie la fenêtre : l'alerte seule, ou un message de synthèse."""
+        delivery = self.delivery
+        if digest.count == 1:
+            payload = delivery.format_payload(digest.first, self.platform)
+        else:
+            payload = delivery.format_digest(digest.summary(), self.platform)
+            self.stats['digests'] += 1
+
+        for attempt in range(delivery.retries + 1):
+            if await self.bucket.acquire():
+                self.stats['throttled'] += 1
+            retry_after = None
+            try:
+                response = await self.client.post(self.url, json=payload)
+                if response.status_code < 300:
+                    self.stats['messages'] += 1
+                    self.stats['delivered'] += digest.count
+                    return True
+                error = f"HTTP {response.status_code}"
+                retryable = response.status_code == 429 or response.status_code >= 500
+                retry_after = _retry_after(response)
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+                retryable = True
+
+            if not retryable or attempt == delivery.retries:
+                break
+            self.stats['retries'] += 1
+            # Attente exponentielle avec gigue complète, sauf consigne du serveur
+            if retry_after is None:
+                retry_after = random.uniform(0, min(delivery.max_backoff, delivery.backoff * 2 ** attempt))
+            await asyncio.sleep(retry_after)
+
+        self.stats['failed'] += 1
+        logger.error(f"SOC alert failed ({self.platform}, {digest.count} alerte(s)): {error}")
+        return False
+
+def _retry_after(response):
+    """Délai de l'en-tête Retry-After (secondes, borné à 60), ou None."""
+    value = response.headers.get('Retry-After')
+    try:
+        return min(60.0, max(0.0, float(value)))
+    except (TypeError, ValueError):
+        return None
+
+class WebhookDelivery:
+    """
+    Moteur de livraison des webhooks, avec sa propre boucle asyncio dans un thread.
+
+    Usage :
+        delivery = WebhookDelivery({'slack': url}, format_payload, format_digest, window=10)
+        delivery.start()
+        delivery.submit('slack', {'source_ip': ..., 'anomaly_score': ...})   # non bloquant
+        delivery.close()      # envoie les fenêtres en cours
+
+    `format_payload(alerte, plateforme)` formate une alerte seule,
+    `format_digest(résumé, plateforme)` une fenêtre de plusieurs alertes
+    (voir AlertDigest.summary).
+    """
+    def __init__(self, webhook_urls, format_payload, format_digest, window=10.0, rate=1.0, burst=3,
+                 retries=3, backoff=0.5, max_backoff=30.0, timeout=10.0):
+        self.webhook_urls = {platform: url for platform, url in webhook_urls.items() if url}
+        self.format_payload = format_payload
+        self.format_digest = format_digest
+        self.window = window
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.loop = None
+        self.channels = {}
+        self._tasks = []
+        self._stopping = None
+        self._thread = None
+        # Processus propriétaire : après un fork, l'enfant doit créer son propre moteur
+        self.pid = os.getpid()
+
+    def start(self):
+        """Démarre la boucle de livraison et un canal par plateforme configurée."""
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="ngfw-webhooks", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._stopping = asyncio.Event()
+        for platform, url in self.webhook_urls.items():
+            channel = _Channel(self, platform, url)
+            self.channels[platform] = channel
+            self._tasks.append(self.loop.create_task(channel.run()))
+        ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def submit(self, platform, alert):
+        """Met une alerte en file (thread-safe, non bloquant). False si la plateforme n'est pas configurée."""
+        channel = self.channels.get(platform)
+        if channel is None or self._thread is None:
+            return False
+        self.loop.call_soon_threadsafe(channel.add, dict(alert))
+        return True
+
+    async def _shutdown(self):
+        """Envoie les fenêtres en cours puis ferme les clients."""
+        self._stopping.set()
+        for channel in self.channels.values():
+            channel.wakeup.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def close(self, timeout=10):
+        """Envoie les alertes en attente (au plus `timeout` secondes) et arrête la boucle."""
+        if self._thread is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        try:
+            future.result(timeout)
+        except Exception:
+            logger.warning("Arrêt des webhooks: alertes en attente abandonnées.")
+            future.cancel()
+            for task in self._tasks:
+                self.loop.call_soon_threadsafe(task.cancel)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self):
+        """Statistiques par plateforme."""
+        return {platform: dict(channel.stats) for platform, channel in self.channels.items()}